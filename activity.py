@@ -0,0 +1,192 @@
+import logging
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# Activity window configuration
+BUCKET_SECONDS = 10  # Width of one ring-buffer slot
+NUM_BUCKETS = 90  # Slots per token, covering the longest window (15 minutes)
+WINDOWS = (60, 300, 900)  # Standard windows reported for a token
+MAX_TRACKED_TOKENS = 5000  # Least recently active tokens beyond this are evicted
+MAX_ACCOUNTS_PER_BUCKET = 1000  # Cap on distinct accounts remembered per slot
+
+# Slot layout: [bucket, trustlines, offers, volume_xrp, accounts]
+_BUCKET, _TRUSTLINES, _OFFERS, _VOLUME, _ACCOUNTS = range(5)
+
+
+def _xrp_and_token(amount_a, amount_b):
+    if isinstance(amount_a, str) and isinstance(amount_b, dict) and "issuer" in amount_b:
+        return int(amount_a) / 1_000_000, amount_b
+    if isinstance(amount_b, str) and isinstance(amount_a, dict) and "issuer" in amount_a:
+        return int(amount_b) / 1_000_000, amount_a
+    return None
+
+
+class _TokenActivity:
+    """Fixed ring of BUCKET_SECONDS slots for one token; empty slots cost nothing."""
+
+    __slots__ = ("slots", "last_seen")
+
+    def __init__(self):
+        self.slots = [None] * NUM_BUCKETS
+        self.last_seen = 0.0
+
+    def slot(self, bucket: int) -> list:
+        index = bucket % NUM_BUCKETS
+        slot = self.slots[index]
+        if slot is None or slot[_BUCKET] != bucket:
+            # Reuse the slot once its bucket has aged out of the ring
+            slot = [bucket, 0, 0, 0.0, set()]
+            self.slots[index] = slot
+        return slot
+
+    def live_slots(self, bucket: int, seconds: float):
+        oldest = bucket - max(1, -(-int(seconds) // BUCKET_SECONDS)) + 1
+        for slot in self.slots:
+            if slot is not None and oldest <= slot[_BUCKET] <= bucket:
+                yield slot
+
+
+class ActivityTracker:
+    """Sliding-window counts of trustlines, offers, unique accounts and XRP volume per token.
+
+    Every validated transaction is attributed to the XRP-paired tokens it
+    touches: new trustlines from TrustSets that create a RippleState, new
+    offers from OfferCreates, and XRP volume from consumed Offer nodes. Each
+    token keeps a ring of NUM_BUCKETS slots, so windows up to
+    NUM_BUCKETS * BUCKET_SECONDS are answered by summing slots, and memory
+    per token is fixed. Tokens idle for longer than the ring are evicted,
+    and at most MAX_TRACKED_TOKENS are kept, least recently active first.
+    """
+
+    def __init__(self):
+        self._tokens = OrderedDict()  # Structure: {(currency, issuer): _TokenActivity}, least recent first
+
+    def _slot(self, key: tuple, now: float) -> list:
+        activity = self._tokens.get(key)
+        if activity is None:
+            activity = _TokenActivity()
+            self._tokens[key] = activity
+            if len(self._tokens) > MAX_TRACKED_TOKENS:
+                self._tokens.popitem(last=False)
+        else:
+            self._tokens.move_to_end(key)
+        activity.last_seen = now
+        # Evict tokens whose whole ring has gone cold, oldest first
+        horizon = now - NUM_BUCKETS * BUCKET_SECONDS
+        while self._tokens:
+            oldest_key, oldest = next(iter(self._tokens.items()))
+            if oldest.last_seen >= horizon:
+                break
+            del self._tokens[oldest_key]
+        return activity.slot(int(now // BUCKET_SECONDS))
+
+    def on_transaction(self, message: dict, now: float = None) -> set:
+        """Attributes a validated transaction to the tokens it touches; returns those tokens."""
+        meta = message.get("meta")
+        if not isinstance(meta, dict) or meta.get("TransactionResult") != "tesSUCCESS":
+            return set()
+        transaction = message.get("transaction") or {}
+        account = transaction.get("Account")
+        tx_type = transaction.get("TransactionType")
+        now = time.time() if now is None else now
+        touched = set()
+
+        if tx_type == "TrustSet":
+            limit = transaction.get("LimitAmount")
+            created = any(
+                "CreatedNode" in affected and affected["CreatedNode"].get("LedgerEntryType") == "RippleState"
+                for affected in meta.get("AffectedNodes", ())
+            )
+            if created and isinstance(limit, dict):
+                key = (limit.get("currency"), limit.get("issuer"))
+                slot = self._slot(key, now)
+                slot[_TRUSTLINES] += 1
+                self._add_account(slot, account)
+                touched.add(key)
+
+        elif tx_type == "OfferCreate":
+            split = _xrp_and_token(transaction.get("TakerGets"), transaction.get("TakerPays"))
+            if split is not None:
+                key = (split[1]["currency"], split[1]["issuer"])
+                slot = self._slot(key, now)
+                slot[_OFFERS] += 1
+                self._add_account(slot, account)
+                touched.add(key)
+
+        # XRP volume from offers consumed by any transaction type (offers, payments)
+        for affected in meta.get("AffectedNodes", ()):
+            node = affected.get("ModifiedNode") or affected.get("DeletedNode")
+            if not node or node.get("LedgerEntryType") != "Offer":
+                continue
+            previous, final = node.get("PreviousFields"), node.get("FinalFields")
+            if not previous or not final or "TakerGets" not in previous:
+                continue
+            split_prev = _xrp_and_token(previous.get("TakerGets"), previous.get("TakerPays"))
+            split_final = _xrp_and_token(final.get("TakerGets"), final.get("TakerPays"))
+            if split_prev is None or split_final is None:
+                continue
+            xrp_traded = split_prev[0] - split_final[0]
+            if xrp_traded <= 0:
+                continue
+            key = (split_final[1]["currency"], split_final[1]["issuer"])
+            slot = self._slot(key, now)
+            slot[_VOLUME] += xrp_traded
+            self._add_account(slot, account)
+            touched.add(key)
+        return touched
+
+    @staticmethod
+    def _add_account(slot: list, account: str):
+        if account and len(slot[_ACCOUNTS]) < MAX_ACCOUNTS_PER_BUCKET:
+            slot[_ACCOUNTS].add(account)
+
+    def window(self, currency: str, issuer: str, seconds: float, unique_accounts: bool = True,
+               now: float = None) -> dict:
+        """Returns activity totals for a token over the last `seconds` (rounded up to whole slots)."""
+        stats = {"trustlines": 0, "offers": 0, "volume_xrp": 0.0, "unique_accounts": 0}
+        activity = self._tokens.get((currency, issuer))
+        if activity is None:
+            return stats
+        now = time.time() if now is None else now
+        accounts = set()
+        for slot in activity.live_slots(int(now // BUCKET_SECONDS), min(seconds, NUM_BUCKETS * BUCKET_SECONDS)):
+            stats["trustlines"] += slot[_TRUSTLINES]
+            stats["offers"] += slot[_OFFERS]
+            stats["volume_xrp"] += slot[_VOLUME]
+            if unique_accounts:
+                accounts |= slot[_ACCOUNTS]
+        stats["unique_accounts"] = len(accounts)
+        return stats
+
+    def summary(self, currency: str, issuer: str) -> dict:
+        """Returns the token's totals over each standard window, keyed by seconds."""
+        return {seconds: self.window(currency, issuer, seconds) for seconds in WINDOWS}
+
+    def meets(self, currency: str, issuer: str, thresholds: dict, now: float = None) -> bool:
+        """Checks {"window", "trustlines", "offers", "unique_accounts", "volume_xrp"} minimums.
+
+        Unset or zero minimums are ignored; the window defaults to 120 seconds.
+        Unique accounts are only counted when a minimum asks for them.
+        """
+        minimums = {metric: thresholds.get(metric) for metric in ("trustlines", "offers", "unique_accounts", "volume_xrp")}
+        minimums = {metric: value for metric, value in minimums.items() if value}
+        if not minimums:
+            return False
+        stats = self.window(currency, issuer, thresholds.get("window", 120),
+                            unique_accounts="unique_accounts" in minimums, now=now)
+        return all(stats[metric] >= value for metric, value in minimums.items())
+
+    def trending(self, seconds: float = 300, metric: str = "trustlines", limit: int = 10) -> list:
+        """Returns the most active tokens over a window by one metric, as (currency, issuer, stats)."""
+        now = time.time()
+        cutoff = now - seconds
+        ranked = []
+        for (currency, issuer), activity in reversed(self._tokens.items()):
+            if activity.last_seen < cutoff:
+                break  # Ordered by last activity, everything older is outside the window
+            stats = self.window(currency, issuer, seconds, unique_accounts=metric == "unique_accounts", now=now)
+            ranked.append((currency, issuer, stats))
+        ranked.sort(key=lambda item: item[2][metric], reverse=True)
+        return ranked[:limit]
@@ -0,0 +1,197 @@
+import asyncio
+import logging
+import time
+
+import xrpl
+from xrpl.models.currencies import XRP, IssuedCurrency
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+CACHE_REQUESTS = metrics.counter("cache_requests_total", "Cache lookups by cache and result (hit/miss)")
+
+# Pool mirror configuration
+OFFLINE_REFRESH_INTERVAL = 30  # Seconds a pool stays fresh while the stream is not running
+NO_POOL_TTL = 300  # Seconds a pair without an AMM is remembered before asking again
+TRADING_FEE_UNIT = 100_000  # AMM TradingFee is in units of 1/100,000
+
+
+def _is_xrp_asset(asset) -> bool:
+    return asset == "XRP" or (isinstance(asset, dict) and asset.get("currency") == "XRP" and "issuer" not in asset)
+
+
+def _token_asset(asset_a, asset_b):
+    """Returns (currency, issuer) for an XRP/token asset pair, or None for token/token pools."""
+    if _is_xrp_asset(asset_a) and isinstance(asset_b, dict) and "issuer" in asset_b:
+        return asset_b["currency"], asset_b["issuer"]
+    if _is_xrp_asset(asset_b) and isinstance(asset_a, dict) and "issuer" in asset_a:
+        return asset_a["currency"], asset_a["issuer"]
+    return None
+
+
+class AMMPools:
+    """Local mirror of XRP/token AMM pool reserves.
+
+    A pool is seeded once with `amm_info`. After that its reserves follow
+    validated metadata: the AMM account's AccountRoot balance is the XRP
+    side, and its trustline with the issuer is the token side. Quotes are
+    computed in-process from the constant-product formula, so pricing an
+    order costs no RPC. Pairs without a pool are remembered for NO_POOL_TTL.
+    """
+
+    def __init__(self, client, ledger_scheduler):
+        self.client = client
+        self.ledger_scheduler = ledger_scheduler
+        self._pools = {}  # Structure: {(currency, issuer): {"account", "xrp_drops", "token", "trading_fee", "updated"}}
+        self._by_account = {}  # Structure: {amm_account: (currency, issuer)}
+        self._no_pool = {}  # Structure: {(currency, issuer): monotonic time of the empty answer}
+        self._seed_locks = {}
+
+    def _seed(self, currency: str, issuer: str) -> dict:
+        """Fetches a pool's reserves and fee over JSON-RPC; returns None if there is no pool."""
+        response = self.client.request(xrpl.models.requests.AMMInfo(
+            asset=XRP(), asset2=IssuedCurrency(currency=currency, issuer=issuer), ledger_index="validated"
+        ))
+        if not response.is_successful():
+            if response.result.get("error") == "actNotFound":
+                return None
+            raise RuntimeError(response.result.get("error_message") or response.result.get("error", "Unknown error"))
+
+        amm = response.result["amm"]
+        amounts = (amm["amount"], amm["amount2"])
+        xrp_amount = next(amount for amount in amounts if isinstance(amount, str))
+        token_amount = next(amount for amount in amounts if isinstance(amount, dict))
+        return {
+            "account": amm["account"],
+            "xrp_drops": int(xrp_amount),
+            "token": float(token_amount["value"]),
+            "trading_fee": int(amm.get("trading_fee", 0)),
+            "updated": time.monotonic(),
+        }
+
+    def _is_fresh(self, pool: dict) -> bool:
+        if pool["xrp_drops"] is None or pool["token"] is None:
+            return False
+        if self.ledger_scheduler.is_stream_live():
+            return True
+        return time.monotonic() - pool["updated"] < OFFLINE_REFRESH_INTERVAL
+
+    async def get(self, currency: str, issuer: str):
+        """Returns the pool for an XRP/token pair, seeding it if needed, or None if there is none."""
+        key = (currency, issuer)
+        pool = self._pools.get(key)
+        if pool is not None and self._is_fresh(pool):
+            CACHE_REQUESTS.inc(cache="amm_pools", result="hit")
+            return pool
+        if pool is None and time.monotonic() - self._no_pool.get(key, float("-inf")) < NO_POOL_TTL:
+            CACHE_REQUESTS.inc(cache="amm_pools", result="hit")
+            return None
+        CACHE_REQUESTS.inc(cache="amm_pools", result="miss")
+
+        lock = self._seed_locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            pool = self._pools.get(key)
+            if pool is not None and self._is_fresh(pool):
+                return pool
+            try:
+                pool = await asyncio.get_running_loop().run_in_executor(None, self._seed, currency, issuer)
+            except Exception as e:
+                logger.error(f"Error seeding AMM pool for {currency}.{issuer}: {e}")
+                return None
+            if pool is None:
+                self._no_pool[key] = time.monotonic()
+                return None
+            self._no_pool.pop(key, None)
+            self._pools[key] = pool
+            self._by_account[pool["account"]] = key
+            return pool
+
+    def quote_buy(self, currency: str, issuer: str, xrp_in: float):
+        """Returns the tokens a swap of xrp_in XRP into a cached pool yields, or None if unknown."""
+        pool = self._pools.get((currency, issuer))
+        if pool is None or not pool["xrp_drops"] or not pool["token"]:
+            return None
+        effective_in = xrp_in * 1_000_000 * (1 - pool["trading_fee"] / TRADING_FEE_UNIT)
+        return pool["token"] * effective_in / (pool["xrp_drops"] + effective_in)
+
+    def quote_sell(self, currency: str, issuer: str, token_in: float):
+        """Returns the XRP a swap of token_in tokens into a cached pool yields, or None if unknown."""
+        pool = self._pools.get((currency, issuer))
+        if pool is None or not pool["xrp_drops"] or not pool["token"]:
+            return None
+        effective_in = token_in * (1 - pool["trading_fee"] / TRADING_FEE_UNIT)
+        return pool["xrp_drops"] * effective_in / (pool["token"] + effective_in) / 1_000_000
+
+    def spot_price(self, currency: str, issuer: str):
+        """Returns the pool's marginal price in XRP per token, or None if unknown."""
+        pool = self._pools.get((currency, issuer))
+        if pool is None or not pool["xrp_drops"] or not pool["token"]:
+            return None
+        return pool["xrp_drops"] / 1_000_000 / pool["token"]
+
+    def depth(self, currency: str, issuer: str, pct: float):
+        """Returns (ask, bid) XRP a cached pool absorbs before its price moves pct percent, or None.
+
+        Ask depth is the XRP that buys the price up by pct, bid depth the
+        XRP that selling takes out while the price falls by pct.
+        """
+        pool = self._pools.get((currency, issuer))
+        if pool is None or not pool["xrp_drops"] or not pool["token"]:
+            return None
+        xrp = pool["xrp_drops"] / 1_000_000
+        move = min(pct, 99.0) / 100
+        # Constant product: the XRP reserve scales with the square root of the price
+        return xrp * ((1 + move) ** 0.5 - 1), xrp * (1 - (1 - move) ** 0.5)
+
+    def on_transaction(self, message: dict):
+        """Applies a validated transaction's changes to mirrored pools."""
+        meta = message.get("meta")
+        if not isinstance(meta, dict):
+            return
+        nodes = [next(iter(affected.items())) for affected in meta.get("AffectedNodes", [])]
+
+        # Pool lifecycle first, so balance nodes of a new pool in the same transaction are applied
+        for node_type, node in nodes:
+            if node.get("LedgerEntryType") != "AMM":
+                continue
+            fields = node.get("FinalFields") or node.get("NewFields") or {}
+            key = _token_asset(fields.get("Asset"), fields.get("Asset2"))
+            if key is None:
+                continue
+            if node_type == "DeletedNode":
+                pool = self._pools.pop(key, None)
+                if pool is not None:
+                    self._by_account.pop(pool["account"], None)
+            elif node_type == "CreatedNode":
+                self._no_pool.pop(key, None)
+                self._pools[key] = {
+                    "account": fields["Account"], "xrp_drops": None, "token": None,
+                    "trading_fee": int(fields.get("TradingFee", 0)), "updated": time.monotonic(),
+                }
+                self._by_account[fields["Account"]] = key
+            elif key in self._pools and "TradingFee" in fields:
+                self._pools[key]["trading_fee"] = int(fields["TradingFee"])
+
+        if not self._by_account:
+            return
+        for node_type, node in nodes:
+            entry_type = node.get("LedgerEntryType")
+            fields = node.get("FinalFields") or node.get("NewFields") or {}
+
+            if entry_type == "AccountRoot":
+                key = self._by_account.get(fields.get("Account"))
+                if key is not None and "Balance" in fields:
+                    self._pools[key]["xrp_drops"] = int(fields["Balance"])
+                    self._pools[key]["updated"] = time.monotonic()
+
+            elif entry_type == "RippleState" and node_type != "DeletedNode":
+                low = fields.get("LowLimit", {}).get("issuer")
+                high = fields.get("HighLimit", {}).get("issuer")
+                balance = fields.get("Balance", {})
+                # Balance is stored from the low account's point of view
+                for holder, counterparty, sign in ((low, high, 1), (high, low, -1)):
+                    key = self._by_account.get(holder)
+                    if key is not None and key == (balance.get("currency"), counterparty):
+                        self._pools[key]["token"] = sign * float(balance.get("value", 0))
+                        self._pools[key]["updated"] = time.monotonic()
@@ -0,0 +1,68 @@
+"""Microbenchmark: per-order build time, xrpl-py models (old _execute_buy_order path) vs OrderTemplateCache.
+
+Both paths end with the signing payload encoded, which is what the signer needs.
+
+Usage: python3 bench_order_build.py [num_orders]
+"""
+import sys
+import time
+
+from xrpl.core import keypairs
+from xrpl.core.binarycodec import encode_for_signing
+from xrpl.models import IssuedCurrencyAmount, OfferCreate
+
+from order_templates import OrderTemplateCache, format_token_value, xrp_to_drops_str
+
+CURRENCY = "534F4C4F00000000000000000000000000000000"
+ISSUER = "rsoLo2S1kiGeCcn6hCUXVrCpGMWLrRrLZz"
+
+
+def build_with_models(address: str, token_value: float, buy_amount_xrp: float, sequence: int) -> str:
+    offer = OfferCreate(
+        account=address,
+        taker_gets=xrp_to_drops_str(buy_amount_xrp),
+        taker_pays=IssuedCurrencyAmount(currency=CURRENCY, issuer=ISSUER, value=format_token_value(token_value)),
+        sequence=sequence,
+        fee="12",
+        last_ledger_sequence=90000000,
+    )
+    return encode_for_signing(offer.to_xrpl())
+
+
+def build_with_template(cache: OrderTemplateCache, address: str, token_value: float,
+                        buy_amount_xrp: float, sequence: int) -> str:
+    tx_json = cache.offer(address, CURRENCY, ISSUER, "buy",
+                          token_value=format_token_value(token_value),
+                          xrp_drops=xrp_to_drops_str(buy_amount_xrp))
+    tx_json["Sequence"] = sequence
+    tx_json["Fee"] = "12"
+    tx_json["LastLedgerSequence"] = 90000000
+    return encode_for_signing(tx_json)
+
+
+def main(num_orders: int):
+    public_key, _ = keypairs.derive_keypair(keypairs.generate_seed())
+    address = keypairs.derive_classic_address(public_key)
+    cache = OrderTemplateCache(client=None)
+
+    # Both paths must produce the same signing payload
+    assert build_with_models(address, 1234.5, 25, 7) == build_with_template(cache, address, 1234.5, 25, 7)
+
+    start = time.perf_counter()
+    for i in range(num_orders):
+        build_with_models(address, 1000 + i, 25, i + 1)
+    models_elapsed = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for i in range(num_orders):
+        build_with_template(cache, address, 1000 + i, 25, i + 1)
+    template_elapsed = time.perf_counter() - start
+
+    print(f"{num_orders} OfferCreate builds")
+    print(f"  xrpl-py models: {models_elapsed / num_orders * 1e6:8.1f} us/order")
+    print(f"  template cache: {template_elapsed / num_orders * 1e6:8.1f} us/order")
+    print(f"  speed-up:       {models_elapsed / template_elapsed:8.2f}x")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10000)
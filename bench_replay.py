@@ -0,0 +1,170 @@
+"""Benchmark: stream ingest throughput on a recorded XRPL stream.
+
+Record a stream once, then replay it offline through the same in-process
+consumers _process_xrpl_message feeds (no RPC, no orders). The replay
+mode measures throughput with and without the listing detector. The
+logging mode measures it with the sniper's hot-path log calls
+(per-OfferCreate debug, per-listing info) under the old synchronous
+handler, the queued pipeline of logging_setup, and that pipeline with
+sampling.
+
+Usage: python3 bench_replay.py record <file.jsonl> [num_messages]
+       python3 bench_replay.py replay <file.jsonl> [repeat]
+       python3 bench_replay.py logging <file.jsonl> [repeat]
+"""
+import asyncio
+import json
+import logging
+import sys
+import tempfile
+import time
+
+import websockets
+
+import logging_setup
+from amm_pools import AMMPools
+from ledger_scheduler import LedgerScheduler
+from listings import ListingDetector
+from market_data import BookCache
+from open_offers import OpenOffers
+from positions_cache import PositionsCache
+from xrp_sniper_logic_enhanced import WEBSOCKET_URL
+
+
+async def record(path: str, num_messages: int):
+    """Saves raw messages from the transactions and ledger streams, one per line."""
+    async with websockets.connect(WEBSOCKET_URL) as ws:
+        await ws.send(json.dumps({"id": 1, "command": "subscribe", "streams": ["transactions", "ledger"]}))
+        await ws.recv()
+        with open(path, "w") as f:
+            for i in range(num_messages):
+                f.write(await ws.recv() + "\n")
+                if (i + 1) % 1000 == 0:
+                    print(f"  recorded {i + 1}/{num_messages}")
+    print(f"Recorded {num_messages} messages to {path}")
+
+
+def make_consumers(with_detector: bool) -> tuple:
+    """Builds the stream consumers the sniper feeds validated transactions to."""
+    ledger_scheduler = LedgerScheduler()
+    positions = PositionsCache(client=None, ledger_scheduler=ledger_scheduler)
+    open_offers = OpenOffers(client=None, ledger_scheduler=ledger_scheduler)
+    # Track a few accounts so the per-node account lookups do real work
+    for address in ("rHb9CJAWyB4rj91VRWn96DkukG4bwdtyTh", "rPT1Sjq2YGrBMTttX4GZHjKu9dyfzbpAYe"):
+        positions._positions[address] = {"xrp_drops": 0, "lines": {}, "updated": 0.0}
+        open_offers._offers[address] = {"offers": {}, "updated": 0.0}
+    consumers = [
+        positions.on_transaction,
+        open_offers.on_transaction,
+        BookCache().on_transaction,
+        AMMPools(client=None, ledger_scheduler=ledger_scheduler).on_transaction,
+    ]
+    if with_detector:
+        consumers.append(ListingDetector().detect)
+    return consumers, ledger_scheduler
+
+
+def replay(lines: list, with_detector: bool) -> tuple:
+    """Decodes and dispatches every line; returns (elapsed seconds, listing events)."""
+    consumers, ledger_scheduler = make_consumers(with_detector)
+    events = 0
+    start = time.perf_counter()
+    for line in lines:
+        message = json.loads(line)
+        if message.get("type") == "ledgerClosed":
+            ledger_scheduler.on_ledger_closed(message)
+        elif message.get("type") == "transaction" and message.get("validated"):
+            for consumer in consumers:
+                result = consumer(message)
+                if result:
+                    events += len(result)
+    return time.perf_counter() - start, events
+
+
+def main_replay(path: str, repeat: int):
+    with open(path) as f:
+        lines = [line for line in f if line.strip()]
+    lines = lines * repeat
+    transactions = sum(1 for line in lines if '"type":"transaction"' in line.replace(" ", ""))
+
+    # Warm up imports and caches before timing
+    replay(lines[:1000], True)
+    baseline, _ = replay(lines, False)
+    detector, events = replay(lines, True)
+
+    print(f"{len(lines)} messages ({transactions} transactions), {events} listing event(s)")
+    print(f"  without detector: {len(lines) / baseline:10.0f} msg/s")
+    print(f"  with detector:    {len(lines) / detector:10.0f} msg/s")
+    print(f"  detector cost:    {(detector - baseline) / max(transactions, 1) * 1e6:10.2f} us/transaction")
+
+
+def replay_logging(lines: list, mode: str, sink) -> tuple:
+    """Replays with the hot-path log calls of one logging mode; returns (replay seconds, drain seconds)."""
+    logging_setup.shutdown()
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    if mode == "sync":
+        # The previous setup: basicConfig stream handler, f-strings formatted on the calling thread
+        handler = logging.StreamHandler(sink)
+        handler.setFormatter(logging.Formatter(logging_setup.TEXT_FORMAT))
+        root.addHandler(handler)
+        root.setLevel(logging.INFO)
+    else:
+        logging_setup.configure(level="INFO", stream=sink,
+                                policies=logging_setup.DEFAULT_POLICIES if mode == "sampled" else {})
+    logger = logging.getLogger("xrp_sniper_logic_enhanced")
+    consumers, ledger_scheduler = make_consumers(True)
+    detector = consumers.pop()
+
+    start = time.perf_counter()
+    for line in lines:
+        message = json.loads(line)
+        if message.get("type") == "ledgerClosed":
+            ledger_scheduler.on_ledger_closed(message)
+        elif message.get("type") == "transaction" and message.get("validated"):
+            for consumer in consumers:
+                consumer(message)
+            transaction = message["transaction"]
+            if mode == "sync":
+                if transaction.get("TransactionType") == "OfferCreate":
+                    logger.debug(f"Detected OfferCreate transaction: {transaction.get('hash')}")
+                for event in detector(message):
+                    logger.info(f"Listing event {event['kind']} ({event['source']}): {event['ticker']} "
+                                f"({event['currency']}.{event['issuer']}) against XRP")
+            else:
+                if transaction.get("TransactionType") == "OfferCreate":
+                    logger.debug("Detected OfferCreate transaction: %s", transaction.get("hash"),
+                                 extra={"category": "ingest"})
+                for event in detector(message):
+                    logger.info("Listing event %s (%s): %s (%s.%s) against XRP", event["kind"], event["source"],
+                                event["ticker"], event["currency"], event["issuer"],
+                                extra={"category": "listing", "currency": event["currency"],
+                                       "issuer": event["issuer"]})
+    elapsed = time.perf_counter() - start
+    logging_setup.shutdown()  # Waits for the listener to write out the queue
+    return elapsed, time.perf_counter() - start - elapsed
+
+
+def main_logging(path: str, repeat: int):
+    with open(path) as f:
+        lines = [line for line in f if line.strip()] * repeat
+    print(f"{len(lines)} messages, log lines written to a temporary file")
+    for mode in ("sync", "queued", "sampled"):
+        with tempfile.TemporaryFile("w") as sink:
+            elapsed, drain = replay_logging(lines, mode, sink)
+            sink.flush()
+            written = sink.tell()
+        print(f"  {mode:8} {len(lines) / elapsed:10.0f} msg/s  drain {drain * 1000:8.1f} ms  {written / 1024:8.0f} KiB")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3 or sys.argv[1] not in ("record", "replay", "logging"):
+        print(__doc__)
+        sys.exit(1)
+    if sys.argv[1] == "record":
+        asyncio.run(record(sys.argv[2], int(sys.argv[3]) if len(sys.argv) > 3 else 10000))
+    elif sys.argv[1] == "logging":
+        main_logging(sys.argv[2], int(sys.argv[3]) if len(sys.argv) > 3 else 1)
+    else:
+        main_replay(sys.argv[2], int(sys.argv[3]) if len(sys.argv) > 3 else 1)
@@ -0,0 +1,69 @@
+"""Benchmark: signatures/second for inline signing vs the process-pool SigningService.
+
+Usage: python3 bench_signing.py [num_orders] [num_wallets]
+"""
+import asyncio
+import sys
+import time
+
+from xrpl.core import keypairs
+
+from signing_service import SigningService, derive_keys, sign_transaction
+
+
+def make_order(address: str, sequence: int) -> dict:
+    """Builds an XRPL-format OfferCreate like the ones _execute_buy_order submits."""
+    return {
+        "TransactionType": "OfferCreate",
+        "Account": address,
+        "TakerGets": {
+            "currency": "534F4C4F00000000000000000000000000000000",
+            "issuer": "rsoLo2S1kiGeCcn6hCUXVrCpGMWLrRrLZz",
+            "value": "12345.678"
+        },
+        "TakerPays": "25000000",
+        "Fee": "12",
+        "Sequence": sequence,
+        "LastLedgerSequence": 90000000,
+        "Flags": 0,
+    }
+
+
+async def main(num_orders: int, num_wallets: int):
+    seeds = [keypairs.generate_seed() for _ in range(num_wallets)]
+    wallets = [(derive_keys(seed), seed) for seed in seeds]
+    requests = [
+        (keys["address"], seed, make_order(keys["address"], i))
+        for i, (keys, seed) in ((i, wallets[i % num_wallets]) for i in range(num_orders))
+    ]
+
+    # Inline: what the event loop did before, including per-order key derivation
+    start = time.perf_counter()
+    for address, seed, tx_json in requests:
+        keys = derive_keys(seed)
+        sign_transaction(tx_json, keys["public_key"], keys["private_key"])
+    inline_elapsed = time.perf_counter() - start
+
+    service = SigningService()
+    # Warm the pool (process start-up and key caches) before measuring
+    await service.sign_batch(requests)
+
+    start = time.perf_counter()
+    await service.sign_batch(requests)
+    batch_elapsed = time.perf_counter() - start
+
+    start = time.perf_counter()
+    await asyncio.gather(*[service.sign(*request) for request in requests])
+    single_elapsed = time.perf_counter() - start
+    service.shutdown()
+
+    print(f"{num_orders} orders across {num_wallets} wallets, {service.max_workers} worker(s)")
+    print(f"  inline:           {num_orders / inline_elapsed:10.1f} sig/s")
+    print(f"  pool (batched):   {num_orders / batch_elapsed:10.1f} sig/s")
+    print(f"  pool (per order): {num_orders / single_elapsed:10.1f} sig/s")
+
+
+if __name__ == "__main__":
+    num_orders = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    num_wallets = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    asyncio.run(main(num_orders, num_wallets))
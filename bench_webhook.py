@@ -0,0 +1,178 @@
+"""Benchmark: update-to-handler latency of long polling vs the webhook receiver, against a stub Telegram server.
+
+The stub serves the Bot API methods the application calls (getMe,
+getUpdates, setWebhook, ...) on localhost and injects message updates at
+random intervals, like users pressing buttons. Every response and webhook
+delivery is delayed by half the simulated round-trip time. Latency is
+measured from injection to the handler running.
+
+Usage: python3 bench_webhook.py [num_updates] [rtt_ms] [mean_interval_ms]
+"""
+import asyncio
+import json
+import random
+import socket
+import statistics
+import sys
+import time
+from urllib.parse import parse_qs
+
+from telegram import Update
+from telegram.ext import Application, ContextTypes, MessageHandler, filters
+
+from http_server import HttpServer
+from telegram_webhook import start_webhook
+
+TOKEN = "123456:bench"
+SECRET = "bench-secret"
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def make_update(update_id: int) -> dict:
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id, "date": int(time.time()), "text": f"ping {update_id}",
+            "chat": {"id": 1, "type": "private"}, "from": {"id": 1, "is_bot": False, "first_name": "bench"},
+        },
+    }
+
+
+class StubTelegram:
+    """Bot API stand-in: long-polled getUpdates, or POSTs to the registered webhook."""
+
+    def __init__(self, port: int, rtt: float):
+        self.port = port
+        self.rtt = rtt
+        self.http = HttpServer(host="127.0.0.1", port=port)
+        self.pending = []  # Updates not yet fetched by getUpdates
+        self.injected = {}  # Structure: {update_id: perf_counter time of injection}
+        self.webhook = None  # Structure: (url, secret)
+        self._arrived = asyncio.Event()
+        for method, handler in (("getMe", self.get_me), ("getUpdates", self.get_updates),
+                                ("setWebhook", self.set_webhook), ("deleteWebhook", self.delete_webhook)):
+            self.http.route("POST", f"/bot{TOKEN}/{method}", handler)
+
+    @staticmethod
+    def params(request: dict) -> dict:
+        if request["headers"].get("content-type", "").startswith("application/json"):
+            return json.loads(request["body"] or b"{}")
+        return {key: values[0] for key, values in parse_qs(request["body"].decode()).items()}
+
+    async def reply(self, result) -> tuple:
+        await asyncio.sleep(self.rtt / 2)
+        return 200, "application/json", json.dumps({"ok": True, "result": result})
+
+    async def get_me(self, request: dict) -> tuple:
+        return await self.reply({"id": 123456, "is_bot": True, "first_name": "Bench", "username": "bench_bot"})
+
+    async def set_webhook(self, request: dict) -> tuple:
+        params = self.params(request)
+        self.webhook = (params["url"], params.get("secret_token", ""))
+        return await self.reply(True)
+
+    async def delete_webhook(self, request: dict) -> tuple:
+        self.webhook = None
+        return await self.reply(True)
+
+    async def get_updates(self, request: dict) -> tuple:
+        params = self.params(request)
+        offset = int(params.get("offset") or 0)
+        self.pending = [update for update in self.pending if update["update_id"] >= offset]
+        if not self.pending:
+            # Long poll: hold the request until an update arrives or the timeout passes
+            self._arrived.clear()
+            try:
+                await asyncio.wait_for(self._arrived.wait(), float(params.get("timeout") or 0))
+            except asyncio.TimeoutError:
+                pass
+        return await self.reply(list(self.pending))
+
+    async def inject(self, update_id: int):
+        update = make_update(update_id)
+        self.injected[update_id] = time.perf_counter()
+        if self.webhook is None:
+            self.pending.append(update)
+            self._arrived.set()
+            return
+        await asyncio.sleep(self.rtt / 2)
+        url, secret = self.webhook
+        host_port, _, path = url.split("://", 1)[1].partition("/")
+        host, _, port = host_port.partition(":")
+        body = json.dumps(update).encode()
+        reader, writer = await asyncio.open_connection(host, int(port))
+        writer.write(
+            f"POST /{path} HTTP/1.1\r\nHost: {host_port}\r\nContent-Type: application/json\r\n"
+            f"X-Telegram-Bot-Api-Secret-Token: {secret}\r\nContent-Length: {len(body)}\r\n\r\n".encode() + body
+        )
+        await writer.drain()
+        await reader.read()
+        writer.close()
+
+
+async def run(mode: str, num_updates: int, rtt: float, mean_interval: float) -> list:
+    """Runs one mode; returns update-to-handler latencies in seconds."""
+    stub = StubTelegram(free_port(), rtt)
+    stub_task = asyncio.create_task(stub.http.serve())
+    latencies = []
+    done = asyncio.Event()
+
+    async def on_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
+        latencies.append(time.perf_counter() - stub.injected[update.update_id])
+        if len(latencies) == num_updates:
+            done.set()
+
+    application = (
+        Application.builder().token(TOKEN).base_url(f"http://127.0.0.1:{stub.port}/bot").build()
+    )
+    application.add_handler(MessageHandler(filters.TEXT, on_message))
+    await asyncio.sleep(0.1)  # Let the stub start listening
+    await application.initialize()
+
+    receiver = HttpServer(host="127.0.0.1", port=free_port())
+    receiver_task = asyncio.create_task(receiver.serve())
+    if mode == "webhook":
+        await asyncio.sleep(0.1)
+        await start_webhook(application, receiver, url=f"http://127.0.0.1:{receiver.port}", secret=SECRET)
+    else:
+        await application.updater.start_polling(poll_interval=0, timeout=10)
+    await application.start()
+
+    for update_id in range(1, num_updates + 1):
+        await asyncio.sleep(random.expovariate(1 / mean_interval))
+        asyncio.create_task(stub.inject(update_id))
+    await asyncio.wait_for(done.wait(), 30)
+
+    if application.updater.running:
+        await application.updater.stop()
+    await application.stop()
+    await application.shutdown()
+    for task in (receiver_task, stub_task):
+        task.cancel()
+    return latencies
+
+
+def report(mode: str, latencies: list):
+    ordered = sorted(latencies)
+    p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+    print(f"  {mode:8} mean {statistics.mean(ordered) * 1000:7.1f} ms  p50 {statistics.median(ordered) * 1000:7.1f} ms"
+          f"  p99 {p99 * 1000:7.1f} ms  max {ordered[-1] * 1000:7.1f} ms")
+
+
+async def main(num_updates: int, rtt_ms: float, mean_interval_ms: float):
+    print(f"{num_updates} updates, {rtt_ms:g} ms simulated RTT, one every {mean_interval_ms:g} ms on average")
+    for mode in ("polling", "webhook"):
+        report(mode, await run(mode, num_updates, rtt_ms / 1000, mean_interval_ms / 1000))
+
+
+if __name__ == "__main__":
+    asyncio.run(main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 200,
+        float(sys.argv[2]) if len(sys.argv) > 2 else 50,
+        float(sys.argv[3]) if len(sys.argv) > 3 else 100,
+    ))
@@ -1,19 +1,29 @@
 import logging
 import asyncio
+import html
+import io
 import os
+import signal
+import time
 import uuid
+from datetime import datetime, timedelta, timezone
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import Application, CommandHandler, MessageHandler, filters, ContextTypes, CallbackQueryHandler
+from telegram.request import HTTPXRequest
+
+import logging_setup
+import metrics
+from profiler import SamplingProfiler, format_top
 
 # Import functions from xrpl_client.py
 from xrpl_client import generate_new_wallet_sync, import_wallet, get_account_info
 # Import XRPSniper class
-from xrp_sniper_logic_enhanced import XRPSniper
+from xrp_sniper_logic_enhanced import XRPSniper, OFFER_MODES, DEFAULT_OFFER_TTL
+from ticker_match import split_patterns
+from telegram_webhook import WEBHOOK_URL, start_webhook
 
-# Enable logging
-logging.basicConfig(
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s", level=logging.INFO
-)
+# Enable logging (queued to a background writer thread; see logging_setup)
+logging_setup.configure()
 logging.getLogger("httpx").setLevel(logging.WARNING)
 
 logger = logging.getLogger(__name__)
@@ -21,6 +31,28 @@ logger = logging.getLogger(__name__)
 # Global sniper instance
 sniper = XRPSniper()
 
+TELEGRAM_LATENCY = metrics.histogram("telegram_request_seconds", "Telegram Bot API request latency by method")
+
+
+class InstrumentedRequest(HTTPXRequest):
+    """HTTPXRequest that records Bot API latency per method (sendMessage, editMessageText, ...)."""
+
+    async def do_request(self, url: str, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return await super().do_request(url, *args, **kwargs)
+        finally:
+            TELEGRAM_LATENCY.observe(time.perf_counter() - started, method=url.rsplit("/", 1)[-1])
+
+# Telegram user ids allowed to run admin commands (comma-separated)
+ADMIN_USER_IDS = {int(user_id) for user_id in os.getenv("ADMIN_USER_IDS", "").split(",") if user_id.strip()}
+
+def is_admin(update: Update) -> bool:
+    return update.effective_user is not None and update.effective_user.id in ADMIN_USER_IDS
+
+# On-demand profiler for the admin /profile command
+profiler = SamplingProfiler()
+
 # --- Bot Command Handlers ---
 
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
@@ -40,16 +72,181 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     else:
         await update.message.reply_html(message_text, reply_markup=reply_markup)
 
+async def health(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Admin-only: reports background service and stream health."""
+    if not is_admin(update):
+        return
+    state = sniper.get_health()
+    message_text = "🩺 Health\n\n"
+    for service in state["services"]:
+        emoji = {"running": "🟢", "backoff": "🟠"}.get(service["state"], "⚪")
+        message_text += f"{emoji} {service['name']}: {service['state']}"
+        if service["state"] == "running":
+            message_text += f" for {service['uptime']:.0f}s"
+        message_text += f", {service['restarts']} restart(s)\n"
+        if service["last_error"]:
+            ago = time.time() - service["last_error_time"]
+            message_text += f"    last error {ago:.0f}s ago: {service['last_error'][:200]}\n"
+    message_text += (
+        f"\nStream: {'running' if state['stream_running'] else 'stopped'}\n"
+        f"Armed configs: {state['armed_configs']} (+{state['warming_configs']} warming up)\n"
+        f"Orders in flight: {state['inflight_orders']}, snipes: {state['snipes_in_flight']}, "
+        f"sliced: {state['sliced_orders_running']}\n"
+    )
+    lag = state["loop_lag"]
+    message_text += (
+        f"Loop lag: p50 {lag['p50'] * 1000:.1f}ms, p99 {lag['p99'] * 1000:.1f}ms, "
+        f"max {lag['max'] * 1000:.0f}ms, {lag['stalls']} stall(s)\n"
+    )
+    ledger = state["ledger"]
+    inclusion = "n/a" if ledger["inclusion_rate"] is None else f"{ledger['inclusion_rate'] * 100:.0f}%"
+    message_text += (
+        f"Ledger {ledger['validated_ledger_index']}: closes every {ledger['close_interval']:.2f}s, "
+        f"avg {ledger['avg_txn_count'] if ledger['avg_txn_count'] is not None else 'n/a'} txns, "
+        f"{ledger['orders_included_next_ledger']}/{ledger['orders_submitted']} orders in the next ledger "
+        f"({inclusion})\n"
+    )
+    if state["last_stall"]:
+        ago = time.time() - state["last_stall"]["time"]
+        # The innermost frames are the blocking call
+        frames = state["last_stall"]["stack"].strip().splitlines()[-4:]
+        message_text += f"Last stall {ago:.0f}s ago in:\n" + "\n".join(frames) + "\n"
+    if state["draining"]:
+        message_text += "⏳ Draining for shutdown\n"
+    await update.message.reply_text(message_text)
+
+async def profile(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Admin-only: /profile [seconds] samples the event loop and worker threads and sends back collapsed stacks and hot functions."""
+    if not is_admin(update):
+        return
+    try:
+        seconds = float(context.args[0]) if context.args else 10.0
+    except ValueError:
+        await update.message.reply_text("Usage: /profile [seconds]")
+        return
+    if profiler.running:
+        await update.message.reply_text("A profile is already running.")
+        return
+    await update.message.reply_text(f"⏱️ Profiling the event loop and worker threads for {min(max(seconds, 1), 120):.0f}s...")
+    # Profile in the background so the bot keeps handling updates while it samples them
+    context.application.create_task(send_profile(update, seconds))
+
+async def send_profile(update: Update, seconds: float) -> None:
+    """Runs a profile and replies with the collapsed stacks file and the hot-function table."""
+    try:
+        report = await profiler.profile(seconds)
+    except RuntimeError as e:
+        await update.message.reply_text(f"❌ {e}")
+        return
+    filename = f"profile-{time.strftime('%Y%m%d-%H%M%S')}.folded"
+    await update.message.reply_document(
+        document=io.BytesIO(report["collapsed"].encode()), filename=filename,
+        caption=f"{report['samples']} samples over {report['seconds']:.1f}s (flamegraph.pl / speedscope format)"
+    )
+    await update.message.reply_text(f"<pre>{html.escape(format_top(report))[:3900]}</pre>", parse_mode="HTML")
+
 async def positions_menu(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Displays the positions menu."""
+    open_offers = await sniper.get_open_offers(update.effective_user.id)
     keyboard = [
         [InlineKeyboardButton("💰 View My Positions", callback_data="view_positions")],
+        [InlineKeyboardButton(f"📋 Open Orders ({len(open_offers)})", callback_data="open_orders")],
+        [InlineKeyboardButton("📜 Trade History", callback_data="trade_history")],
+        [InlineKeyboardButton("🧩 Sliced Orders", callback_data="sliced_orders")],
         [InlineKeyboardButton("↩️ Back to Main Menu", callback_data="start")],
     ]
     reply_markup = InlineKeyboardMarkup(keyboard)
     message_text = "Here you can view and manage your token positions."
     await update.callback_query.edit_message_text(message_text, reply_markup=reply_markup)
 
+async def trade_history(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Displays the user's most recent order attempts from the trade journal."""
+    user_id = update.effective_user.id
+    trades = await sniper.get_trade_history(user_id, limit=10)
+
+    message_text = "📜 Trade History (last 10)\n\n"
+    if not trades:
+        message_text += "No trades recorded yet."
+    for trade in trades:
+        status_emoji = "✅" if trade["engine_result"] == "tesSUCCESS" else "❌"
+        message_text += f"{status_emoji} {trade['side'].upper()} {trade['currency']}"
+        if trade["size_token"]:
+            message_text += f": {trade['size_token']:.6g} for {trade['size_xrp']:.6g} XRP"
+        else:
+            message_text += f": {trade['engine_result']}"
+        message_text += f" ({trade['latency_ms']:.0f} ms)\n"
+
+    keyboard = [
+        [InlineKeyboardButton("🔄 Refresh", callback_data="trade_history")],
+        [InlineKeyboardButton("↩️ Back to Positions Menu", callback_data="positions_menu")],
+    ]
+    reply_markup = InlineKeyboardMarkup(keyboard)
+    await update.callback_query.edit_message_text(message_text, reply_markup=reply_markup)
+
+async def open_orders(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Displays the user's resting DEX offers."""
+    user_id = update.effective_user.id
+    offers = await sniper.get_open_offers(user_id)
+
+    def describe(amount):
+        if isinstance(amount, str):
+            return f"{int(amount) / 1_000_000:.6g} XRP"
+        return f"{float(amount['value']):.6g} {amount['currency']}"
+
+    message_text = f"📋 Open Orders ({len(offers)})\n\n"
+    if not offers:
+        message_text += "No open orders."
+    for offer in offers[:20]:
+        message_text += f"• #{offer['sequence']}: pay {describe(offer['taker_gets'])} for {describe(offer['taker_pays'])}\n"
+    if len(offers) > 20:
+        message_text += f"...and {len(offers) - 20} more\n"
+
+    keyboard = []
+    if offers:
+        keyboard.append([InlineKeyboardButton("🗑 Cancel All", callback_data="cancel_all_offers")])
+    keyboard.append([InlineKeyboardButton("🔄 Refresh", callback_data="open_orders")])
+    keyboard.append([InlineKeyboardButton("↩️ Back to Positions Menu", callback_data="positions_menu")])
+    await update.callback_query.edit_message_text(message_text, reply_markup=InlineKeyboardMarkup(keyboard))
+
+async def sliced_orders(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Displays the progress of the user's sliced (TWAP/iceberg) orders."""
+    user_id = update.effective_user.id
+    orders = sniper.get_sliced_orders(user_id)
+
+    message_text = "🧩 Sliced Orders\n\n"
+    keyboard = []
+    if not orders:
+        message_text += "No sliced orders. Start one from a token's buy or sell menu."
+    for order in orders:
+        unit = "XRP" if order["side"] == "buy" else order["currency"]
+        progress = order["filled"] / order["total"] * 100 if order["total"] else 0
+        message_text += (
+            f"• {order['side'].upper()} {order['currency']} [{order['status']}]: "
+            f"{order['filled']:.6g}/{order['total']:.6g} {unit} ({progress:.0f}%), {order['slices']} slice(s)\n"
+        )
+        if order["status"] == "running":
+            keyboard.append([InlineKeyboardButton(
+                f"⏹ Cancel {order['side']} {order['currency']} ({order['id']})",
+                callback_data=f"slice_cancel_{order['id']}"
+            )])
+
+    keyboard.append([InlineKeyboardButton("🔄 Refresh", callback_data="sliced_orders")])
+    keyboard.append([InlineKeyboardButton("↩️ Back to Positions Menu", callback_data="positions_menu")])
+    await update.callback_query.edit_message_text(message_text, reply_markup=InlineKeyboardMarkup(keyboard))
+
+async def sliced_order_prompt(update: Update, context: ContextTypes.DEFAULT_TYPE, side: str, currency: str, issuer: str) -> None:
+    """Prompts user for the parameters of a sliced order."""
+    context.user_data["awaiting_input"] = f"sliced_{side}_{currency}_{issuer}"
+    amount = "total XRP to spend" if side == "buy" else "percentage of holdings to sell"
+    limit = "max price" if side == "buy" else "min price"
+    await update.callback_query.edit_message_text(
+        f"🧩 Sliced {side} of {currency}\n\n"
+        f"Send: <{amount}> <number of slices or 'auto'> [seconds between slices] [{limit} in XRP]\n"
+        f"Example: 100 10 5\n\n"
+        f"'auto' sizes each slice to the best level of the order book. "
+        f"Slices are immediate-or-cancel, so nothing rests on the book."
+    )
+
 async def buy_menu(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Displays the buy menu and prompts for contract address."""
     keyboard = [
@@ -116,43 +313,36 @@ async def show_token_buy_options(update: Update, context: ContextTypes.DEFAULT_T
     """Show token details and buy preset buttons."""
     user_id = update.effective_user.id
     
-    # Get token info from order book
+    # Quote every preset on the best of the AMM pool and the order book
+    preset_amounts = (25, 50, 100, 250, 500)
+    quotes = {}
     try:
-        offers = sniper.get_order_book("XRP", None, currency, issuer)
-        
-        if offers:
-            first_offer = offers[0]
-            taker_gets = first_offer.get("TakerGets")
-            taker_pays = first_offer.get("TakerPays")
-            
-            if isinstance(taker_gets, dict) and isinstance(taker_pays, str):
-                token_amount = float(taker_gets.get("value", 0))
-                xrp_amount = float(taker_pays) / 1_000_000
-                
-                if xrp_amount > 0:
-                    rate = token_amount / xrp_amount
-                    price_info = f"💱 **Price:** {rate:.6f} {currency} per XRP\n"
-                    price_info += f"📊 **Available:** {token_amount:.2f} {currency} for {xrp_amount:.2f} XRP\n\n"
-                else:
-                    price_info = "⚠️ Unable to determine price from order book.\n\n"
+        offers = await sniper.get_order_book("XRP", None, currency, issuer)
+        for amount in preset_amounts:
+            quotes[amount] = await sniper.quote_buy(currency, issuer, amount, offers)
+
+        quote = quotes[preset_amounts[0]]
+        if quote:
+            venue = "AMM pool" if quote["route"] == "amm" else "order book"
+            price_info = f"💱 **Price:** {1 / quote['price']:.6f} {currency} per XRP (via {venue})\n"
+            if quote["amm"] is not None and quote["book"] is not None:
+                price_info += f"📊 **{preset_amounts[0]} XRP buys:** {quote['amm']:.2f} on AMM, {quote['book']:.2f} on book\n\n"
             else:
-                price_info = "⚠️ Unable to determine price from order book.\n\n"
+                price_info += "\n"
         else:
-            price_info = "⚠️ No active offers found in order book.\n\n"
+            price_info = "⚠️ No AMM pool or active offers found for this token.\n\n"
     except Exception as e:
         logger.error(f"Error fetching token info: {e}")
         price_info = "⚠️ Error fetching token information.\n\n"
     
     # Create buy preset buttons
-    keyboard = [
-        [InlineKeyboardButton("25 XRP", callback_data=f"execute_buy_{currency}_{issuer}_25")],
-        [InlineKeyboardButton("50 XRP", callback_data=f"execute_buy_{currency}_{issuer}_50")],
-        [InlineKeyboardButton("100 XRP", callback_data=f"execute_buy_{currency}_{issuer}_100")],
-        [InlineKeyboardButton("250 XRP", callback_data=f"execute_buy_{currency}_{issuer}_250")],
-        [InlineKeyboardButton("500 XRP", callback_data=f"execute_buy_{currency}_{issuer}_500")],
-        [InlineKeyboardButton("🔢 Custom Amount", callback_data=f"custom_buy_{currency}_{issuer}")],
-        [InlineKeyboardButton("↩️ Back to Buy Menu", callback_data="buy_menu")],
-    ]
+    keyboard = []
+    for amount in preset_amounts:
+        quote = quotes.get(amount)
+        label = f"{amount} XRP ≈ {quote['tokens_out']:.2f} {currency}" if quote else f"{amount} XRP"
+        keyboard.append([InlineKeyboardButton(label, callback_data=f"execute_buy_{currency}_{issuer}_{amount}")])
+    keyboard.append([InlineKeyboardButton("🔢 Custom Amount", callback_data=f"custom_buy_{currency}_{issuer}")])
+    keyboard.append([InlineKeyboardButton("↩️ Back to Buy Menu", callback_data="buy_menu")])
     reply_markup = InlineKeyboardMarkup(keyboard)
     
     message_text = f"💰 **Token Details**\n\n"
@@ -182,10 +372,11 @@ async def execute_buy_from_menu(update: Update, context: ContextTypes.DEFAULT_TY
     # Get default slippage or use 1%
     default_settings = sniper.default_trade_settings.get(user_id, {})
     slippage = default_settings.get("slippage", 1.0) / 100  # Convert to decimal
+    max_fee_xrp = default_settings.get("max_gas_fee")
     mev_protect = sniper.get_mev_protection_status(user_id)
     
     # Execute the buy order
-    success = await sniper._execute_buy_order(user_id, currency, issuer, amount_xrp, slippage, mev_protect)
+    success = await sniper._execute_buy_order(user_id, currency, issuer, amount_xrp, slippage, mev_protect, max_fee_xrp)
     
     if success:
         message_text = f"✅ **Buy Order Successful!**\n\n"
@@ -259,6 +450,7 @@ async def create_new_sniper_config(update: Update, context: ContextTypes.DEFAULT
         "buy_amount_xrp": None,
         "slippage": None,
         "max_gas_fee": None,
+        "only_new_tokens": False,
         "enabled": False
     }
     
@@ -276,6 +468,11 @@ async def show_sniper_config_editor(update: Update, context: ContextTypes.DEFAUL
         [InlineKeyboardButton(f"💰 Buy Amount: {config.get('buy_amount_xrp', 'Not Set')} XRP", callback_data="edit_buy_amount")],
         [InlineKeyboardButton(f"📉 Slippage: {config.get('slippage', 'Not Set')}%", callback_data="edit_slippage")],
         [InlineKeyboardButton(f"⛽ Max Gas Fee: {config.get('max_gas_fee', 'Not Set')} XRP", callback_data="edit_max_gas_fee")],
+        [InlineKeyboardButton(f"🆕 Only New Tokens: {'ON' if config.get('only_new_tokens') else 'OFF'}", callback_data="toggle_only_new_tokens")],
+        [InlineKeyboardButton(f"📈 Activity Trigger: {format_activity_rule(config.get('activity'))}", callback_data="edit_activity")],
+        [InlineKeyboardButton(f"🛡️ Issuer Filter: {format_risk_rule(config.get('risk'))}", callback_data="edit_risk")],
+        [InlineKeyboardButton(f"💧 Liquidity Filter: {format_market_rule(config.get('market'))}", callback_data="edit_market")],
+        [InlineKeyboardButton(f"🗓️ Schedule: {format_schedule(config)}", callback_data="edit_schedule")],
         [InlineKeyboardButton("✅ Save Config", callback_data="save_sniper_config")],
         [InlineKeyboardButton("❌ Cancel", callback_data="sniper_menu")],
     ]
@@ -289,14 +486,155 @@ async def show_sniper_config_editor(update: Update, context: ContextTypes.DEFAUL
     message_text += f"Dev Wallet: {config.get('dev_wallet_address', 'Not Set')}\n"
     message_text += f"Buy Amount: {config.get('buy_amount_xrp', 'Not Set')} XRP\n"
     message_text += f"Slippage: {config.get('slippage', 'Not Set')}%\n"
-    message_text += f"Max Gas Fee: {config.get('max_gas_fee', 'Not Set')} XRP\n\n"
-    message_text += "Click on any field to edit it."
+    message_text += f"Max Gas Fee: {config.get('max_gas_fee', 'Not Set')} XRP\n"
+    message_text += f"Only New Tokens: {'ON' if config.get('only_new_tokens') else 'OFF'}\n"
+    message_text += f"Activity Trigger: {format_activity_rule(config.get('activity'))}\n"
+    message_text += f"Issuer Filter: {format_risk_rule(config.get('risk'))}\n"
+    message_text += f"Liquidity Filter: {format_market_rule(config.get('market'))}\n"
+    message_text += f"Schedule: {format_schedule(config)}\n\n"
+    message_text += "Click on any field to edit it.\n"
+    message_text += "Only New Tokens skips listings of tokens that have traded against XRP before.\n"
+    message_text += "Activity Trigger buys any token whose activity crosses all the thresholds you set.\n"
+    message_text += "Issuer Filter skips tokens whose issuer fails any of the checks you set.\n"
+    message_text += "Liquidity Filter skips thin, overpriced or out-of-range supply tokens.\n"
+    message_text += "Schedule limits when an enabled config is live and how many buys it makes."
     
     if update.callback_query:
         await update.callback_query.edit_message_text(message_text, reply_markup=reply_markup)
     else:
         await update.message.reply_text(message_text, reply_markup=reply_markup)
 
+ACTIVITY_RULE_KEYS = {"trustlines": int, "offers": int, "accounts": int, "volume": float, "window": int}
+
+def format_activity_rule(rule: dict) -> str:
+    """Formats an activity trigger as the user typed it, e.g. "trustlines=50 window=120"."""
+    if not rule:
+        return "Not Set"
+    names = {"unique_accounts": "accounts", "volume_xrp": "volume"}
+    return " ".join(f"{names.get(key, key)}={value}" for key, value in rule.items())
+
+def parse_activity_rule(text: str) -> dict:
+    """Parses "trustlines=50 accounts=20 volume=500 offers=10 window=120"; raises ValueError if invalid."""
+    names = {"accounts": "unique_accounts", "volume": "volume_xrp"}
+    rule = {}
+    for part in text.split():
+        key, _, value = part.partition("=")
+        if key not in ACTIVITY_RULE_KEYS or not value:
+            raise ValueError(f"Unknown activity setting: {part}")
+        rule[names.get(key, key)] = ACTIVITY_RULE_KEYS[key](value)
+    if not any(value > 0 for key, value in rule.items() if key != "window"):
+        raise ValueError("Set at least one threshold")
+    if not 10 <= rule.get("window", 120) <= 900:
+        raise ValueError("Window must be between 10 and 900 seconds")
+    return rule
+
+RISK_RULE_FLAGS = {"blackholed": "blackholed", "no_freeze": "no_freeze", "no_clawback": "no_clawback", "no_auth": "no_require_auth"}
+
+def format_risk_rule(rule: dict) -> str:
+    """Formats issuer requirements as the user typed them, e.g. "blackholed no_freeze max_fee=1"."""
+    if not rule:
+        return "Not Set"
+    names = {value: key for key, value in RISK_RULE_FLAGS.items()}
+    parts = [names[key] for key in rule if key in names and rule[key]]
+    if rule.get("max_transfer_fee") is not None:
+        parts.append(f"max_fee={rule['max_transfer_fee']:g}")
+    return " ".join(parts)
+
+def parse_risk_rule(text: str) -> dict:
+    """Parses "blackholed no_freeze no_clawback no_auth max_fee=1"; raises ValueError if invalid."""
+    rule = {}
+    for part in text.split():
+        key, _, value = part.partition("=")
+        if key in RISK_RULE_FLAGS and not value:
+            rule[RISK_RULE_FLAGS[key]] = True
+        elif key == "max_fee" and value:
+            rule["max_transfer_fee"] = float(value.rstrip("%"))
+            if not 0 <= rule["max_transfer_fee"] <= 100:
+                raise ValueError("Max fee must be between 0 and 100%")
+        else:
+            raise ValueError(f"Unknown issuer check: {part}")
+    if not rule:
+        raise ValueError("Set at least one check")
+    return rule
+
+MARKET_RULE_KEYS = {"depth": "min_depth_xrp", "band": "depth_pct", "price": "max_price",
+                    "min_supply": "min_supply", "max_supply": "max_supply"}
+
+def format_market_rule(rule: dict) -> str:
+    """Formats liquidity criteria as the user typed them, e.g. "depth=100 band=5 price=0.001"."""
+    if not rule:
+        return "Not Set"
+    names = {value: key for key, value in MARKET_RULE_KEYS.items()}
+    return " ".join(f"{names.get(key, key)}={value:g}" for key, value in rule.items())
+
+def parse_market_rule(text: str) -> dict:
+    """Parses "depth=100 band=5 price=0.001 min_supply=1000000 max_supply=1e9"; raises ValueError if invalid."""
+    rule = {}
+    for part in text.split():
+        key, _, value = part.partition("=")
+        if key not in MARKET_RULE_KEYS or not value:
+            raise ValueError(f"Unknown liquidity setting: {part}")
+        rule[MARKET_RULE_KEYS[key]] = float(value.rstrip("%"))
+        if rule[MARKET_RULE_KEYS[key]] < 0:
+            raise ValueError(f"{key} cannot be negative")
+    if not any(value > 0 for key, value in rule.items() if key != "depth_pct"):
+        raise ValueError("Set at least one limit")
+    if not 0 < rule.get("depth_pct", 5) < 100:
+        raise ValueError("Band must be between 0 and 100%")
+    if rule.get("min_supply") and rule.get("max_supply") and rule["min_supply"] > rule["max_supply"]:
+        raise ValueError("min_supply is above max_supply")
+    return rule
+
+def _format_time(timestamp: float) -> str:
+    return datetime.fromtimestamp(timestamp, timezone.utc).strftime("%Y-%m-%d %H:%M UTC")
+
+def _parse_time(value: str, now: float) -> float:
+    """Parses "+30m"/"+2h"/"+1d" (from now), "HH:MM" (next occurrence, UTC) or "YYYY-MM-DDTHH:MM" (UTC)."""
+    if value.startswith("+"):
+        units = {"m": 60, "h": 3600, "d": 86400}
+        if value[-1] not in units:
+            raise ValueError(f"Unknown time offset: {value}")
+        return now + float(value[1:-1]) * units[value[-1]]
+    if len(value) <= 5 and ":" in value:
+        hours, minutes = (int(part) for part in value.split(":"))
+        current = datetime.fromtimestamp(now, timezone.utc)
+        moment = current.replace(hour=hours, minute=minutes, second=0, microsecond=0)
+        if moment.timestamp() <= now:
+            moment += timedelta(days=1)
+        return moment.timestamp()
+    return datetime.fromisoformat(value).replace(tzinfo=timezone.utc).timestamp()
+
+def format_schedule(config: dict) -> str:
+    """Formats a config's activation window and fire limit, e.g. "from 2026-10-20 18:00 UTC, 1 fire(s)"."""
+    parts = []
+    if config.get("active_from"):
+        parts.append(f"from {_format_time(config['active_from'])}")
+    if config.get("active_until"):
+        parts.append(f"until {_format_time(config['active_until'])}")
+    if config.get("max_fires"):
+        parts.append(f"{config.get('fires', 0)}/{config['max_fires']} fire(s)")
+    return ", ".join(parts) if parts else "Always"
+
+def parse_schedule(text: str) -> dict:
+    """Parses "from=18:00 until=+2h fires=1"; raises ValueError if invalid."""
+    now = time.time()
+    schedule = {"active_from": None, "active_until": None, "max_fires": None}
+    for part in text.split():
+        key, _, value = part.partition("=")
+        if key == "from" and value:
+            schedule["active_from"] = _parse_time(value, now)
+        elif key == "until" and value:
+            schedule["active_until"] = _parse_time(value, now)
+        elif key == "fires" and value:
+            schedule["max_fires"] = int(value)
+            if schedule["max_fires"] < 1:
+                raise ValueError("Fires must be at least 1")
+        else:
+            raise ValueError(f"Unknown schedule setting: {part}")
+    if schedule["active_until"] is not None and schedule["active_until"] <= max(now, schedule["active_from"] or 0):
+        raise ValueError("The window must end in the future and after it starts")
+    return schedule
+
 async def view_sniper_config(update: Update, context: ContextTypes.DEFAULT_TYPE, config_id: str) -> None:
     """View and manage a specific sniper config."""
     user_id = update.effective_user.id
@@ -308,6 +646,8 @@ async def view_sniper_config(update: Update, context: ContextTypes.DEFAULT_TYPE,
         return
     
     status_emoji = "🟢 ON" if config.get("enabled", False) else "🔴 OFF"
+    if config.get("enabled", False) and not sniper.is_config_armed(user_id, config_id):
+        status_emoji = "🟡 ON, waiting for its window"
     toggle_text = "🔴 Disable" if config.get("enabled", False) else "🟢 Enable"
     
     keyboard = [
@@ -327,6 +667,11 @@ async def view_sniper_config(update: Update, context: ContextTypes.DEFAULT_TYPE,
     message_text += f"  • Buy Amount: {config.get('buy_amount_xrp', 'Not Set')} XRP\n"
     message_text += f"  • Slippage: {config.get('slippage', 'Not Set')}%\n"
     message_text += f"  • Max Gas Fee: {config.get('max_gas_fee', 'Not Set')} XRP\n"
+    message_text += f"  • Only New Tokens: {'ON' if config.get('only_new_tokens') else 'OFF'}\n"
+    message_text += f"  • Activity Trigger: {format_activity_rule(config.get('activity'))}\n"
+    message_text += f"  • Issuer Filter: {format_risk_rule(config.get('risk'))}\n"
+    message_text += f"  • Liquidity Filter: {format_market_rule(config.get('market'))}\n"
+    message_text += f"  • Schedule: {format_schedule(config)}\n"
     await update.callback_query.edit_message_text(message_text, reply_markup=reply_markup)
 
 async def toggle_sniper_config(update: Update, context: ContextTypes.DEFAULT_TYPE, config_id: str) -> None:
@@ -340,12 +685,9 @@ async def toggle_sniper_config(update: Update, context: ContextTypes.DEFAULT_TYP
     
     # Toggle the enabled status
     new_status = not config.get("enabled", False)
+    # The sniper starts or stops the stream itself as configs are armed and disarmed
     sniper.update_sniper_config_status(user_id, config_id, new_status)
     
-    # If enabling, start the sniper task if not already running
-    if new_status and (not sniper.sniper_task or sniper.sniper_task.done()):
-        sniper.sniper_task = context.application.create_task(sniper.start_sniper())
-    
     status_text = "enabled" if new_status else "disabled"
     await update.callback_query.answer(f"Sniper config {status_text}!")
     
@@ -361,9 +703,11 @@ async def save_sniper_config(update: Update, context: ContextTypes.DEFAULT_TYPE)
         await update.callback_query.answer("No config to save!")
         return
     
-    # Validate required fields
-    required_fields = ["ticker", "coin_name", "buy_amount_xrp", "slippage"]
+    # Validate required fields: trade size plus at least one way to match a token
+    required_fields = ["buy_amount_xrp", "slippage"]
     missing_fields = [field for field in required_fields if not config.get(field)]
+    if not any(config.get(field) for field in ("ticker", "coin_name", "dev_wallet_address", "activity")):
+        missing_fields.append("ticker, coin name, dev wallet or activity trigger")
     
     if missing_fields:
         await update.callback_query.answer(f"Please set: {', '.join(missing_fields)}", show_alert=True)
@@ -435,10 +779,15 @@ async def buy_sell_settings(update: Update, context: ContextTypes.DEFAULT_TYPE)
         [InlineKeyboardButton(f"💲 Default Buy Amount: {current_settings.get('buy_amount_xrp', 'Not Set')} XRP", callback_data="set_default_buy_amount")],
         [InlineKeyboardButton(f"📉 Default Slippage: {current_settings.get('slippage', 'Not Set')}%", callback_data="set_default_slippage")],
         [InlineKeyboardButton(f"⛽ Default Gas Fee: {current_settings.get('max_gas_fee', 'Not Set')} XRP", callback_data="set_default_gas_fee")],
+        [InlineKeyboardButton(f"⏳ Order Mode: {current_settings.get('offer_mode', OFFER_MODES[0]).upper()}", callback_data="cycle_offer_mode")],
+        [InlineKeyboardButton(f"⌛ Order Expiry: {current_settings.get('offer_ttl', DEFAULT_OFFER_TTL)}s", callback_data="set_default_offer_ttl")],
         [InlineKeyboardButton("↩️ Back to Settings", callback_data="settings_menu")],
     ]
     reply_markup = InlineKeyboardMarkup(keyboard)
-    message_text = "🛒 Default Buy/Sell Settings\n\nThese are your default settings for manual trading.\n(Sniper configs have their own separate settings)"
+    message_text = (
+        "🛒 Default Buy/Sell Settings\n\nThese are your default settings for manual trading.\n(Sniper configs have their own separate settings)\n\n"
+        "Order mode: EXPIRE rests until the expiry, IOC fills what it can now, FOK fills fully or not at all, GTC rests until cancelled."
+    )
     await update.callback_query.edit_message_text(message_text, reply_markup=reply_markup)
 
 async def mev_protection_settings(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
@@ -537,36 +886,40 @@ async def view_positions(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
             await update.message.reply_text(message)
         return
 
-    account_info = sniper.get_account_info(wallet.classic_address)
-    if "error" in account_info:
-        message = f"Could not retrieve account info: {account_info['error']}"
+    # Served from the stream-maintained positions cache and cached marks, so Refresh costs no RPC call
+    portfolio = await sniper.get_portfolio(user_id)
+    if "error" in portfolio:
+        message = f"Could not retrieve account info: {portfolio['error']}"
         if update.callback_query:
             await update.callback_query.edit_message_text(message)
         else:
             await update.message.reply_text(message)
         return
 
-    balances = account_info.get("account_data", {}).get("balances", [])
     message_text = f"💰 Your Positions\n\nWallet: {wallet.classic_address}\n\n"
+    message_text += f"- XRP: {portfolio['xrp']} XRP\n"
 
     keyboard = []
-    if not balances:
+    if not portfolio["holdings"]:
         message_text += "No tokens held yet."
     else:
-        for balance in balances:
-            if isinstance(balance, dict) and "currency" in balance and "value" in balance:
-                currency = balance["currency"]
-                value = balance["value"]
-                issuer = balance.get("issuer", "")
-                if currency == "XRP":
-                    message_text += f"- XRP: {float(value) / 1_000_000} XRP\n"
-                else:
-                    message_text += f"- {currency} ({issuer[:4]}...{issuer[-4:]}): {value}\n"
-                    # Add buy/sell buttons for each token
-                    keyboard.append([
-                        InlineKeyboardButton(f"Buy {currency}", callback_data=f"buy_token_{currency}_{issuer}"),
-                        InlineKeyboardButton(f"Sell {currency}", callback_data=f"sell_token_{currency}_{issuer}")
-                    ])
+        for holding in portfolio["holdings"]:
+            currency = holding["currency"]
+            issuer = holding["issuer"]
+            message_text += f"- {currency} ({issuer[:4]}...{issuer[-4:]}): {holding['balance']}"
+            if holding["value_xrp"] is not None:
+                message_text += f" ≈ {holding['value_xrp']:.4f} XRP"
+            if holding["unrealized_pnl_xrp"] is not None:
+                message_text += f" (PnL {holding['unrealized_pnl_xrp']:+.4f} XRP)"
+            message_text += "\n"
+            # Add buy/sell buttons for each token
+            keyboard.append([
+                InlineKeyboardButton(f"Buy {currency}", callback_data=f"buy_token_{currency}_{issuer}"),
+                InlineKeyboardButton(f"Sell {currency}", callback_data=f"sell_token_{currency}_{issuer}")
+            ])
+
+    message_text += f"\nTotal value: {portfolio['total_value_xrp']:.4f} XRP"
+    message_text += f"\nUnrealized PnL: {portfolio['total_unrealized_pnl_xrp']:+.4f} XRP"
 
     keyboard.append([InlineKeyboardButton("🔄 Refresh", callback_data="view_positions")],)
     keyboard.append([InlineKeyboardButton("↩️ Back to Positions Menu", callback_data="positions_menu")])
@@ -592,6 +945,7 @@ async def buy_token_menu(update: Update, context: ContextTypes.DEFAULT_TYPE, cur
     
     keyboard.append([InlineKeyboardButton(f"Default Buy Amount ({default_buy_amount} XRP)", callback_data=f"execute_buy_{currency}_{issuer}_{default_buy_amount}")])
     keyboard.append([InlineKeyboardButton("Custom Amount", callback_data=f"custom_buy_amount_{currency}_{issuer}")])
+    keyboard.append([InlineKeyboardButton("🧩 Sliced Buy", callback_data=f"slice_buy_{currency}_{issuer}")])
     keyboard.append([InlineKeyboardButton("↩️ Back to Positions", callback_data="view_positions")])
 
     reply_markup = InlineKeyboardMarkup(keyboard)
@@ -607,10 +961,11 @@ async def execute_buy_order(update: Update, context: ContextTypes.DEFAULT_TYPE,
     """Executes a buy order."""
     user_id = update.effective_user.id
     slippage = sniper.default_trade_settings.get(user_id, {}).get("slippage", 0.01) # Default slippage
+    max_fee_xrp = sniper.default_trade_settings.get(user_id, {}).get("max_gas_fee")
     mev_protect = sniper.get_mev_protection_status(user_id)
 
     await update.callback_query.edit_message_text(f"Attempting to buy {amount_xrp} XRP worth of {currency}...")
-    success = await sniper._execute_buy_order(user_id, currency, issuer, amount_xrp, slippage, mev_protect)
+    success = await sniper._execute_buy_order(user_id, currency, issuer, amount_xrp, slippage, mev_protect, max_fee_xrp)
     
     if success:
         await update.callback_query.edit_message_text(f"✅ Successfully bought {currency}!")
@@ -631,12 +986,54 @@ async def sell_token_menu(update: Update, context: ContextTypes.DEFAULT_TYPE, cu
             keyboard.append([InlineKeyboardButton(f"{preset}%", callback_data=f"remove_sell_preset_{preset}")])
     
     keyboard.append([InlineKeyboardButton("Custom Percentage", callback_data=f"custom_sell_percentage_{currency}_{issuer}")])
+    keyboard.append([InlineKeyboardButton("🧩 Sliced Sell", callback_data=f"slice_sell_{currency}_{issuer}")])
+    keyboard.append([InlineKeyboardButton("🤖 Auto-Sell Rules", callback_data=f"as_menu_{currency}_{issuer}")])
     keyboard.append([InlineKeyboardButton("↩️ Back to Positions", callback_data="view_positions")])
 
     reply_markup = InlineKeyboardMarkup(keyboard)
     message_text = f"➖ Sell {currency} ({issuer[:4]}...{issuer[-4:]})\n\nChoose a percentage of your holdings to sell:"
     await update.callback_query.edit_message_text(message_text, reply_markup=reply_markup)
 
+async def auto_sell_menu(update: Update, context: ContextTypes.DEFAULT_TYPE, currency: str, issuer: str) -> None:
+    """Displays the take-profit, stop-loss and trailing-stop rules for a token."""
+    user_id = update.effective_user.id
+    rules = sniper.get_auto_sell_rules(user_id, currency, issuer)
+    labels = {"tp": "Take Profit", "sl": "Stop Loss", "trail": "Trailing Stop"}
+
+    message_text = f"🤖 Auto-Sell Rules for {currency} ({issuer[:4]}...{issuer[-4:]})\n\n"
+    keyboard = []
+    if rules:
+        for rule in rules:
+            message_text += (
+                f"• {labels.get(rule['kind'], rule['kind'])} {rule['pct']}% "
+                f"(entry {rule['entry_price']:.8g} XRP, sells {rule['sell_percentage']}%)\n"
+            )
+            keyboard.append([InlineKeyboardButton(
+                f"❌ Remove {labels.get(rule['kind'], rule['kind'])} {rule['pct']}%",
+                callback_data=f"as_rm_{rule['id']}"
+            )])
+        message_text += "\nThe first rule to trigger sells the position and cancels the others."
+    else:
+        message_text += "No rules armed. Rules trigger on live price updates and sell through your normal sell path."
+
+    keyboard.append([
+        InlineKeyboardButton("➕ Take Profit", callback_data=f"as_add_tp_{currency}_{issuer}"),
+        InlineKeyboardButton("➕ Stop Loss", callback_data=f"as_add_sl_{currency}_{issuer}"),
+    ])
+    keyboard.append([InlineKeyboardButton("➕ Trailing Stop", callback_data=f"as_add_trail_{currency}_{issuer}")])
+    keyboard.append([InlineKeyboardButton("↩️ Back", callback_data=f"sell_token_{currency}_{issuer}")])
+    await update.callback_query.edit_message_text(message_text, reply_markup=InlineKeyboardMarkup(keyboard))
+
+async def add_auto_sell_rule_prompt(update: Update, context: ContextTypes.DEFAULT_TYPE, kind: str, currency: str, issuer: str) -> None:
+    """Prompts user for the percentage of a new auto-sell rule."""
+    context.user_data["awaiting_input"] = f"auto_sell_{kind}_{currency}_{issuer}"
+    prompts = {
+        "tp": "gain above your entry price at which to sell (e.g. 50)",
+        "sl": "loss below your entry price at which to sell (e.g. 20)",
+        "trail": "drop from the highest price seen at which to sell (e.g. 15)",
+    }
+    await update.callback_query.edit_message_text(f"Please send the percentage {prompts[kind]} for {currency}.")
+
 async def custom_sell_percentage(update: Update, context: ContextTypes.DEFAULT_TYPE, currency: str, issuer: str) -> None:
     """Prompts user for a custom sell percentage."""
     context.user_data["awaiting_input"] = f"custom_sell_percentage_{currency}_{issuer}"
@@ -647,7 +1044,8 @@ async def execute_sell_order(update: Update, context: ContextTypes.DEFAULT_TYPE,
     user_id = update.effective_user.id
 
     await update.callback_query.edit_message_text(f"Attempting to sell {percentage}% of {currency}...")
-    success = await sniper._execute_sell_order(user_id, currency, issuer, percentage)
+    max_fee_xrp = sniper.default_trade_settings.get(user_id, {}).get("max_gas_fee")
+    success = await sniper._execute_sell_order(user_id, currency, issuer, percentage, max_fee_xrp)
     
     if success:
         await update.callback_query.edit_message_text(f"✅ Successfully sold {percentage}% of {currency}!")
@@ -669,16 +1067,16 @@ async def my_wallet(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
             await update.message.reply_text(message)
         return
 
-    account_info = sniper.get_account_info(wallet.classic_address)
-    if "error" in account_info:
-        message = f"Could not retrieve account info: {account_info['error']}"
+    positions = await sniper.get_positions(user_id)
+    if "error" in positions:
+        message = f"Could not retrieve account info: {positions['error']}"
         if update.callback_query:
             await update.callback_query.edit_message_text(message)
         else:
             await update.message.reply_text(message)
         return
 
-    xrp_balance = float(account_info.get("account_data", {}).get("Balance", 0)) / 1_000_000
+    xrp_balance = positions["xrp"]
     message_text = f"💼 Your Wallet\n\nAddress: `{wallet.classic_address}`\nSeed: `{wallet.seed}`\n\nXRP Balance: {xrp_balance} XRP\n\n⚠️ Keep your seed safe! Do not share it with anyone."
 
     keyboard = [
@@ -714,7 +1112,7 @@ async def generate_wallet(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         return
     
     # Store wallet in sniper (pass the whole dict)
-    sniper.add_wallet(user_id, wallet_data)
+    await sniper.add_wallet(user_id, wallet_data)
     
     # Prepare success message
     funded_status = "✅ Funded" if wallet_data.get('funded', False) else "⚠️ Unfunded (please fund manually)"
@@ -772,7 +1170,7 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
                     await update.message.reply_text(f"❌ Failed to import wallet: {wallet_data['error']}")
                 else:
                     # Store wallet in sniper (pass the whole dict)
-                    sniper.add_wallet(user_id, wallet_data)
+                    await sniper.add_wallet(user_id, wallet_data)
                     
                     message_text = f"✅ **Wallet Imported Successfully!**\n\n"
                     message_text += f"📍 **Address:** `{wallet_data['address']}`\n\n"
@@ -802,10 +1200,11 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
                     # Get default slippage or use 1%
                     default_settings = sniper.default_trade_settings.get(user_id, {})
                     slippage = default_settings.get("slippage", 1.0) / 100
+                    max_fee_xrp = default_settings.get("max_gas_fee")
                     mev_protect = sniper.get_mev_protection_status(user_id)
                     
                     # Execute the buy order
-                    success = await sniper._execute_buy_order(user_id, currency, issuer, amount, slippage, mev_protect)
+                    success = await sniper._execute_buy_order(user_id, currency, issuer, amount, slippage, mev_protect, max_fee_xrp)
                     
                     if success:
                         await update.message.reply_text(f"✅ Successfully bought {amount} XRP worth of {currency}!")
@@ -847,6 +1246,41 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
                     return
                 await update.message.reply_text(f"Selling {percentage}% of {currency}...")
                 await execute_sell_order(update, context, currency, issuer, percentage)
+            elif awaiting_input.startswith("sliced_"):
+                side, currency, issuer = awaiting_input.replace("sliced_", "", 1).split("_", 2)
+                parts = message_text.split()
+                if not 2 <= len(parts) <= 4:
+                    await update.message.reply_text("❌ Please send: <amount> <slices or 'auto'> [seconds] [limit price]")
+                    return
+                amount = float(parts[0])
+                slices = None if parts[1].lower() == "auto" else int(parts[1])
+                interval = float(parts[2]) if len(parts) > 2 else None
+                limit_price = float(parts[3]) if len(parts) > 3 else None
+                if amount <= 0 or (side == "sell" and amount > 100) or (slices is not None and slices < 1):
+                    await update.message.reply_text("❌ Amount must be positive (max 100% for sells) and slices at least 1.")
+                    return
+                settings = sniper.default_trade_settings.get(user_id, {})
+                order = await sniper.start_sliced_order(
+                    user_id, side, currency, issuer, amount, slices, interval, limit_price,
+                    slippage=settings.get("slippage", 1.0) / 100, max_fee_xrp=settings.get("max_gas_fee")
+                )
+                if order is None:
+                    await update.message.reply_text(f"❌ Could not start the sliced {side} of {currency}.")
+                else:
+                    await update.message.reply_text(
+                        f"🧩 Sliced {side} {order['id']} started. Track or cancel it under Positions → Sliced Orders."
+                    )
+            elif awaiting_input.startswith("auto_sell_"):
+                kind, currency, issuer = awaiting_input.replace("auto_sell_", "", 1).split("_", 2)
+                pct = float(message_text)
+                if not (0 < pct < 100 or (kind == "tp" and pct > 0)):
+                    await update.message.reply_text("Percentage must be positive (and below 100 for stop rules).")
+                    return
+                rule = sniper.add_auto_sell_rule(user_id, currency, issuer, kind, pct)
+                if rule is None:
+                    await update.message.reply_text(f"❌ No price known for {currency} yet. Try again once it has traded.")
+                else:
+                    await update.message.reply_text(f"✅ Auto-sell rule armed at {pct}% from entry {rule['entry_price']:.8g} XRP.")
             elif awaiting_input == "edit_sniper_name":
                 config = context.user_data.get("creating_sniper_config")
                 if config:
@@ -856,7 +1290,7 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
             elif awaiting_input == "edit_ticker":
                 config = context.user_data.get("creating_sniper_config")
                 if config:
-                    config["ticker"] = message_text.strip().upper()
+                    config["ticker"] = ", ".join(split_patterns(message_text))
                     await update.message.reply_text("✅ Ticker set!")
                     await show_sniper_config_editor(update, context)
             elif awaiting_input == "edit_coin_name":
@@ -902,6 +1336,59 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
                     config["max_gas_fee"] = gas_fee
                     await update.message.reply_text("✅ Max Gas Fee set!")
                     await show_sniper_config_editor(update, context)
+            elif awaiting_input == "edit_activity":
+                config = context.user_data.get("creating_sniper_config")
+                if config:
+                    if message_text.strip().lower() in ("off", "none", "clear"):
+                        config["activity"] = None
+                    else:
+                        try:
+                            config["activity"] = parse_activity_rule(message_text)
+                        except ValueError as e:
+                            await update.message.reply_text(f"❌ {e}. Example: trustlines=50 window=120")
+                            return
+                    await update.message.reply_text("✅ Activity Trigger set!")
+                    await show_sniper_config_editor(update, context)
+            elif awaiting_input == "edit_risk":
+                config = context.user_data.get("creating_sniper_config")
+                if config:
+                    if message_text.strip().lower() in ("off", "none", "clear"):
+                        config["risk"] = None
+                    else:
+                        try:
+                            config["risk"] = parse_risk_rule(message_text)
+                        except ValueError as e:
+                            await update.message.reply_text(f"❌ {e}. Example: blackholed no_freeze max_fee=1")
+                            return
+                    await update.message.reply_text("✅ Issuer Filter set!")
+                    await show_sniper_config_editor(update, context)
+            elif awaiting_input == "edit_market":
+                config = context.user_data.get("creating_sniper_config")
+                if config:
+                    if message_text.strip().lower() in ("off", "none", "clear"):
+                        config["market"] = None
+                    else:
+                        try:
+                            config["market"] = parse_market_rule(message_text)
+                        except ValueError as e:
+                            await update.message.reply_text(f"❌ {e}. Example: depth=100 band=5 price=0.001")
+                            return
+                    await update.message.reply_text("✅ Liquidity Filter set!")
+                    await show_sniper_config_editor(update, context)
+            elif awaiting_input == "edit_schedule":
+                config = context.user_data.get("creating_sniper_config")
+                if config:
+                    if message_text.strip().lower() in ("off", "none", "clear", "always"):
+                        config.update({"active_from": None, "active_until": None, "max_fires": None})
+                    else:
+                        try:
+                            config.update(parse_schedule(message_text))
+                        except ValueError as e:
+                            await update.message.reply_text(f"❌ {e}. Example: from=18:00 until=+2h fires=1")
+                            return
+                    config["fires"] = 0
+                    await update.message.reply_text("✅ Schedule set!")
+                    await show_sniper_config_editor(update, context)
             elif awaiting_input.startswith("set_default_"):
                 field_name = awaiting_input.replace("set_default_", "")
                 value = float(message_text)
@@ -920,6 +1407,11 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
                         await update.message.reply_text("Gas fee cannot be negative.")
                         return
                     sniper.default_trade_settings.setdefault(user_id, {})["max_gas_fee"] = value
+                elif field_name == "offer_ttl":
+                    if value < 1:
+                        await update.message.reply_text("Order expiry must be at least 1 second.")
+                        return
+                    sniper.default_trade_settings.setdefault(user_id, {})["offer_ttl"] = int(value)
                 sniper.save_data()
                 await update.message.reply_text(f"✅ Default {field_name.replace('_', ' ')} set!")
                 await buy_sell_settings(update, context)
@@ -939,6 +1431,8 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
             await start(update, context)
         elif data == "positions_menu":
             await positions_menu(update, context)
+        elif data == "trade_history":
+            await trade_history(update, context)
         elif data == "buy_menu":
             await buy_menu(update, context)
         elif data.startswith("execute_buy_") and not data.startswith("execute_buy_amount"):
@@ -1033,6 +1527,40 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
             currency = parts[2]
             issuer = parts[3]
             await custom_sell_percentage(update, context, currency, issuer)
+        elif data == "open_orders":
+            await open_orders(update, context)
+        elif data == "cancel_all_offers":
+            await query.edit_message_text("Cancelling open orders...")
+            await sniper.cancel_all_offers(user_id)
+            await open_orders(update, context)
+        elif data == "cycle_offer_mode":
+            settings = sniper.default_trade_settings.setdefault(user_id, {})
+            mode = settings.get("offer_mode", OFFER_MODES[0])
+            settings["offer_mode"] = OFFER_MODES[(OFFER_MODES.index(mode) + 1) % len(OFFER_MODES)]
+            sniper.save_data()
+            await buy_sell_settings(update, context)
+        elif data == "sliced_orders":
+            await sliced_orders(update, context)
+        elif data.startswith("slice_cancel_"):
+            sniper.cancel_sliced_order(user_id, data.replace("slice_cancel_", "", 1))
+            await sliced_orders(update, context)
+        elif data.startswith("slice_buy_") or data.startswith("slice_sell_"):
+            side, currency, issuer = data.replace("slice_", "", 1).split("_", 2)
+            await sliced_order_prompt(update, context, side, currency, issuer)
+        elif data.startswith("as_menu_"):
+            currency, issuer = data.replace("as_menu_", "", 1).split("_", 1)
+            await auto_sell_menu(update, context, currency, issuer)
+        elif data.startswith("as_add_"):
+            kind, currency, issuer = data.replace("as_add_", "", 1).split("_", 2)
+            await add_auto_sell_rule_prompt(update, context, kind, currency, issuer)
+        elif data.startswith("as_rm_"):
+            rule_id = data.replace("as_rm_", "", 1)
+            rule = sniper.auto_sell_rules.get(user_id, {}).get(rule_id)
+            sniper.remove_auto_sell_rule(user_id, rule_id)
+            if rule:
+                await auto_sell_menu(update, context, rule["currency"], rule["issuer"])
+            else:
+                await view_positions(update, context)
         elif data == "create_new_sniper_config":
             await create_new_sniper_config(update, context)
         elif data.startswith("view_sniper_config_"):
@@ -1054,7 +1582,11 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
             await query.edit_message_text("Please send the new name for this sniper config.")
         elif data == "edit_ticker":
             context.user_data["awaiting_input"] = "edit_ticker"
-            await query.edit_message_text("Please send the ticker (e.g., USD, BTC, MYTOKEN).")
+            await query.edit_message_text(
+                "Please send the ticker (e.g., USD, BTC, MYTOKEN).\n\n"
+                "Hex currency codes are matched by their decoded name. Use * and ? as wildcards "
+                "(PEPE* prefix, *DOGE* substring, P?PE glob) and separate several patterns with commas."
+            )
         elif data == "edit_coin_name":
             context.user_data["awaiting_input"] = "edit_coin_name"
             await query.edit_message_text("Please send the coin name (e.g., USD, BTC, MYTOKEN) or the issuer address if it's a custom token.")
@@ -1067,6 +1599,45 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         elif data == "edit_slippage":
             context.user_data["awaiting_input"] = "edit_slippage"
             await query.edit_message_text("Please send the slippage percentage (e.g., 1, 5).")
+        elif data == "toggle_only_new_tokens":
+            config = context.user_data.get("creating_sniper_config")
+            if config is not None:
+                config["only_new_tokens"] = not config.get("only_new_tokens", False)
+            await show_sniper_config_editor(update, context)
+        elif data == "edit_activity":
+            context.user_data["awaiting_input"] = "edit_activity"
+            await query.edit_message_text(
+                "Please send activity thresholds as key=value pairs, e.g.:\n"
+                "trustlines=50 window=120\n\n"
+                "Keys: trustlines (new trustlines), offers (new offers), accounts (unique accounts), "
+                "volume (XRP traded), window (seconds, 10-900, default 120). Send 'off' to clear."
+            )
+        elif data == "edit_risk":
+            context.user_data["awaiting_input"] = "edit_risk"
+            await query.edit_message_text(
+                "Please send the issuer checks a token must pass before it is bought, e.g.:\n"
+                "blackholed no_freeze max_fee=1\n\n"
+                "Checks: blackholed (issuer keys disabled), no_freeze (issuer cannot freeze), "
+                "no_clawback, no_auth (no authorized trustlines required), "
+                "max_fee (maximum transfer fee in %). Send 'off' to clear."
+            )
+        elif data == "edit_market":
+            context.user_data["awaiting_input"] = "edit_market"
+            await query.edit_message_text(
+                "Please send liquidity limits as key=value pairs, e.g.:\n"
+                "depth=100 band=5 price=0.001\n\n"
+                "Keys: depth (minimum XRP on each side within the band), band (% around mid, default 5), "
+                "price (maximum listing price in XRP per token), min_supply and max_supply "
+                "(issued tokens). Send 'off' to clear."
+            )
+        elif data == "edit_schedule":
+            context.user_data["awaiting_input"] = "edit_schedule"
+            await query.edit_message_text(
+                "Please send when this config should be live, e.g.:\n"
+                "from=18:00 until=+2h fires=1\n\n"
+                "from/until: HH:MM (next occurrence, UTC), 2026-10-20T18:00 (UTC) or +30m/+2h/+1d from now. "
+                "fires: number of buys before the config switches itself off. Send 'always' to clear."
+            )
         elif data == "edit_max_gas_fee":
             context.user_data["awaiting_input"] = "edit_max_gas_fee"
             await query.edit_message_text("Please send the maximum gas fee in XRP (e.g., 0.1, 0.5).")
@@ -1079,6 +1650,9 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         elif data == "set_default_gas_fee":
             context.user_data["awaiting_input"] = "set_default_gas_fee"
             await query.edit_message_text("Please send the default max gas fee in XRP (e.g., 0.1, 0.5).")
+        elif data == "set_default_offer_ttl":
+            context.user_data["awaiting_input"] = "set_default_offer_ttl"
+            await query.edit_message_text("Please send how many seconds an order may rest on the book before it expires (e.g., 60, 300).")
 
     # Default message handler
     # await update.message.reply_text("I\\'m not sure what you mean. Use /start to see the menu.")
@@ -1090,6 +1664,46 @@ async def post_init(application: Application) -> None:
     ])
     logger.info("Bot commands set successfully!")
 
+    # Supervised background services: valuations, offer sweeps, config timers, and the
+    # stream itself whenever enabled configs exist (so a redeploy resumes sniping on its own)
+    sniper.start_services()
+
+    # Let auto-sell rules report back to the user when they fire
+    sniper.notifier = lambda user_id, text: application.bot.send_message(chat_id=user_id, text=text)
+
+async def post_stop(application: Application) -> None:
+    """Lets in-flight orders settle before the process exits."""
+    await sniper.shutdown()
+
+async def run_webhook(application: Application) -> None:
+    """Serves updates Telegram pushes to the embedded HTTP server until SIGINT/SIGTERM.
+
+    Does what run_polling does around the updater: initialize, post_init,
+    start, and on a signal stop, post_stop and shutdown. If Telegram
+    refuses the webhook, updates are long-polled instead.
+    """
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    await application.initialize()
+    try:
+        await post_init(application)  # Starts the sniper's services, the HTTP server among them
+        if not await start_webhook(application, sniper.http):
+            logger.warning("Webhook refused, falling back to long polling")
+            await application.updater.start_polling(allowed_updates=Update.ALL_TYPES)
+        await application.start()
+        logger.info("Application started")
+        await stop.wait()
+    finally:
+        if application.updater.running:
+            await application.updater.stop()
+        if application.running:
+            await application.stop()
+        await post_stop(application)
+        await application.shutdown()
+
 def main() -> None:
     """Start the bot."""
     BOT_TOKEN = os.getenv("BOT_TOKEN")
@@ -1097,12 +1711,22 @@ def main() -> None:
         logger.error("BOT_TOKEN environment variable not set!")
         return
 
-    application = Application.builder().token(BOT_TOKEN).post_init(post_init).build()
+    # Long-polling getUpdates keeps its own, uninstrumented request object
+    application = (
+        Application.builder().token(BOT_TOKEN).request(InstrumentedRequest())
+        .post_init(post_init).post_stop(post_stop).build()
+    )
 
     application.add_handler(CommandHandler("start", start))
+    application.add_handler(CommandHandler("health", health))
+    application.add_handler(CommandHandler("profile", profile))
     application.add_handler(CallbackQueryHandler(handle_message))
     application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_message))
 
+    # Webhook mode when a public URL is configured: updates arrive without a long-poll round-trip
+    if WEBHOOK_URL:
+        asyncio.run(run_webhook(application))
+        return
     logger.info("Application started")
     application.run_polling(allowed_updates=Update.ALL_TYPES)
 
@@ -0,0 +1,128 @@
+import asyncio
+import logging
+import math
+import time
+from decimal import Decimal
+
+import xrpl
+
+logger = logging.getLogger(__name__)
+
+# Fee configuration
+FEE_REFRESH_INTERVAL = 10  # Seconds between `fee` requests when no ledger closes are seen
+FEE_RETRY_DELAY = 30  # Seconds to wait after a failed `fee` request before trying again
+DEFAULT_MAX_FEE_XRP = 0.1  # Cap used when a config has no max_gas_fee set
+OPEN_LEDGER_PREMIUM = 1.1  # Bid slightly above the open-ledger fee so we are not last in line
+RBF_MULTIPLIER = 1.25  # rippled requires a 25% higher fee level to replace a queued transaction
+
+
+def xrp_to_fee_drops(amount_xrp: float) -> int:
+    """Converts an XRP amount (e.g. a config's max_gas_fee) to integer drops."""
+    return int(Decimal(str(amount_xrp)) * 1_000_000)
+
+
+class FeeOracle:
+    """Caches the open-ledger and queue fee levels and prices orders against them.
+
+    The model is fed by `ledgerClosed` stream messages and refreshed with a `fee`
+    request after every ledger close (or every FEE_REFRESH_INTERVAL seconds when
+    the stream is quiet), so bidding never needs a network round-trip. Until
+    the first refresh succeeds, and while refreshes fail, bids use the last
+    known levels (the base fee initially).
+    """
+
+    def __init__(self, client):
+        self.client = client
+        self.base_fee_drops = 10
+        self.minimum_fee_drops = 10
+        self.median_fee_drops = 10
+        self.open_ledger_fee_drops = 10
+        self.current_queue_size = 0
+        self.max_queue_size = 0
+        self.current_ledger_size = 0
+        self.expected_ledger_size = 0
+        self.validated_ledger_index = 0
+        self.last_refresh = 0.0
+        self.retry_at = 0.0  # Monotonic time before which no refresh is attempted after a failure
+        self._ledger_closed = asyncio.Event()
+
+    def on_ledger_closed(self, message: dict):
+        """Updates the model from a `ledgerClosed` stream message."""
+        self.validated_ledger_index = message.get("ledger_index", self.validated_ledger_index)
+        if message.get("fee_base"):
+            self.base_fee_drops = int(message["fee_base"])
+        # The open ledger resets on close, so the cached escalation is now stale
+        self._ledger_closed.set()
+
+    def refresh(self) -> bool:
+        """Refreshes the cached fee levels with a `fee` request; returns whether it succeeded."""
+        try:
+            response = self.client.request(xrpl.models.requests.Fee())
+            result = response.result
+            drops = result.get("drops", {})
+            self.base_fee_drops = int(drops.get("base_fee", self.base_fee_drops))
+            self.minimum_fee_drops = int(drops.get("minimum_fee", self.minimum_fee_drops))
+            self.median_fee_drops = int(drops.get("median_fee", self.median_fee_drops))
+            self.open_ledger_fee_drops = int(drops.get("open_ledger_fee", self.open_ledger_fee_drops))
+            self.current_queue_size = int(result.get("current_queue_size", 0))
+            self.max_queue_size = int(result.get("max_queue_size", 0))
+            self.current_ledger_size = int(result.get("current_ledger_size", 0))
+            self.expected_ledger_size = int(result.get("expected_ledger_size", 0))
+            self.last_refresh = time.monotonic()
+            logger.debug(
+                f"Fee model refreshed: open ledger {self.open_ledger_fee_drops} drops, "
+                f"queue {self.current_queue_size}/{self.max_queue_size}"
+            )
+            return True
+        except Exception as e:
+            logger.error(f"Error refreshing fee model: {e}")
+            self.retry_at = time.monotonic() + FEE_RETRY_DELAY
+            return False
+
+    def is_congested(self) -> bool:
+        """Returns True when the open ledger is full and transactions are being queued."""
+        return (
+            self.current_queue_size > 0
+            or self.open_ledger_fee_drops > self.base_fee_drops
+            or (self.expected_ledger_size and self.current_ledger_size >= self.expected_ledger_size)
+        )
+
+    def bid_drops(self, max_fee_xrp: float = None) -> int:
+        """Computes the fee to bid for a new order from the cached model, capped at max_fee_xrp."""
+        cap = xrp_to_fee_drops(max_fee_xrp if max_fee_xrp else DEFAULT_MAX_FEE_XRP)
+        floor = max(self.base_fee_drops, self.minimum_fee_drops)
+
+        if self.is_congested():
+            # Outbid the open-ledger escalation so the order lands in the current ledger
+            # instead of waiting behind the queue
+            bid = math.ceil(self.open_ledger_fee_drops * OPEN_LEDGER_PREMIUM) + 1
+        else:
+            bid = floor
+
+        return max(floor, min(bid, cap))
+
+    def replacement_fee(self, previous_fee_drops: int, max_fee_xrp: float = None):
+        """Returns the fee for a replace-by-fee resubmission, or None if it would exceed the cap."""
+        cap = xrp_to_fee_drops(max_fee_xrp if max_fee_xrp else DEFAULT_MAX_FEE_XRP)
+        bid = max(
+            math.ceil(previous_fee_drops * RBF_MULTIPLIER) + 1,
+            math.ceil(self.open_ledger_fee_drops * OPEN_LEDGER_PREMIUM) + 1,
+        )
+        if bid > cap:
+            return None
+        return bid
+
+    async def run(self):
+        """Refreshes the model after every ledger close, or periodically when the stream is quiet."""
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                await asyncio.wait_for(self._ledger_closed.wait(), timeout=FEE_REFRESH_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            self._ledger_closed.clear()
+            # Back off after a failure instead of retrying on every ledger close
+            backoff = self.retry_at - time.monotonic()
+            if backoff > 0:
+                await asyncio.sleep(backoff)
+            await loop.run_in_executor(None, self.refresh)
@@ -0,0 +1,109 @@
+import asyncio
+import logging
+import os
+from urllib.parse import parse_qs, urlsplit
+
+logger = logging.getLogger(__name__)
+
+# Embedded HTTP server configuration
+HTTP_HOST = os.getenv("HTTP_HOST", "127.0.0.1")  # Loopback only; set 0.0.0.0 to receive Telegram webhooks
+HTTP_PORT = int(os.getenv("PORT", os.getenv("HTTP_PORT", "8080")))  # Railway injects PORT
+MAX_BODY_BYTES = 1_000_000  # Larger request bodies are rejected
+READ_TIMEOUT = 10  # Seconds a client has to send a complete request
+MAX_LINE_BYTES = 8192  # Longest request or header line
+MAX_HEADERS = 64  # Requests with more header lines are rejected
+
+REASONS = {200: "OK", 400: "Bad Request", 403: "Forbidden", 404: "Not Found", 405: "Method Not Allowed",
+           413: "Payload Too Large", 431: "Request Header Fields Too Large", 500: "Internal Server Error", 503: "Service Unavailable"}
+
+
+class HttpServer:
+    """Minimal HTTP/1.1 server on the bot's event loop, for metrics, health and webhooks.
+
+    Routes map (method, path) to `async handler(request)` returning
+    (status, content_type, body). The request is a dict with method, path,
+    query, headers (lower-cased names) and body bytes. One request is served
+    per connection. Handlers run on the event loop and must not block.
+    """
+
+    def __init__(self, host: str = HTTP_HOST, port: int = HTTP_PORT):
+        self.host = host
+        self.port = port
+        self._routes = {}  # Structure: {(method, path): handler}
+        self._server = None
+
+    def route(self, method: str, path: str, handler):
+        """Registers handler for method and path."""
+        self._routes[(method.upper(), path)] = handler
+
+    async def serve(self):
+        """Serves until cancelled."""
+        self._server = await asyncio.start_server(self._handle, self.host, self.port, limit=MAX_LINE_BYTES)
+        logger.info(f"HTTP server listening on {self.host}:{self.port}")
+        try:
+            async with self._server:
+                await self._server.serve_forever()
+        finally:
+            self._server = None
+
+    async def _read_request(self, reader: asyncio.StreamReader):
+        request_line = await reader.readline()
+        if not request_line:
+            return None
+        method, target, _ = request_line.decode("latin-1").split(" ", 2)
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            if len(headers) >= MAX_HEADERS:
+                raise LookupError("too many headers")
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        length = int(headers.get("content-length", 0))
+        if length > MAX_BODY_BYTES:
+            raise OverflowError(length)
+        body = await reader.readexactly(length) if length else b""
+        url = urlsplit(target)
+        return {"method": method.upper(), "path": url.path, "query": parse_qs(url.query),
+                "headers": headers, "body": body}
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            try:
+                request = await asyncio.wait_for(self._read_request(reader), READ_TIMEOUT)
+            except OverflowError:
+                request, response = None, (413, "text/plain", b"payload too large\n")
+            except LookupError:
+                request, response = None, (431, "text/plain", b"too many headers\n")
+            except (ValueError, asyncio.IncompleteReadError, asyncio.TimeoutError):
+                request, response = None, (400, "text/plain", b"bad request\n")
+            else:
+                if request is None:
+                    return
+                response = await self._dispatch(request)
+            status, content_type, body = response
+            if isinstance(body, str):
+                body = body.encode()
+            writer.write(
+                f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+                f"Content-Type: {content_type}\r\nContent-Length: {len(body)}\r\nConnection: close\r\n\r\n"
+                .encode("latin-1") + body
+            )
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def _dispatch(self, request: dict) -> tuple:
+        handler = self._routes.get((request["method"], request["path"]))
+        if handler is None:
+            if any(path == request["path"] for _, path in self._routes):
+                return 405, "text/plain", b"method not allowed\n"
+            return 404, "text/plain", b"not found\n"
+        try:
+            return await handler(request)
+        except Exception as e:
+            logger.error(f"Error serving {request['method']} {request['path']}: {e}")
+            return 500, "text/plain", b"internal error\n"
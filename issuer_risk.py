@@ -0,0 +1,139 @@
+import asyncio
+import logging
+import time
+
+import xrpl
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+CACHE_REQUESTS = metrics.counter("cache_requests_total", "Cache lookups by cache and result (hit/miss)")
+
+# Risk cache configuration
+RISK_TTL = 600  # Seconds a cached issuer profile is trusted without an invalidating transaction
+TRANSFER_RATE_UNIT = 1_000_000_000  # TransferRate of an issuer without a transfer fee
+
+# AccountRoot flags
+LSF_REQUIRE_AUTH = 0x00040000
+LSF_DISABLE_MASTER = 0x00100000
+LSF_NO_FREEZE = 0x00200000
+LSF_GLOBAL_FREEZE = 0x00400000
+LSF_ALLOW_CLAWBACK = 0x80000000
+
+# Well-known addresses nobody holds the key to
+BLACKHOLE_ADDRESSES = frozenset({
+    "rrrrrrrrrrrrrrrrrrrrrhoLvTp",  # ACCOUNT_ZERO
+    "rrrrrrrrrrrrrrrrrrrrBZbvji",  # ACCOUNT_ONE
+    "rrrrrrrrrrrrrrrrrrrn5RM1rHd",  # NaN address
+})
+
+# Transactions that can change an issuer's profile
+INVALIDATING_TYPES = frozenset({"AccountSet", "SetRegularKey", "SignerListSet"})
+
+
+def check_risk(profile: dict, requirements: dict) -> list:
+    """Returns the reasons a profile fails {"blackholed", "no_freeze", "no_clawback",
+    "no_require_auth", "max_transfer_fee"} requirements; empty if it passes.
+
+    A missing profile (the issuer could not be looked up) fails any requirement.
+    """
+    if not requirements:
+        return []
+    if profile is None:
+        return ["issuer profile unavailable"]
+    failures = []
+    if requirements.get("blackholed") and not profile["blackholed"]:
+        failures.append("issuer is not blackholed")
+    if requirements.get("no_freeze") and (profile["global_freeze"] or not profile["freeze_disabled"]):
+        failures.append("issuer can freeze" if not profile["global_freeze"] else "issuer is globally frozen")
+    if requirements.get("no_clawback") and profile["clawback"]:
+        failures.append("issuer can claw back")
+    if requirements.get("no_require_auth") and profile["require_auth"]:
+        failures.append("issuer requires authorized trustlines")
+    max_fee = requirements.get("max_transfer_fee")
+    if max_fee is not None and profile["transfer_fee"] > max_fee:
+        failures.append(f"transfer fee {profile['transfer_fee']:g}% above {max_fee:g}%")
+    return failures
+
+
+class IssuerRiskCache:
+    """Per-issuer risk profiles: freeze, transfer fee, authorization, clawback and key status.
+
+    A profile is built from one `account_info` request (with signer lists)
+    and cached for RISK_TTL. Validated AccountSet, SetRegularKey and
+    SignerListSet transactions from a cached issuer drop its profile, so a
+    flag flip is seen on the next lookup rather than after the TTL. An
+    issuer is blackholed when its master key is disabled and it has neither
+    a usable regular key nor a signer list: nobody can change its settings.
+    """
+
+    def __init__(self, client):
+        self.client = client
+        self._profiles = {}  # Structure: {issuer: profile}
+        self._fetch_locks = {}
+
+    def _fetch(self, issuer: str) -> dict:
+        """Builds an issuer's risk profile over JSON-RPC."""
+        response = self.client.request(xrpl.models.requests.AccountInfo(
+            account=issuer, ledger_index="validated", signer_lists=True
+        ))
+        if not response.is_successful():
+            raise RuntimeError(response.result.get("error_message") or response.result.get("error", "Unknown error"))
+
+        account_data = response.result["account_data"]
+        flags = account_data.get("Flags", 0)
+        # API v2 returns signer lists next to account_data, v1 inside it
+        signer_lists = response.result.get("signer_lists") or account_data.get("signer_lists") or []
+        regular_key = account_data.get("RegularKey")
+        transfer_rate = account_data.get("TransferRate") or TRANSFER_RATE_UNIT
+        return {
+            "issuer": issuer,
+            "global_freeze": bool(flags & LSF_GLOBAL_FREEZE),
+            "freeze_disabled": bool(flags & LSF_NO_FREEZE),
+            "require_auth": bool(flags & LSF_REQUIRE_AUTH),
+            "clawback": bool(flags & LSF_ALLOW_CLAWBACK),
+            "transfer_fee": (transfer_rate - TRANSFER_RATE_UNIT) / TRANSFER_RATE_UNIT * 100,
+            "regular_key": regular_key,
+            "multisig": bool(signer_lists),
+            "blackholed": bool(flags & LSF_DISABLE_MASTER)
+                          and (regular_key is None or regular_key in BLACKHOLE_ADDRESSES)
+                          and not signer_lists,
+            "fetched": time.monotonic(),
+        }
+
+    def cached(self, issuer: str):
+        """Returns a fresh cached profile without any I/O, or None."""
+        profile = self._profiles.get(issuer)
+        if profile is not None and time.monotonic() - profile["fetched"] < RISK_TTL:
+            return profile
+        return None
+
+    async def get(self, issuer: str):
+        """Returns the issuer's profile, fetching it on a miss; None if it cannot be fetched."""
+        profile = self.cached(issuer)
+        if profile is not None:
+            CACHE_REQUESTS.inc(cache="issuer_risk", result="hit")
+            return profile
+        CACHE_REQUESTS.inc(cache="issuer_risk", result="miss")
+
+        lock = self._fetch_locks.setdefault(issuer, asyncio.Lock())
+        async with lock:
+            profile = self.cached(issuer)
+            if profile is not None:
+                return profile
+            try:
+                profile = await asyncio.get_running_loop().run_in_executor(None, self._fetch, issuer)
+            except Exception as e:
+                logger.error(f"Error fetching risk profile for issuer {issuer}: {e}")
+                return None
+            self._profiles[issuer] = profile
+            return profile
+
+    def on_transaction(self, message: dict):
+        """Drops the profile of an issuer whose settings a validated transaction may have changed."""
+        transaction = message.get("transaction") or {}
+        if transaction.get("TransactionType") in INVALIDATING_TYPES:
+            account = transaction.get("Account")
+            if self._profiles.pop(account, None) is not None:
+                logger.info(f"Issuer risk profile of {account} invalidated by {transaction['TransactionType']}")
@@ -0,0 +1,142 @@
+import asyncio
+import logging
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+# Scheduler configuration
+DEFAULT_CLOSE_INTERVAL = 3.5  # Seconds, used until enough ledger closes have been observed
+CADENCE_SMOOTHING = 0.2  # EWMA weight of the newest close interval
+RELEASE_SAFETY_MARGIN = 0.6  # Seconds before the expected close after which we hold orders for the next ledger
+STREAM_STALE_LEDGERS = 3  # Stream is considered down after this many missed ledger closes
+LEDGER_STATS_HISTORY = 256  # Number of ledgers kept for per-ledger statistics
+
+
+class LedgerScheduler:
+    """Tracks ledger close cadence and decides when queued orders should be released.
+
+    Orders released early in the open-ledger window are proposed in the next
+    consensus round; orders released just before a close usually slip one
+    ledger. The scheduler holds late orders until the next close so they land
+    at the front of the following open ledger, and reports whether an order
+    can still make its LastLedgerSequence.
+    """
+
+    def __init__(self):
+        self.validated_ledger_index = 0
+        self.last_close_time = None  # Monotonic time the last ledgerClosed arrived
+        self.close_interval = DEFAULT_CLOSE_INTERVAL
+        self.ledger_stats = deque(maxlen=LEDGER_STATS_HISTORY)
+        self._stats_by_ledger = {}
+        self._ledger_closed = asyncio.Event()
+
+    def on_ledger_closed(self, message: dict):
+        """Updates cadence and per-ledger statistics from a `ledgerClosed` stream message."""
+        now = time.monotonic()
+        ledger_index = message.get("ledger_index", 0)
+
+        interval = None
+        if self.last_close_time is not None:
+            interval = now - self.last_close_time
+            # Ignore gaps from reconnects when estimating cadence
+            if interval < DEFAULT_CLOSE_INTERVAL * 4:
+                self.close_interval += CADENCE_SMOOTHING * (interval - self.close_interval)
+
+        self.last_close_time = now
+        self.validated_ledger_index = ledger_index
+
+        stats = self._stats_for(ledger_index)
+        stats["txn_count"] = message.get("txn_count", 0)
+        stats["ledger_time"] = message.get("ledger_time")
+        stats["close_interval"] = interval
+
+        # Wake up orders held for the next open ledger
+        self._ledger_closed.set()
+        self._ledger_closed = asyncio.Event()
+
+    def _stats_for(self, ledger_index: int) -> dict:
+        """Returns the statistics entry for a ledger, creating it if needed."""
+        stats = self._stats_by_ledger.get(ledger_index)
+        if stats is None:
+            if len(self.ledger_stats) == self.ledger_stats.maxlen:
+                evicted = self.ledger_stats[0]
+                self._stats_by_ledger.pop(evicted["ledger_index"], None)
+            stats = {
+                "ledger_index": ledger_index,
+                "txn_count": None,
+                "ledger_time": None,
+                "close_interval": None,
+                "submitted": 0,
+                "included": 0,
+            }
+            self.ledger_stats.append(stats)
+            self._stats_by_ledger[ledger_index] = stats
+        return stats
+
+    @property
+    def open_ledger_index(self) -> int:
+        """Index of the ledger currently accepting transactions."""
+        return self.validated_ledger_index + 1
+
+    def is_stream_live(self) -> bool:
+        """Returns True when ledger closes are arriving on the stream."""
+        if self.last_close_time is None:
+            return False
+        return time.monotonic() - self.last_close_time < self.close_interval * STREAM_STALE_LEDGERS
+
+    def time_until_close(self) -> float:
+        """Estimated seconds until the open ledger closes."""
+        if self.last_close_time is None:
+            return self.close_interval
+        return self.close_interval - (time.monotonic() - self.last_close_time)
+
+    def next_reachable_ledger(self) -> int:
+        """Earliest ledger an order released now is expected to be validated in."""
+        if self.time_until_close() > RELEASE_SAFETY_MARGIN:
+            return self.open_ledger_index
+        return self.open_ledger_index + 1
+
+    def can_make(self, last_ledger_sequence: int) -> bool:
+        """Returns False when an order released now can no longer make its LastLedgerSequence."""
+        if not self.is_stream_live():
+            return True
+        return self.next_reachable_ledger() <= last_ledger_sequence
+
+    async def wait_for_release(self) -> int:
+        """Waits until an order can be released into a good open-ledger window.
+
+        Returns the ledger index the order is targeting.
+        """
+        if self.is_stream_live() and self.time_until_close() <= RELEASE_SAFETY_MARGIN:
+            # Too late for this ledger: hold until the close, bounded in case the stream stalls
+            try:
+                await asyncio.wait_for(self._ledger_closed.wait(), timeout=self.close_interval)
+            except asyncio.TimeoutError:
+                pass
+        return self.open_ledger_index
+
+    def record_submission(self, target_ledger: int):
+        """Records that one of our orders was released targeting target_ledger."""
+        self._stats_for(target_ledger)["submitted"] += 1
+
+    def record_inclusion(self, target_ledger: int, validated_ledger: int):
+        """Records that an order released for target_ledger validated in validated_ledger."""
+        if validated_ledger is not None and validated_ledger <= target_ledger:
+            self._stats_for(target_ledger)["included"] += 1
+
+    def get_stats(self) -> dict:
+        """Returns cadence and inclusion statistics for tuning."""
+        submitted = sum(s["submitted"] for s in self.ledger_stats)
+        included = sum(s["included"] for s in self.ledger_stats)
+        txn_counts = [s["txn_count"] for s in self.ledger_stats if s["txn_count"] is not None]
+        return {
+            "validated_ledger_index": self.validated_ledger_index,
+            "close_interval": round(self.close_interval, 3),
+            "time_until_close": round(self.time_until_close(), 3),
+            "avg_txn_count": round(sum(txn_counts) / len(txn_counts), 1) if txn_counts else None,
+            "orders_submitted": submitted,
+            "orders_included_next_ledger": included,
+            "inclusion_rate": round(included / submitted, 3) if submitted else None,
+            "ledgers": list(self.ledger_stats),
+        }
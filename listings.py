@@ -0,0 +1,116 @@
+import logging
+
+from ticker_match import decode_currency
+
+logger = logging.getLogger(__name__)
+
+# Listing event kinds
+NEW_PAIR = "new_pair"
+NEW_LIQUIDITY = "new_liquidity"
+
+# Listing sources
+AMM_CREATE = "amm_create"
+AMM_DEPOSIT = "amm_deposit"
+OFFER = "offer"
+
+
+def _xrp_token_pair(amount_a, amount_b):
+    """Returns (currency, issuer, xrp, token) for an XRP/token amount pair, or None."""
+    if isinstance(amount_a, str) and isinstance(amount_b, dict) and "issuer" in amount_b:
+        return amount_b["currency"], amount_b["issuer"], int(amount_a) / 1_000_000, float(amount_b.get("value", 0))
+    if isinstance(amount_b, str) and isinstance(amount_a, dict) and "issuer" in amount_a:
+        return amount_a["currency"], amount_a["issuer"], int(amount_b) / 1_000_000, float(amount_a.get("value", 0))
+    return None
+
+
+def _asset_pair(asset_a, asset_b):
+    """Returns (currency, issuer) for an XRP/token AMM asset pair, or None."""
+    for xrp, token in ((asset_a, asset_b), (asset_b, asset_a)):
+        if (isinstance(xrp, dict) and xrp.get("currency") == "XRP" and "issuer" not in xrp
+                and isinstance(token, dict) and "issuer" in token):
+            return token["currency"], token["issuer"]
+    return None
+
+
+class ListingDetector:
+    """Detects new XRP pairs and new liquidity from validated transaction metadata.
+
+    AffectedNodes is scanned once per transaction, with no RPC. Three
+    signals are recognized: a created AMM ledger entry (an AMMCreate), an
+    AMM entry whose LP token balance grew (a deposit), and a created Offer
+    entry for an XRP pair (an offer that rested on the book). Each token
+    yields at most one event per transaction. NEW_PAIR means the pair was
+    never seen trading against XRP before, according to the token registry
+    (or this session, without one); later activity is NEW_LIQUIDITY. Bids
+    (offers paying out XRP) only count when they open a new pair: ordinary
+    bids on listed tokens are not new liquidity. The currency code is
+    decoded to a readable ticker once, on the event.
+    """
+
+    def __init__(self, registry=None):
+        self.registry = registry
+        self._seen_pairs = set()
+
+    def _first_seen(self, currency: str, issuer: str, ledger_index: int) -> bool:
+        if self.registry is not None:
+            return self.registry.observe(currency, issuer, ledger_index)
+        if (currency, issuer) in self._seen_pairs:
+            return False
+        self._seen_pairs.add((currency, issuer))
+        return True
+
+    def detect(self, message: dict) -> list:
+        """Returns normalized listing events for one validated transaction message."""
+        meta = message.get("meta")
+        if not isinstance(meta, dict) or meta.get("TransactionResult") != "tesSUCCESS":
+            return []
+        transaction = message.get("transaction") or {}
+
+        found = {}  # Structure: {(currency, issuer): event}, AMM signals take precedence over offers
+        for affected in meta.get("AffectedNodes", ()):
+            node_type, node = next(iter(affected.items()))
+            entry_type = node.get("LedgerEntryType")
+
+            if entry_type == "AMM":
+                fields = node.get("FinalFields") or node.get("NewFields") or {}
+                pair = _asset_pair(fields.get("Asset"), fields.get("Asset2"))
+                if pair is None:
+                    continue
+                if node_type == "CreatedNode":
+                    found[pair] = {"source": AMM_CREATE, "amm_account": fields.get("Account")}
+                elif node_type == "ModifiedNode":
+                    previous = node.get("PreviousFields", {}).get("LPTokenBalance")
+                    final = fields.get("LPTokenBalance")
+                    if previous and final and float(final["value"]) > float(previous["value"]):
+                        found.setdefault(pair, {"source": AMM_DEPOSIT, "amm_account": fields.get("Account")})
+
+            elif entry_type == "Offer" and node_type == "CreatedNode":
+                fields = node.get("NewFields", {})
+                split = _xrp_token_pair(fields.get("TakerGets"), fields.get("TakerPays"))
+                if split is None:
+                    continue
+                currency, issuer, xrp, token = split
+                # An offer paying out XRP is a bid for the token, one paying out the token an ask
+                side = "bid" if isinstance(fields.get("TakerGets"), str) else "ask"
+                found.setdefault((currency, issuer), {"source": OFFER, "side": side, "xrp": xrp, "token": token})
+
+        events = []
+        for (currency, issuer), event in found.items():
+            kind = NEW_PAIR if self._first_seen(currency, issuer, message.get("ledger_index")) else NEW_LIQUIDITY
+            if event.get("side") == "bid" and kind != NEW_PAIR:
+                continue
+            event.update({
+                "kind": kind,
+                "currency": currency,
+                "ticker": decode_currency(currency),
+                "issuer": issuer,
+                "account": transaction.get("Account"),
+                "tx_hash": transaction.get("hash"),
+                "ledger_index": message.get("ledger_index"),
+            })
+            if event["source"] != OFFER:
+                # AMM amounts come from the transaction itself (AMMCreate/AMMDeposit Amount fields)
+                split = _xrp_token_pair(transaction.get("Amount"), transaction.get("Amount2"))
+                event["xrp"], event["token"] = (split[2], split[3]) if split else (None, None)
+            events.append(event)
+        return events
@@ -0,0 +1,170 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+
+import metrics
+
+# Logging configuration
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text")  # "text" or "json" (one object per line)
+LOG_SAMPLING = os.getenv("LOG_SAMPLING", "")  # Overrides, e.g. "listing=1/50,ingest=100/5" (every/per_second)
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+# Default policies of the hot-path categories: keep 1 record in `every`, at most `per_second` of those
+DEFAULT_POLICIES = {
+    "ingest": {"every": 100, "per_second": 5},  # Per-transaction stream records
+    "listing": {"every": 1, "per_second": 20},  # Listing events seen by the detector
+    "market": {"every": 1, "per_second": 10},  # Listings skipped on liquidity or supply criteria
+}
+
+LOG_DROPPED = metrics.counter("log_records_dropped_total", "Log records dropped by sampling or rate limiting")
+
+# Attributes every LogRecord has; anything else was passed through `extra` and is a structured field
+_RECORD_ATTRIBUTES = frozenset(logging.makeLogRecord({}).__dict__) | {"message", "asctime", "category", "suppressed"}
+
+_listener = None
+
+
+def parse_policies(text: str) -> dict:
+    """Parses "category=every/per_second,..." into policies; per_second may be omitted or 0 for no limit."""
+    policies = {}
+    for item in text.split(","):
+        if not item.strip():
+            continue
+        category, _, spec = item.partition("=")
+        every, _, per_second = spec.partition("/")
+        policies[category.strip()] = {"every": max(1, int(every or 1)), "per_second": float(per_second or 0) or None}
+    return policies
+
+
+class SamplingFilter(logging.Filter):
+    """Samples and rate-limits records per category, before they are queued.
+
+    A record's category comes from `extra={"category": ...}`; records
+    without one, and every WARNING or above, always pass. Within a category
+    1 record in `every` is kept, then a token bucket caps the kept records
+    at `per_second`. The first record let through after drops carries the
+    number it stands for in `suppressed`, so the log still shows the volume.
+    """
+
+    def __init__(self, policies: dict):
+        super().__init__()
+        self.policies = policies
+        self._state = {}  # Structure: {category: {"seen", "tokens", "refilled", "suppressed"}}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        category = getattr(record, "category", None)
+        policy = self.policies.get(category)
+        if policy is None or record.levelno >= logging.WARNING:
+            return True
+        with self._lock:
+            state = self._state.get(category)
+            if state is None:
+                state = {"seen": 0, "tokens": policy["per_second"] or 0, "refilled": time.monotonic(), "suppressed": 0}
+                self._state[category] = state
+            state["seen"] += 1
+            keep = state["seen"] % policy["every"] == 0
+            if keep and policy["per_second"]:
+                now = time.monotonic()
+                state["tokens"] = min(policy["per_second"], state["tokens"] + (now - state["refilled"]) * policy["per_second"])
+                state["refilled"] = now
+                keep = state["tokens"] >= 1
+                if keep:
+                    state["tokens"] -= 1
+            if not keep:
+                state["suppressed"] += 1
+                LOG_DROPPED.inc(category=category)
+                return False
+            if state["suppressed"]:
+                record.suppressed = state["suppressed"]
+                state["suppressed"] = 0
+        return True
+
+
+class LazyQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that leaves message formatting to the listener thread.
+
+    The stock prepare() formats the message and drops args so records can
+    be pickled; records here never leave the process, so the record is
+    queued as is and `%`-style arguments are only rendered off the event loop.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats a record as one JSON object, with `extra` fields as top-level keys."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if getattr(record, "category", None):
+            entry["category"] = record.category
+        if getattr(record, "suppressed", None):
+            entry["suppressed"] = record.suppressed
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRIBUTES and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """The usual text line, with the count of records sampling dropped before it."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        if getattr(record, "suppressed", None):
+            line += f" (+{record.suppressed} similar suppressed)"
+        return line
+
+
+def configure(level: str = LOG_LEVEL, fmt: str = LOG_FORMAT, stream=None, policies: dict = None):
+    """Routes all logging through a queue to a background listener thread; safe to call more than once.
+
+    Loggers only enqueue records (after sampling), and the listener thread
+    formats and writes them, so a slow log sink never blocks the event loop.
+    """
+    global _listener
+    if _listener is not None:
+        return
+    if policies is None:
+        policies = {**DEFAULT_POLICIES, **parse_policies(LOG_SAMPLING)}
+
+    output = logging.StreamHandler(stream or sys.stderr)
+    output.setFormatter(JsonFormatter() if fmt == "json" else TextFormatter(TEXT_FORMAT))
+
+    handler = LazyQueueHandler(queue.SimpleQueue())
+    handler.addFilter(SamplingFilter(policies))
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(level)
+
+    _listener = logging.handlers.QueueListener(handler.queue, output, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown)
+
+
+def shutdown():
+    """Writes out every queued record and stops the listener thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
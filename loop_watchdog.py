@@ -0,0 +1,93 @@
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# Watchdog configuration
+HEARTBEAT_INTERVAL = 0.1  # Seconds between event-loop heartbeats
+STALL_THRESHOLD = float(os.getenv("LOOP_LAG_THRESHOLD", "0.25"))  # Lag in seconds that triggers a stack dump
+RECENT_LAGS = 3000  # Heartbeats kept for percentiles (5 minutes at the default interval)
+MAX_STALL_REPORTS = 10  # Stack dumps kept for the health command
+LAG_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+LOOP_LAG = metrics.histogram("event_loop_lag_seconds", "Delay of event-loop heartbeats past their schedule",
+                             buckets=LAG_BUCKETS)
+LOOP_STALLS = metrics.counter("event_loop_stalls_total", "Event-loop stalls longer than the watchdog threshold")
+
+
+class LoopWatchdog:
+    """Measures event-loop lag and captures the stack of whatever blocks the loop.
+
+    A heartbeat coroutine sleeps HEARTBEAT_INTERVAL at a time; how late it
+    wakes up is the loop lag, recorded in the event_loop_lag_seconds
+    histogram. A helper thread watches the heartbeat: once it is more than
+    STALL_THRESHOLD late, the loop is blocked in synchronous code, and the
+    thread dumps the loop thread's current stack (the blocking frame) to the
+    log, once per stall.
+    """
+
+    def __init__(self, threshold: float = STALL_THRESHOLD, interval: float = HEARTBEAT_INTERVAL):
+        self.threshold = threshold
+        self.interval = interval
+        self.lags = deque(maxlen=RECENT_LAGS)
+        self.stalls = deque(maxlen=MAX_STALL_REPORTS)  # Structure: [{"time", "stack"}], newest last
+        self.max_lag = 0.0
+        self._last_beat = time.monotonic()
+        self._loop_thread_id = None
+        self._stop = threading.Event()
+
+    async def run(self):
+        """Heartbeats until cancelled, with the stall-detection thread running alongside."""
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._stop.clear()
+        thread = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        thread.start()
+        try:
+            while True:
+                expected = time.monotonic() + self.interval
+                await asyncio.sleep(self.interval)
+                now = time.monotonic()
+                self._last_beat = now
+                lag = max(0.0, now - expected)
+                self.lags.append(lag)
+                self.max_lag = max(self.max_lag, lag)
+                LOOP_LAG.observe(lag)
+        finally:
+            self._stop.set()
+
+    def _watch(self):
+        dumped_beat = None
+        while not self._stop.wait(self.threshold / 2):
+            beat = self._last_beat
+            blocked_for = time.monotonic() - beat - self.interval
+            if blocked_for < self.threshold or beat == dumped_beat:
+                continue
+            dumped_beat = beat  # One dump per stall
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is None:
+                continue
+            stack = "".join(traceback.format_stack(frame))
+            LOOP_STALLS.inc()
+            self.stalls.append({"time": time.time(), "stack": stack})
+            logger.warning(f"Event loop blocked for {blocked_for:.3f}s+, loop thread stack:\n{stack}")
+
+    def stats(self) -> dict:
+        """Returns lag percentiles over recent heartbeats, the maximum lag and the stall count."""
+        lags = sorted(self.lags)
+        if not lags:
+            return {"p50": 0.0, "p99": 0.0, "max": self.max_lag, "stalls": len(self.stalls)}
+        return {
+            "p50": lags[len(lags) // 2],
+            "p99": lags[min(len(lags) - 1, int(len(lags) * 0.99))],
+            "max": self.max_lag,
+            "stalls": len(self.stalls),
+        }
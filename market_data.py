@@ -0,0 +1,188 @@
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# Market data configuration
+QUOTE_TTL = 300  # Seconds after which a book side is considered stale
+
+
+def _xrp_and_token(amount_a, amount_b):
+    """Splits an XRP/token amount pair into (xrp, token_dict), or None if it is not an XRP pair."""
+    if isinstance(amount_a, str) and isinstance(amount_b, dict):
+        return float(amount_a) / 1_000_000, amount_b
+    if isinstance(amount_b, str) and isinstance(amount_a, dict):
+        return float(amount_b) / 1_000_000, amount_a
+    return None
+
+
+def book_buy_output(offers: list, xrp_in: float):
+    """Walks an ask-side `book_offers` snapshot and returns the tokens xrp_in XRP buys, or None if empty.
+
+    Funded amounts are used where the server reports them. If the book is
+    too thin for the full size, only what it holds is returned.
+    """
+    tokens_out = 0.0
+    remaining = xrp_in
+    for offer in offers:
+        split = _xrp_and_token(offer.get("taker_pays_funded", offer.get("TakerPays")),
+                               offer.get("taker_gets_funded", offer.get("TakerGets")))
+        if split is None:
+            continue
+        level_xrp, token = split
+        level_token = float(token.get("value", 0))
+        if level_xrp <= 0 or level_token <= 0:
+            continue
+        taken = min(remaining, level_xrp)
+        tokens_out += level_token * taken / level_xrp
+        remaining -= taken
+        if remaining <= 0:
+            break
+    return tokens_out if tokens_out > 0 else None
+
+
+def book_depth(offers: list, side: str, limit_price: float) -> float:
+    """Returns the XRP resting on one side of a `book_offers` snapshot at prices up to limit_price.
+
+    For "ask" offers (token for XRP) levels priced at or below the limit
+    count; for "bid" offers (XRP for token) levels at or above it.
+    """
+    depth = 0.0
+    for offer in offers:
+        split = _xrp_and_token(offer.get("taker_gets_funded", offer.get("TakerGets")),
+                               offer.get("taker_pays_funded", offer.get("TakerPays")))
+        if split is None:
+            continue
+        level_xrp, token = split
+        level_token = float(token.get("value", 0))
+        if level_xrp <= 0 or level_token <= 0:
+            continue
+        price = level_xrp / level_token
+        if price > limit_price if side == "ask" else price < limit_price:
+            break  # Levels are sorted best first
+        depth += level_xrp
+    return depth
+
+
+class BookCache:
+    """Best bid/ask and last trade price per token against XRP, in XRP per token.
+
+    Sides are refreshed from `book_offers` results that pass through
+    get_order_book and from offers seen on the transaction stream. Trades are
+    derived from consumed Offer nodes in validated metadata. Listeners are
+    called with (currency, issuer, price) whenever a pair's price changes.
+    """
+
+    def __init__(self):
+        self._books = {}  # Structure: {(currency, issuer): {"bid", "ask", "last", "offers", ...}}
+        self._listeners = []
+
+    def add_listener(self, callback):
+        """Registers callback(currency, issuer, price) for price updates."""
+        self._listeners.append(callback)
+
+    def _book(self, currency: str, issuer: str) -> dict:
+        key = (currency, issuer)
+        book = self._books.get(key)
+        if book is None:
+            book = {"bid": None, "ask": None, "last": None,
+                    "bid_time": 0.0, "ask_time": 0.0, "last_time": 0.0,
+                    "asks": [], "bids": []}
+            self._books[key] = book
+        return book
+
+    def _notify(self, currency: str, issuer: str, price: float):
+        for callback in self._listeners:
+            try:
+                callback(currency, issuer, price)
+            except Exception as e:
+                logger.error(f"Error in price listener for {currency}.{issuer}: {e}")
+
+    def update_from_offers(self, currency: str, issuer: str, side: str, offers: list):
+        """Stores a `book_offers` snapshot; side is "ask" (token for XRP) or "bid" (XRP for token)."""
+        book = self._book(currency, issuer)
+        book["asks" if side == "ask" else "bids"] = offers
+        best = None
+        for offer in offers:
+            split = _xrp_and_token(offer.get("TakerGets"), offer.get("TakerPays"))
+            if split is None:
+                continue
+            xrp_amount, token = split
+            token_amount = float(token.get("value", 0))
+            if token_amount > 0:
+                best = xrp_amount / token_amount
+                break
+        book[side] = best
+        book[f"{side}_time"] = time.monotonic()
+        mid = self.mid(currency, issuer)
+        if mid is not None:
+            self._notify(currency, issuer, mid)
+
+    def observe_offer(self, currency: str, issuer: str, side: str, price: float):
+        """Applies a newly placed offer from the stream if it improves that side of the book."""
+        book = self._book(currency, issuer)
+        current = book[side]
+        stale = time.monotonic() - book[f"{side}_time"] > QUOTE_TTL
+        improves = current is None or (price < current if side == "ask" else price > current)
+        if stale or improves:
+            book[side] = price
+            book[f"{side}_time"] = time.monotonic()
+            mid = self.mid(currency, issuer)
+            if mid is not None:
+                self._notify(currency, issuer, mid)
+
+    def on_transaction(self, message: dict):
+        """Records trade prices from Offer nodes consumed in a validated transaction."""
+        meta = message.get("meta")
+        if not isinstance(meta, dict):
+            return
+        for affected in meta.get("AffectedNodes", []):
+            node = affected.get("ModifiedNode") or affected.get("DeletedNode")
+            if not node or node.get("LedgerEntryType") != "Offer":
+                continue
+            previous = node.get("PreviousFields")
+            final = node.get("FinalFields")
+            if not previous or not final or "TakerGets" not in previous:
+                continue
+            split_prev = _xrp_and_token(previous.get("TakerGets"), previous.get("TakerPays"))
+            split_final = _xrp_and_token(final.get("TakerGets"), final.get("TakerPays"))
+            if split_prev is None or split_final is None:
+                continue
+            xrp_traded = split_prev[0] - split_final[0]
+            token_traded = float(split_prev[1].get("value", 0)) - float(split_final[1].get("value", 0))
+            if xrp_traded <= 0 or token_traded <= 0:
+                continue
+            token = split_final[1]
+            book = self._book(token["currency"], token["issuer"])
+            book["last"] = xrp_traded / token_traded
+            book["last_time"] = time.monotonic()
+            self._notify(token["currency"], token["issuer"], book["last"])
+
+    def mid(self, currency: str, issuer: str):
+        """Returns the mark price in XRP per token, or None if the pair has no usable data."""
+        book = self._books.get((currency, issuer))
+        if book is None:
+            return None
+        now = time.monotonic()
+        bid = book["bid"] if now - book["bid_time"] <= QUOTE_TTL else None
+        ask = book["ask"] if now - book["ask_time"] <= QUOTE_TTL else None
+        if bid is not None and ask is not None and bid <= ask:
+            return (bid + ask) / 2
+        if book["last"] is not None and now - book["last_time"] <= QUOTE_TTL:
+            return book["last"]
+        return ask if ask is not None else bid
+
+    def is_stale(self, currency: str, issuer: str) -> bool:
+        """Returns True when neither side of the pair has a fresh quote."""
+        book = self._books.get((currency, issuer))
+        if book is None:
+            return True
+        now = time.monotonic()
+        return now - book["bid_time"] > QUOTE_TTL and now - book["ask_time"] > QUOTE_TTL
+
+    def get_offers(self, currency: str, issuer: str, side: str) -> list:
+        """Returns the last `book_offers` snapshot for one side of the pair."""
+        book = self._books.get((currency, issuer))
+        if book is None:
+            return []
+        return book["asks" if side == "ask" else "bids"]
@@ -0,0 +1,158 @@
+import bisect
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Default histogram buckets, in seconds (from 10 microseconds to 10 seconds)
+DEFAULT_BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025,
+                   0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_registry = {}  # Structure: {name: metric}, in registration order
+_registry_lock = threading.Lock()
+
+
+def _label_key(labels: dict) -> tuple:
+    return tuple(sorted(labels.items()))
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help = help_text
+        self._values = {}  # Structure: {label_key: value}
+        self._lock = threading.Lock()
+
+    def values(self) -> dict:
+        """Returns a copy of the current values keyed by sorted (label, value) tuples."""
+        with self._lock:
+            return dict(self._values)
+
+
+class Counter(_Metric):
+    """Monotonically increasing count, optionally split by labels."""
+
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def set_total(self, value: float, **labels):
+        """Mirrors a cumulative count kept elsewhere (e.g. functools cache statistics)."""
+        with self._lock:
+            self._values[_label_key(labels)] = value
+
+
+class Gauge(_Metric):
+    """Value that goes up and down, e.g. a queue depth."""
+
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[_label_key(labels)] = value
+
+
+class Histogram(_Metric):
+    """Distribution of observations in cumulative buckets, with count and sum."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, buckets: tuple = DEFAULT_BUCKETS):
+        super().__init__(name, help_text)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # Per-bucket (non-cumulative) counts; the last slot is +Inf
+                state = {"counts": [0] * (len(self.buckets) + 1), "sum": 0.0, "count": 0}
+                self._values[key] = state
+            state["counts"][bisect.bisect_left(self.buckets, value)] += 1
+            state["sum"] += value
+            state["count"] += 1
+
+    def values(self) -> dict:
+        with self._lock:
+            return {key: {"counts": list(state["counts"]), "sum": state["sum"], "count": state["count"]}
+                    for key, state in self._values.items()}
+
+
+def _register(cls, name: str, help_text: str, **kwargs):
+    with _registry_lock:
+        metric = _registry.get(name)
+        if metric is None:
+            metric = cls(name, help_text, **kwargs)
+            _registry[name] = metric
+        elif not isinstance(metric, cls):
+            raise ValueError(f"Metric {name} is already registered as a {metric.kind}")
+        return metric
+
+
+def counter(name: str, help_text: str) -> Counter:
+    """Returns the counter registered under name, creating it on first use."""
+    return _register(Counter, name, help_text)
+
+
+def gauge(name: str, help_text: str) -> Gauge:
+    """Returns the gauge registered under name, creating it on first use."""
+    return _register(Gauge, name, help_text)
+
+
+def histogram(name: str, help_text: str, buckets: tuple = DEFAULT_BUCKETS) -> Histogram:
+    """Returns the histogram registered under name, creating it on first use."""
+    return _register(Histogram, name, help_text, buckets=buckets)
+
+
+def registered() -> list:
+    """Returns every registered metric, in registration order."""
+    with _registry_lock:
+        return list(_registry.values())
+
+
+_collectors = []  # Callbacks run before each render, e.g. to sample queue depths into gauges
+
+
+def add_collector(callback):
+    """Registers callback() to refresh gauges right before metrics are rendered."""
+    _collectors.append(callback)
+
+
+def _format_labels(key: tuple, extra: tuple = ()) -> str:
+    labels = key + extra
+    if not labels:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in labels)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(labels, escaped)) + "}"
+
+
+def render() -> str:
+    """Renders every registered metric in the Prometheus text exposition format."""
+    for callback in list(_collectors):
+        try:
+            callback()
+        except Exception as e:
+            logger.error(f"Error in metrics collector {callback}: {e}")
+
+    lines = []
+    for metric in registered():
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        for key, value in metric.values().items():
+            if metric.kind != "histogram":
+                lines.append(f"{metric.name}{_format_labels(key)} {value}")
+                continue
+            cumulative = 0
+            for bound, count in zip(metric.buckets + (float("inf"),), value["counts"]):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{metric.name}_bucket{_format_labels(key, (('le', le),))} {cumulative}")
+            lines.append(f"{metric.name}_sum{_format_labels(key)} {value['sum']}")
+            lines.append(f"{metric.name}_count{_format_labels(key)} {value['count']}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,190 @@
+import asyncio
+import logging
+import time
+
+import xrpl
+from xrpl.utils import posix_to_ripple_time
+
+logger = logging.getLogger(__name__)
+
+# Cache configuration
+ACCOUNT_OFFERS_PAGE_SIZE = 400  # Offers fetched per `account_offers` page
+OFFLINE_REFRESH_INTERVAL = 30  # Seconds the offer set stays fresh while the stream is not running
+
+
+class OpenOffers:
+    """Per-wallet open DEX offers, kept current from the account stream.
+
+    Each wallet is seeded once with paginated `account_offers`, then
+    updated from the Offer nodes in the metadata of validated transactions:
+    CreatedNode adds an offer, ModifiedNode updates its remaining amounts
+    and DeletedNode removes it, whether it filled or was cancelled. While
+    the stream is down, entries are re-seeded the same way the positions
+    cache does it.
+
+    Offers the bot itself placed are remembered by sequence (and persisted
+    by the caller), so sweeps only ever cancel the bot's own offers and
+    leave ones the user placed elsewhere alone.
+    """
+
+    def __init__(self, client, ledger_scheduler):
+        self.client = client
+        self.ledger_scheduler = ledger_scheduler
+        self._offers = {}  # Structure: {address: {"offers": {sequence: offer}, "updated": float}}
+        self._seed_locks = {}
+        self._cancelling = {}  # Structure: {address: {sequence, ...}} with an OfferCancel in flight
+        self._placed = {}  # Structure: {address: {sequence, ...}} of offers the bot submitted
+
+    def track(self, address: str):
+        """Starts tracking a wallet; it is seeded on first access."""
+        self._offers.pop(address, None)
+        self._seed_locks.setdefault(address, asyncio.Lock())
+
+    def untrack(self, address: str):
+        """Stops tracking a wallet that was replaced."""
+        self._offers.pop(address, None)
+        self._seed_locks.pop(address, None)
+        self._cancelling.pop(address, None)
+        self._placed.pop(address, None)
+
+    def _seed(self, address: str) -> dict:
+        """Fetches every open offer of the wallet over JSON-RPC."""
+        entry = {"offers": {}, "updated": time.monotonic()}
+        marker = None
+        while True:
+            response = self.client.request(xrpl.models.requests.AccountOffers(
+                account=address, ledger_index="validated", limit=ACCOUNT_OFFERS_PAGE_SIZE, marker=marker
+            ))
+            if not response.is_successful():
+                return {"error": response.result.get("error_message") or response.result.get("error", "Unknown error")}
+            for offer in response.result.get("offers", []):
+                entry["offers"][offer["seq"]] = {
+                    "sequence": offer["seq"],
+                    "taker_gets": offer["taker_gets"],
+                    "taker_pays": offer["taker_pays"],
+                    "expiration": offer.get("expiration"),
+                }
+            marker = response.result.get("marker")
+            if not marker:
+                break
+
+        logger.info(f"Seeded open offers for {address}: {len(entry['offers'])} offer(s)")
+        return entry
+
+    def _is_fresh(self, entry: dict) -> bool:
+        if self.ledger_scheduler.is_stream_live():
+            return True
+        return time.monotonic() - entry["updated"] < OFFLINE_REFRESH_INTERVAL
+
+    async def get(self, address: str) -> dict:
+        """Returns {sequence: offer} for the wallet's open offers, seeding it if needed."""
+        entry = self._offers.get(address)
+        if entry is not None and self._is_fresh(entry):
+            return entry["offers"]
+
+        lock = self._seed_locks.setdefault(address, asyncio.Lock())
+        async with lock:
+            entry = self._offers.get(address)
+            if entry is not None and self._is_fresh(entry):
+                return entry["offers"]
+            try:
+                entry = await asyncio.get_running_loop().run_in_executor(None, self._seed, address)
+            except Exception as e:
+                logger.error(f"Error seeding open offers for {address}: {e}")
+                return {"error": str(e)}
+            if "error" in entry:
+                return entry
+            self._offers[address] = entry
+            # Offers filled or cancelled while nobody was watching are no longer ours to sweep
+            if address in self._placed:
+                self._placed[address].intersection_update(entry["offers"])
+            return entry["offers"]
+
+    def count(self, address: str):
+        """Returns the number of cached open offers, or None if the wallet is not seeded yet."""
+        entry = self._offers.get(address)
+        return None if entry is None else len(entry["offers"])
+
+    async def stale(self, address: str) -> list:
+        """Returns sequences of the bot's own offers whose on-ledger Expiration has passed.
+
+        Expired offers stay in the ledger, locking reserve, until they are
+        crossed or cancelled. The Expiration field is the age source, so
+        the answer does not depend on when this process first saw an offer.
+        """
+        placed = self._placed.get(address)
+        if not placed:
+            return []
+        offers = await self.get(address)
+        if "error" in offers:
+            return []
+        now_ripple = posix_to_ripple_time(time.time())
+        cancelling = self._cancelling.get(address, set())
+        return [
+            sequence for sequence, offer in offers.items()
+            if sequence in placed and sequence not in cancelling
+            and offer["expiration"] is not None and offer["expiration"] <= now_ripple
+        ]
+
+    def mark_placed(self, address: str, message: dict) -> bool:
+        """Records the offer a validated OfferCreate of the bot left on the book; returns whether there was one."""
+        meta = message.get("meta")
+        if not isinstance(meta, dict):
+            return False
+        for affected in meta.get("AffectedNodes", []):
+            node = affected.get("CreatedNode")
+            if node and node.get("LedgerEntryType") == "Offer" and node.get("NewFields", {}).get("Account") == address:
+                self._placed.setdefault(address, set()).add(node["NewFields"]["Sequence"])
+                return True
+        return False
+
+    def placed_offers(self) -> dict:
+        """Returns {address: [sequence, ...]} of the bot's own open offers, for persistence."""
+        return {address: sorted(sequences) for address, sequences in self._placed.items() if sequences}
+
+    def load_placed_offers(self, data: dict):
+        """Restores the bot's own open offers saved with placed_offers()."""
+        self._placed = {address: set(sequences) for address, sequences in data.items()}
+
+    def mark_cancelling(self, address: str, sequences: list):
+        """Records OfferCancels in flight so sweeps do not cancel an offer twice."""
+        self._cancelling.setdefault(address, set()).update(sequences)
+
+    def clear_cancelling(self, address: str, sequences: list):
+        """Clears in-flight OfferCancels once they have settled."""
+        self._cancelling.get(address, set()).difference_update(sequences)
+
+    def on_transaction(self, message: dict):
+        """Applies a validated transaction's Offer changes to any tracked wallet."""
+        if not self._offers and not self._placed:
+            return
+        meta = message.get("meta")
+        if not isinstance(meta, dict):
+            return
+
+        for affected in meta.get("AffectedNodes", []):
+            node_type, node = next(iter(affected.items()))
+            if node.get("LedgerEntryType") != "Offer":
+                continue
+            fields = node.get("FinalFields") or node.get("NewFields") or {}
+            if node_type == "DeletedNode" and fields.get("Account") in self._placed:
+                self._placed[fields["Account"]].discard(fields.get("Sequence"))
+            entry = self._offers.get(fields.get("Account"))
+            if entry is None or "Sequence" not in fields:
+                continue
+
+            sequence = fields["Sequence"]
+            if node_type == "DeletedNode":
+                entry["offers"].pop(sequence, None)
+            elif node_type == "CreatedNode":
+                entry["offers"][sequence] = {
+                    "sequence": sequence,
+                    "taker_gets": fields.get("TakerGets"),
+                    "taker_pays": fields.get("TakerPays"),
+                    "expiration": fields.get("Expiration"),
+                }
+            elif sequence in entry["offers"]:
+                entry["offers"][sequence].update(
+                    taker_gets=fields.get("TakerGets"), taker_pays=fields.get("TakerPays")
+                )
+            entry["updated"] = time.monotonic()
@@ -0,0 +1,177 @@
+import asyncio
+import logging
+from decimal import ROUND_DOWN, Decimal
+
+import xrpl
+from xrpl.models import IssuedCurrencyAmount, OfferCancel, OfferCreate, TrustSet
+
+logger = logging.getLogger(__name__)
+
+# Template configuration
+TRUSTLINE_LIMIT = "10000000000000000"  # Large limit used for sniped tokens
+PLACEHOLDER_SEQUENCE = 1  # Replaced on every order
+PLACEHOLDER_FEE = "10"  # Replaced on every order
+PLACEHOLDER_DROPS = "1"  # Replaced on every order
+PLACEHOLDER_VALUE = "1"  # Replaced on every order
+
+# OfferCreate flags
+TF_IMMEDIATE_OR_CANCEL = 0x00020000
+TF_FILL_OR_KILL = 0x00040000
+
+
+def xrp_to_drops_str(amount_xrp: float) -> str:
+    """Converts an XRP amount to a drops string, rounding down to whole drops."""
+    return str(int((Decimal(str(amount_xrp)) * 1_000_000).to_integral_value(rounding=ROUND_DOWN)))
+
+
+def format_token_value(value: float) -> str:
+    """Formats a token amount within the 15 significant digits issued currencies allow."""
+    return f"{value:.15g}"
+
+
+class OrderTemplateCache:
+    """Caches validated XRPL-JSON transaction templates per (wallet, pair, side).
+
+    Each template is built once through the xrpl-py models, so it is validated
+    once. Orders then copy the template and patch only the variable fields
+    (amounts, Flags, Expiration, Sequence, Fee, LastLedgerSequence) before
+    they are hashed and signed. This skips model construction, validation
+    and autofill on the hot path.
+
+    Account sequences are tracked locally as well. Concurrent orders from one
+    wallet get consecutive sequences without an `account_info` call per order.
+    The sequence is prefetched in an executor when a wallet loads and again
+    after a resync, so orders normally find it ready. Sequences are only
+    touched on the event loop thread, so no lock is needed.
+    """
+
+    def __init__(self, client):
+        self.client = client
+        self._templates = {}
+        self._sequences = {}  # Structure: {address: next sequence to use}
+        self._prefetches = {}  # Structure: {address: task fetching the sequence}
+        self._generations = {}  # Structure: {address: resync count}, so a fetch started before a resync is dropped
+
+    def _offer_template(self, address: str, currency: str, issuer: str, side: str) -> dict:
+        """Returns the OfferCreate template for a wallet, pair and side ("buy" or "sell")."""
+        key = (address, currency, issuer, side)
+        template = self._templates.get(key)
+        if template is None:
+            token = IssuedCurrencyAmount(currency=currency, issuer=issuer, value=PLACEHOLDER_VALUE)
+            # TakerGets is what the wallet gives up, TakerPays what it receives
+            if side == "buy":
+                offer = OfferCreate(account=address, taker_gets=PLACEHOLDER_DROPS, taker_pays=token,
+                                    sequence=PLACEHOLDER_SEQUENCE, fee=PLACEHOLDER_FEE)
+            else:
+                offer = OfferCreate(account=address, taker_gets=token, taker_pays=PLACEHOLDER_DROPS,
+                                    sequence=PLACEHOLDER_SEQUENCE, fee=PLACEHOLDER_FEE)
+            template = offer.to_xrpl()
+            self._templates[key] = template
+        return template
+
+    def _trust_set_template(self, address: str, currency: str, issuer: str) -> dict:
+        """Returns the TrustSet template for a wallet and token."""
+        key = (address, currency, issuer, "trust")
+        template = self._templates.get(key)
+        if template is None:
+            trust_set = TrustSet(
+                account=address,
+                limit_amount=IssuedCurrencyAmount(currency=currency, issuer=issuer, value=TRUSTLINE_LIMIT),
+                sequence=PLACEHOLDER_SEQUENCE,
+                fee=PLACEHOLDER_FEE,
+            )
+            template = trust_set.to_xrpl()
+            self._templates[key] = template
+        return template
+
+    def _offer_cancel_template(self, address: str) -> dict:
+        """Returns the OfferCancel template for a wallet."""
+        key = (address, "cancel")
+        template = self._templates.get(key)
+        if template is None:
+            offer_cancel = OfferCancel(
+                account=address,
+                offer_sequence=PLACEHOLDER_SEQUENCE,
+                sequence=PLACEHOLDER_SEQUENCE,
+                fee=PLACEHOLDER_FEE,
+            )
+            template = offer_cancel.to_xrpl()
+            self._templates[key] = template
+        return template
+
+    def offer(self, address: str, currency: str, issuer: str, side: str,
+              token_value: str, xrp_drops: str, flags: int = 0, expiration: int = None) -> dict:
+        """Builds an OfferCreate from the cached template.
+
+        For "buy" orders the wallet pays xrp_drops for token_value of the
+        token; for "sell" orders it pays token_value for xrp_drops.
+        """
+        tx_json = dict(self._offer_template(address, currency, issuer, side))
+        if side == "buy":
+            tx_json["TakerGets"] = xrp_drops
+            tx_json["TakerPays"] = dict(tx_json["TakerPays"], value=token_value)
+        else:
+            tx_json["TakerGets"] = dict(tx_json["TakerGets"], value=token_value)
+            tx_json["TakerPays"] = xrp_drops
+        tx_json["Flags"] = flags
+        if expiration is not None:
+            tx_json["Expiration"] = expiration
+        return tx_json
+
+    def trust_set(self, address: str, currency: str, issuer: str) -> dict:
+        """Builds a TrustSet for the token from the cached template."""
+        return dict(self._trust_set_template(address, currency, issuer))
+
+    def offer_cancel(self, address: str, offer_sequence: int) -> dict:
+        """Builds an OfferCancel for one of the wallet's offers from the cached template."""
+        tx_json = dict(self._offer_cancel_template(address))
+        tx_json["OfferSequence"] = offer_sequence
+        return tx_json
+
+    def prefetch(self, address: str):
+        """Starts fetching the account sequence for address in an executor; returns the task, or None if known."""
+        if address in self._sequences:
+            return None
+        task = self._prefetches.get(address)
+        if task is None:
+            task = asyncio.get_running_loop().create_task(self._fetch_sequence(address))
+            self._prefetches[address] = task
+        return task
+
+    async def _fetch_sequence(self, address: str) -> bool:
+        """Fetches and stores the account sequence; returns False if the request failed."""
+        generation = self._generations.get(address, 0)
+        try:
+            sequence = await asyncio.get_running_loop().run_in_executor(
+                None, xrpl.account.get_next_valid_seq_number, address, self.client
+            )
+        except Exception as e:
+            logger.error(f"Error fetching account sequence for {address}: {e}")
+            return False
+        finally:
+            self._prefetches.pop(address, None)
+        # A resync while the request was in flight makes its answer untrustworthy; the caller fetches again
+        if self._generations.get(address, 0) == generation:
+            self._sequences.setdefault(address, sequence)
+        return True
+
+    async def next_sequence(self, address: str) -> int:
+        """Reserves the next account sequence for address, waiting for the fetch only if it was not prefetched."""
+        while address not in self._sequences:
+            if not await self.prefetch(address):
+                raise RuntimeError(f"Could not fetch the account sequence of {address}")
+        sequence = self._sequences[address]
+        self._sequences[address] = sequence + 1
+        return sequence
+
+    def resync(self, address: str):
+        """Forgets the local sequence for address and fetches it again, e.g. after a rejected submission."""
+        self._sequences.pop(address, None)
+        self._generations[address] = self._generations.get(address, 0) + 1
+        self.prefetch(address)
+
+    def invalidate(self, address: str):
+        """Drops every template and the sequence for a wallet that was replaced."""
+        self._templates = {key: value for key, value in self._templates.items() if key[0] != address}
+        self._sequences.pop(address, None)
+        self._generations[address] = self._generations.get(address, 0) + 1
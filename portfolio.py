@@ -0,0 +1,157 @@
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def fill_from_meta(result: dict, address: str, currency: str, issuer: str) -> tuple:
+    """Returns (token_delta, xrp_delta) a validated transaction caused for address.
+
+    The XRP delta excludes the transaction fee, so it reflects only what was
+    traded. Positive token_delta means tokens were received.
+    """
+    token_delta = 0.0
+    xrp_delta = 0.0
+    meta = result.get("meta")
+    if not isinstance(meta, dict):
+        return token_delta, xrp_delta
+
+    for affected in meta.get("AffectedNodes", []):
+        node_type, node = next(iter(affected.items()))
+        entry_type = node.get("LedgerEntryType")
+        final = node.get("FinalFields") or node.get("NewFields") or {}
+        previous = node.get("PreviousFields", {})
+
+        if entry_type == "AccountRoot" and final.get("Account") == address:
+            if "Balance" in previous:
+                xrp_delta += (int(final["Balance"]) - int(previous["Balance"])) / 1_000_000
+
+        elif entry_type == "RippleState" and final.get("Balance", {}).get("currency") == currency:
+            low = final.get("LowLimit", {}).get("issuer")
+            high = final.get("HighLimit", {}).get("issuer")
+            if (low, high) == (address, issuer):
+                sign = 1
+            elif (low, high) == (issuer, address):
+                sign = -1
+            else:
+                continue
+            after = 0.0 if node_type == "DeletedNode" else float(final["Balance"]["value"])
+            if node_type == "CreatedNode":
+                before = 0.0
+            elif "Balance" in previous:
+                before = float(previous["Balance"]["value"])
+            else:
+                before = after
+            token_delta += sign * (after - before)
+
+    if result.get("Account") == address:
+        xrp_delta += int(result.get("Fee", 0)) / 1_000_000
+    return token_delta, xrp_delta
+
+
+class FillHistory:
+    """Average-cost basis per user and token, built from executed fills."""
+
+    def __init__(self):
+        self.holdings = {}  # Structure: {user_id: {(currency, issuer): {"qty", "cost_xrp", "realized_xrp"}}}
+
+    def record_fill(self, user_id: int, currency: str, issuer: str, token_delta: float, xrp_delta: float):
+        """Applies a fill: token_delta > 0 is a buy paid with -xrp_delta, < 0 a sell for xrp_delta."""
+        holding = self.holdings.setdefault(user_id, {}).setdefault(
+            (currency, issuer), {"qty": 0.0, "cost_xrp": 0.0, "realized_xrp": 0.0}
+        )
+        if token_delta > 0:
+            holding["qty"] += token_delta
+            holding["cost_xrp"] += -xrp_delta
+        elif token_delta < 0:
+            sold = min(-token_delta, holding["qty"])
+            average_cost = holding["cost_xrp"] / holding["qty"] if holding["qty"] > 0 else 0.0
+            holding["realized_xrp"] += xrp_delta - average_cost * sold
+            holding["cost_xrp"] -= average_cost * sold
+            holding["qty"] -= sold
+
+    def get(self, user_id: int, currency: str, issuer: str):
+        """Returns the holding record for a token, or None if nothing was ever filled."""
+        return self.holdings.get(user_id, {}).get((currency, issuer))
+
+    def to_dict(self) -> dict:
+        """Serializes for sniper_data.json."""
+        return {
+            str(user_id): {f"{currency}:{issuer}": holding for (currency, issuer), holding in tokens.items()}
+            for user_id, tokens in self.holdings.items()
+        }
+
+    def load(self, data: dict):
+        """Restores from sniper_data.json."""
+        self.holdings = {
+            int(user_id): {tuple(key.split(":", 1)): holding for key, holding in tokens.items()}
+            for user_id, tokens in data.items()
+        }
+
+
+def valuate(positions_by_user: dict, fills: FillHistory, book_cache) -> dict:
+    """Marks every holding of every user to market in one vectorized pass.
+
+    positions_by_user maps user_id to a get_positions() result. Returns
+    {user_id: {"xrp", "holdings": [...], "total_value_xrp", "total_unrealized_pnl_xrp"}}
+    where unknown marks or cost bases are reported as None.
+    """
+    user_ids = list(positions_by_user)
+    user_index, pairs, balances, cost_qty, cost_xrp = [], [], [], [], []
+    for index, user_id in enumerate(user_ids):
+        for token in positions_by_user[user_id].get("tokens", []):
+            holding = fills.get(user_id, token["currency"], token["issuer"])
+            user_index.append(index)
+            pairs.append((token["currency"], token["issuer"]))
+            balances.append(token["balance"])
+            cost_qty.append(holding["qty"] if holding else 0.0)
+            cost_xrp.append(holding["cost_xrp"] if holding else np.nan)
+
+    summaries = {
+        user_id: {"xrp": positions_by_user[user_id].get("xrp", 0.0), "holdings": [],
+                  "total_value_xrp": 0.0, "total_unrealized_pnl_xrp": 0.0}
+        for user_id in user_ids
+    }
+    if not pairs:
+        for summary in summaries.values():
+            summary["total_value_xrp"] = summary["xrp"]
+        return summaries
+
+    # One mark lookup per distinct pair, shared by every user holding it
+    unique_pairs = list(dict.fromkeys(pairs))
+    unique_marks = np.array([
+        mark if (mark := book_cache.mid(currency, issuer)) is not None else np.nan
+        for currency, issuer in unique_pairs
+    ])
+    pair_position = {pair: i for i, pair in enumerate(unique_pairs)}
+    marks = unique_marks[[pair_position[pair] for pair in pairs]]
+
+    user_index = np.array(user_index)
+    balances = np.array(balances, dtype=float)
+    cost_qty = np.array(cost_qty, dtype=float)
+    cost_xrp = np.array(cost_xrp, dtype=float)
+
+    values = balances * marks
+    # Cost basis of the balance actually held, scaled if tokens moved in or out outside our fills
+    with np.errstate(divide="ignore", invalid="ignore"):
+        held_cost = np.where(cost_qty > 0, cost_xrp * np.minimum(balances / cost_qty, 1.0), np.nan)
+    pnl = values - held_cost
+
+    total_values = np.bincount(user_index, weights=np.nan_to_num(values), minlength=len(user_ids))
+    total_pnl = np.bincount(user_index, weights=np.nan_to_num(pnl), minlength=len(user_ids))
+
+    for i, (currency, issuer) in enumerate(pairs):
+        summaries[user_ids[user_index[i]]]["holdings"].append({
+            "currency": currency,
+            "issuer": issuer,
+            "balance": balances[i],
+            "mark_xrp": None if np.isnan(marks[i]) else float(marks[i]),
+            "value_xrp": None if np.isnan(values[i]) else float(values[i]),
+            "cost_basis_xrp": None if np.isnan(held_cost[i]) else float(held_cost[i]),
+            "unrealized_pnl_xrp": None if np.isnan(pnl[i]) else float(pnl[i]),
+        })
+    for index, user_id in enumerate(user_ids):
+        summaries[user_id]["total_value_xrp"] = summaries[user_id]["xrp"] + float(total_values[index])
+        summaries[user_id]["total_unrealized_pnl_xrp"] = float(total_pnl[index])
+    return summaries
@@ -0,0 +1,148 @@
+import asyncio
+import logging
+import time
+
+import xrpl
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+CACHE_REQUESTS = metrics.counter("cache_requests_total", "Cache lookups by cache and result (hit/miss)")
+
+# Cache configuration
+ACCOUNT_LINES_PAGE_SIZE = 400  # Trustlines fetched per `account_lines` page
+OFFLINE_REFRESH_INTERVAL = 30  # Seconds a position stays fresh while the stream is not running
+
+
+class PositionsCache:
+    """Per-wallet XRP and trustline balances, served from memory.
+
+    Each wallet is seeded once with `account_info` plus paginated
+    `account_lines`. After that it is kept current from the metadata of
+    validated transactions that touch the wallet: stream messages and our
+    own order results. While the stream is down, entries older than
+    OFFLINE_REFRESH_INTERVAL are re-seeded on access. A burst of refreshes
+    then still costs at most one round of RPC calls. Transactions missed
+    while the stream was disconnected are covered by invalidate(), which
+    the stream calls on every (re)subscribe.
+    """
+
+    def __init__(self, client, ledger_scheduler):
+        self.client = client
+        self.ledger_scheduler = ledger_scheduler
+        self._positions = {}  # Structure: {address: {"xrp_drops": int, "lines": {(currency, issuer): balance}}}
+        self._seed_locks = {}
+        self._generation = 0  # Bumped by invalidate() so seeds started before it are not stored
+
+    def track(self, address: str):
+        """Starts tracking a wallet; it is seeded on first access."""
+        self._positions.pop(address, None)
+        self._seed_locks.setdefault(address, asyncio.Lock())
+
+    def untrack(self, address: str):
+        """Stops tracking a wallet that was replaced."""
+        self._positions.pop(address, None)
+        self._seed_locks.pop(address, None)
+
+    def invalidate(self):
+        """Marks every tracked wallet stale; each is re-seeded on its next access."""
+        self._positions.clear()
+        self._generation += 1
+
+    def _seed(self, address: str) -> dict:
+        """Fetches the wallet's XRP balance and every trustline over JSON-RPC."""
+        response = self.client.request(xrpl.models.requests.AccountInfo(account=address, ledger_index="validated"))
+        if not response.is_successful():
+            return {"error": response.result.get("error_message") or response.result.get("error", "Unknown error")}
+        position = {
+            "xrp_drops": int(response.result["account_data"]["Balance"]),
+            "lines": {},
+            "updated": time.monotonic(),
+        }
+
+        marker = None
+        while True:
+            response = self.client.request(xrpl.models.requests.AccountLines(
+                account=address, ledger_index="validated", limit=ACCOUNT_LINES_PAGE_SIZE, marker=marker
+            ))
+            if not response.is_successful():
+                return {"error": response.result.get("error_message") or response.result.get("error", "Unknown error")}
+            for line in response.result.get("lines", []):
+                position["lines"][(line["currency"], line["account"])] = float(line["balance"])
+            marker = response.result.get("marker")
+            if not marker:
+                break
+
+        logger.info(f"Seeded positions for {address}: {len(position['lines'])} trustline(s)")
+        return position
+
+    def _is_fresh(self, position: dict) -> bool:
+        """Returns True when a cached position can be served without RPC."""
+        if self.ledger_scheduler.is_stream_live():
+            return True
+        return time.monotonic() - position["updated"] < OFFLINE_REFRESH_INTERVAL
+
+    async def get(self, address: str) -> dict:
+        """Returns the cached position for address, seeding it if needed."""
+        position = self._positions.get(address)
+        if position is not None and self._is_fresh(position):
+            CACHE_REQUESTS.inc(cache="positions", result="hit")
+            return position
+        CACHE_REQUESTS.inc(cache="positions", result="miss")
+
+        lock = self._seed_locks.setdefault(address, asyncio.Lock())
+        async with lock:
+            # Another caller may have seeded it while we waited for the lock
+            position = self._positions.get(address)
+            if position is not None and self._is_fresh(position):
+                return position
+            generation = self._generation
+            try:
+                position = await asyncio.get_running_loop().run_in_executor(None, self._seed, address)
+            except Exception as e:
+                logger.error(f"Error seeding positions for {address}: {e}")
+                return {"error": str(e)}
+            if "error" not in position and generation == self._generation:
+                self._positions[address] = position
+            return position
+
+    async def get_token_balance(self, address: str, currency: str, issuer: str) -> float:
+        """Returns the wallet's balance of a token, 0 if it holds none."""
+        position = await self.get(address)
+        return position.get("lines", {}).get((currency, issuer), 0.0)
+
+    def on_transaction(self, message: dict):
+        """Applies a validated transaction's balance changes to any tracked wallet."""
+        if not self._positions:
+            return
+        meta = message.get("meta")
+        if not isinstance(meta, dict):
+            return
+
+        for affected in meta.get("AffectedNodes", []):
+            node_type, node = next(iter(affected.items()))
+            entry_type = node.get("LedgerEntryType")
+            fields = node.get("FinalFields") or node.get("NewFields") or {}
+
+            if entry_type == "AccountRoot":
+                position = self._positions.get(fields.get("Account"))
+                if position is not None and "Balance" in fields:
+                    position["xrp_drops"] = int(fields["Balance"])
+                    position["updated"] = time.monotonic()
+
+            elif entry_type == "RippleState":
+                low = fields.get("LowLimit", {}).get("issuer")
+                high = fields.get("HighLimit", {}).get("issuer")
+                balance = fields.get("Balance", {})
+                # Balance is stored from the low account's point of view
+                for holder, counterparty, sign in ((low, high, 1), (high, low, -1)):
+                    position = self._positions.get(holder)
+                    if position is None:
+                        continue
+                    key = (balance.get("currency"), counterparty)
+                    if node_type == "DeletedNode":
+                        position["lines"].pop(key, None)
+                    else:
+                        position["lines"][key] = sign * float(balance.get("value", 0))
+                    position["updated"] = time.monotonic()
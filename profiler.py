@@ -0,0 +1,159 @@
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+logger = logging.getLogger(__name__)
+
+# Profiler configuration
+SAMPLE_INTERVAL = 0.005  # Seconds between stack samples of every thread
+MAX_DURATION = 120  # Longest profile an admin can request, in seconds
+TOP_FUNCTIONS = 25  # Rows in the hot-function table
+
+# Innermost frames of a thread parked waiting for work; such samples are counted as idle
+IDLE_FRAMES = frozenset({
+    ("selectors.py", "select"),  # Event loop waiting for I/O or a timer
+    ("thread.py", "_worker"),  # Executor thread blocked on its work queue (the get itself is in C)
+    ("handlers.py", "dequeue"),  # Log listener thread waiting for records
+    ("threading.py", "wait"),
+    ("queue.py", "get"),
+})
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}:{code.co_firstlineno}"
+
+
+def _is_idle(frame) -> bool:
+    return (os.path.basename(frame.f_code.co_filename), frame.f_code.co_name) in IDLE_FRAMES
+
+
+class SamplingProfiler:
+    """On-demand statistical profiler of the event loop and its worker threads.
+
+    While a profile runs, a dedicated daemon thread samples the stack of
+    every other thread every SAMPLE_INTERVAL and counts identical stacks,
+    each labelled with its thread name. This covers the executor threads
+    that run signing, RPC and SQLite work as well as the event loop.
+    Samples where a thread is parked waiting for work (its innermost frame
+    is in IDLE_FRAMES) are counted as idle for that thread and left out of
+    the stacks, so the output shows where busy time goes. Nothing is
+    installed when no profile is running. The output is in the
+    collapsed-stack format ("thread;outer;...;inner count") read by
+    flamegraph.pl and speedscope.
+    """
+
+    def __init__(self, interval: float = SAMPLE_INTERVAL):
+        self.interval = interval
+        self._lock = asyncio.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._lock.locked()
+
+    def _sample(self, stop: threading.Event, stacks: Counter, threads: dict) -> int:
+        """Samples every thread but this one until stop is set; returns the number of sampling rounds."""
+        own = threading.get_ident()
+        rounds = 0
+        while not stop.wait(self.interval):
+            rounds += 1
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                name = names.get(ident, f"thread-{ident}")
+                counts = threads.setdefault(name, {"samples": 0, "idle": 0})
+                counts["samples"] += 1
+                if _is_idle(frame):
+                    counts["idle"] += 1
+                    continue
+                labels = []
+                while frame is not None:
+                    labels.append(_frame_label(frame))
+                    frame = frame.f_back
+                labels.append(name)
+                stacks[";".join(reversed(labels))] += 1
+        return rounds
+
+    async def profile(self, seconds: float) -> dict:
+        """Samples every thread for `seconds`.
+
+        Returns {"collapsed", "top", "samples", "threads", "loop_thread",
+        "stack_samples", "seconds"}; "threads" maps each thread name to its
+        {"samples", "idle"} counts. Raises RuntimeError if a profile is
+        already running.
+        """
+        if self.running:
+            raise RuntimeError("A profile is already running")
+        seconds = max(1.0, min(seconds, MAX_DURATION))
+        async with self._lock:
+            loop = asyncio.get_running_loop()
+            stop = threading.Event()
+            stacks = Counter()
+            threads = {}
+            done = loop.create_future()
+
+            def sample():
+                try:
+                    result = self._sample(stop, stacks, threads)
+                except Exception as e:
+                    loop.call_soon_threadsafe(done.set_exception, e)
+                else:
+                    loop.call_soon_threadsafe(done.set_result, result)
+
+            sampler = threading.Thread(target=sample, name="profiler", daemon=True)
+            started = time.perf_counter()
+            sampler.start()
+            try:
+                await asyncio.sleep(seconds)
+            finally:
+                stop.set()
+            samples = await done
+            elapsed = time.perf_counter() - started
+        logger.info(f"Profiled {elapsed:.1f}s: {samples} samples of {len(threads)} thread(s), "
+                    f"{len(stacks)} distinct stacks")
+        return {
+            "collapsed": "\n".join(f"{stack} {count}" for stack, count in stacks.most_common()) + "\n",
+            "top": self._top(stacks),
+            "samples": samples,
+            "threads": threads,
+            "loop_thread": threading.current_thread().name,
+            "stack_samples": sum(stacks.values()),
+            "seconds": elapsed,
+        }
+
+    @staticmethod
+    def _top(stacks: Counter, limit: int = TOP_FUNCTIONS) -> list:
+        """Returns (function, self samples, total samples) for the hottest functions by self time."""
+        self_counts = Counter()
+        total_counts = Counter()
+        for stack, count in stacks.items():
+            frames = stack.split(";")[1:]  # Drop the thread name
+            if not frames:
+                continue
+            self_counts[frames[-1]] += count
+            for frame in set(frames):
+                total_counts[frame] += count
+        return [(frame, count, total_counts[frame]) for frame, count in self_counts.most_common(limit)]
+
+
+def format_top(report: dict, limit: int = TOP_FUNCTIONS) -> str:
+    """Formats per-thread busy time and the hot-function table as fixed-width text.
+
+    Function percentages are of busy samples across all threads.
+    """
+    samples = max(1, report["stack_samples"])
+    lines = [f"{report['samples']} samples, busy time per thread:"]
+    busiest = sorted(report["threads"].items(), key=lambda item: item[1]["idle"] - item[1]["samples"])
+    for name, counts in busiest:
+        busy = 100 * (counts["samples"] - counts["idle"]) / max(1, counts["samples"])
+        marker = " (event loop)" if name == report["loop_thread"] else ""
+        lines.append(f"{busy:6.1f}%  {name}{marker}")
+    lines.append(f"{'self%':>6} {'total%':>6}  function")
+    for frame, self_count, total_count in report["top"][:limit]:
+        lines.append(f"{100 * self_count / samples:6.1f} {100 * total_count / samples:6.1f}  {frame}")
+    return "\n".join(lines)
@@ -0,0 +1,145 @@
+import asyncio
+import json
+import logging
+from collections import OrderedDict
+
+import xrpl
+
+logger = logging.getLogger(__name__)
+
+# Tracker configuration
+FALLBACK_POLL_INTERVAL = 1  # Seconds between `tx` polls when the stream is down
+RECENT_RESULTS_SIZE = 1024  # Validated results kept for hashes nobody is waiting on yet
+
+
+class ResultTracker:
+    """Resolves per-hash futures from validated transactions seen on the WebSocket.
+
+    The sniper subscribes once to all wallet accounts on its existing
+    connection and feeds every validated transaction message here, so order
+    submitters can simply ``await tracker.wait(tx_hash)`` instead of each
+    polling `tx` over JSON-RPC. Polling is only used while the stream is down
+    or to confirm an order that is about to expire.
+    """
+
+    def __init__(self, client, ledger_scheduler):
+        self.client = client
+        self.ledger_scheduler = ledger_scheduler
+        self.accounts = set()
+        self._futures = {}
+        self._recent = OrderedDict()
+
+    async def subscribe_accounts(self, ws, addresses: list):
+        """Subscribes the WebSocket to the given wallet accounts."""
+        new_accounts = [address for address in addresses if address]
+        self.accounts.update(new_accounts)
+        if ws is None or not new_accounts:
+            return
+        try:
+            await ws.send(json.dumps({
+                "id": "result_tracker",
+                "command": "subscribe",
+                "accounts": new_accounts
+            }))
+            logger.info(f"Subscribed to {len(new_accounts)} wallet account(s)")
+        except Exception as e:
+            logger.error(f"Error subscribing to wallet accounts: {e}")
+
+    def on_transaction(self, message: dict):
+        """Resolves the waiter for a validated transaction stream message, if any."""
+        transaction = message.get("transaction") or message.get("tx_json") or {}
+        tx_hash = message.get("hash") or transaction.get("hash")
+        if not tx_hash:
+            return
+
+        future = self._futures.get(tx_hash)
+        if future is None and transaction.get("Account") not in self.accounts:
+            return
+
+        meta = message.get("meta", {})
+        result = dict(transaction)
+        result.update({
+            "hash": tx_hash,
+            "meta": meta,
+            "ledger_index": message.get("ledger_index"),
+            "validated": True,
+            "engine_result": meta.get("TransactionResult") or message.get("engine_result"),
+        })
+
+        if future is not None:
+            if not future.done():
+                future.set_result(result)
+        else:
+            # The message can beat the submitter's wait(), keep it briefly
+            self._recent[tx_hash] = result
+            if len(self._recent) > RECENT_RESULTS_SIZE:
+                self._recent.popitem(last=False)
+
+    def register(self, tx_hash: str):
+        """Registers interest in tx_hash before it is submitted, so no result is missed."""
+        future = self._futures.get(tx_hash)
+        if future is None:
+            future = asyncio.get_running_loop().create_future()
+            recent = self._recent.pop(tx_hash, None)
+            if recent is not None:
+                future.set_result(recent)
+            self._futures[tx_hash] = future
+        return future
+
+    def forget(self, tx_hash: str):
+        """Drops interest in tx_hash, e.g. after the submission was rejected."""
+        self._futures.pop(tx_hash, None)
+
+    def _poll(self, tx_hashes: list):
+        """Looks up tx_hashes over JSON-RPC, returning the first validated result."""
+        for tx_hash in tx_hashes:
+            try:
+                response = self.client.request(xrpl.models.requests.Tx(transaction=tx_hash))
+                if response.result.get("validated"):
+                    result = response.result
+                    result["engine_result"] = result.get("meta", {}).get("TransactionResult")
+                    return result
+            except Exception as e:
+                logger.debug(f"Error polling transaction {tx_hash}: {e}")
+        return None
+
+    async def wait_any(self, tx_hashes: list, last_ledger_sequence: int = None, margin: int = 0):
+        """Waits for any of tx_hashes to validate.
+
+        Returns the validated result, or None once the validated ledger is
+        within margin of last_ledger_sequence without any of them validating.
+        """
+        futures = [self.register(tx_hash) for tx_hash in tx_hashes]
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                if self.ledger_scheduler.is_stream_live():
+                    done, _ = await asyncio.wait(
+                        futures,
+                        timeout=self.ledger_scheduler.close_interval,
+                        return_when=asyncio.FIRST_COMPLETED
+                    )
+                    if done:
+                        return next(iter(done)).result()
+                else:
+                    result = await loop.run_in_executor(None, self._poll, tx_hashes)
+                    if result is not None:
+                        return result
+                    await asyncio.sleep(FALLBACK_POLL_INTERVAL)
+
+                if last_ledger_sequence is not None:
+                    current = self.ledger_scheduler.validated_ledger_index
+                    if not self.ledger_scheduler.is_stream_live():
+                        current = await loop.run_in_executor(
+                            None, xrpl.ledger.get_latest_validated_ledger_sequence, self.client
+                        )
+                    if current >= last_ledger_sequence - margin:
+                        # The stream may have dropped the result during a reconnect, confirm once
+                        return await loop.run_in_executor(None, self._poll, tx_hashes)
+        finally:
+            for tx_hash in tx_hashes:
+                self._futures.pop(tx_hash, None)
+
+    async def wait(self, tx_hash: str, last_ledger_sequence: int = None):
+        """Waits for tx_hash to validate, returning its result or None if it expired."""
+        return await self.wait_any([tx_hash], last_ledger_sequence)
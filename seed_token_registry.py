@@ -0,0 +1,58 @@
+"""Builds the token registry from a ledger-data snapshot, so the sniper starts knowing every existing pair.
+
+Usage: python3 seed_token_registry.py snapshot <file.jsonl>   # page Offer and AMM objects out of a validated ledger
+       python3 seed_token_registry.py seed <file.jsonl>       # load a snapshot into token_registry.db
+"""
+import json
+import sys
+import time
+
+from xrpl.models.requests import LedgerData
+from xrpl.models.requests.ledger_entry import LedgerEntryType
+
+from token_registry import TokenRegistry, pairs_from_snapshot
+from xrp_sniper_logic_enhanced import client
+
+PAGE_SIZE = 2048  # Objects per `ledger_data` page
+
+
+def snapshot(path: str):
+    """Writes every Offer and AMM object of the latest validated ledger to path as JSONL."""
+    ledger_index = None
+    with open(path, "w") as f:
+        for entry_type in (LedgerEntryType.OFFER, LedgerEntryType.AMM):
+            marker = None
+            count = 0
+            while True:
+                response = client.request(LedgerData(
+                    ledger_index=ledger_index or "validated", type=entry_type, limit=PAGE_SIZE, marker=marker
+                ))
+                if not response.is_successful():
+                    raise RuntimeError(response.result.get("error_message") or response.result.get("error"))
+                # Page every type from the same ledger
+                ledger_index = response.result["ledger_index"]
+                for entry in response.result.get("state", []):
+                    f.write(json.dumps(entry) + "\n")
+                count += len(response.result.get("state", []))
+                marker = response.result.get("marker")
+                if not marker:
+                    break
+            print(f"  {count} {entry_type.value} object(s)")
+    print(f"Snapshot of ledger {ledger_index} written to {path}")
+
+
+def seed(path: str):
+    registry = TokenRegistry()
+    started = time.perf_counter()
+    added = registry.seed(pairs_from_snapshot(path))
+    print(f"Added {added} new pair(s) to {registry.path} in {time.perf_counter() - started:.2f}s")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3 or sys.argv[1] not in ("snapshot", "seed"):
+        print(__doc__)
+        sys.exit(1)
+    if sys.argv[1] == "snapshot":
+        snapshot(sys.argv[2])
+    else:
+        seed(sys.argv[2])
@@ -0,0 +1,110 @@
+import asyncio
+import hashlib
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from xrpl.core import keypairs
+from xrpl.core.binarycodec import encode, encode_for_signing
+
+logger = logging.getLogger(__name__)
+
+# Signing configuration
+SIGNING_WORKERS = int(os.getenv("SIGNING_WORKERS", max(1, (os.cpu_count() or 2) - 1)))
+TRANSACTION_HASH_PREFIX = bytes.fromhex("54584E00")  # "TXN\0"
+
+# Key material cached inside each worker process, keyed by classic address
+_worker_keys = {}
+
+
+def derive_keys(seed: str) -> dict:
+    """Derives the keypair and classic address for a seed."""
+    public_key, private_key = keypairs.derive_keypair(seed)
+    return {
+        "address": keypairs.derive_classic_address(public_key),
+        "public_key": public_key,
+        "private_key": private_key,
+    }
+
+
+def sign_transaction(tx_json: dict, public_key: str, private_key: str) -> tuple:
+    """Signs an XRPL-format transaction dict, returning (tx_blob, tx_hash)."""
+    tx_json = dict(tx_json, SigningPubKey=public_key)
+    tx_json["TxnSignature"] = keypairs.sign(bytes.fromhex(encode_for_signing(tx_json)), private_key)
+    tx_blob = encode(tx_json)
+    tx_hash = hashlib.sha512(TRANSACTION_HASH_PREFIX + bytes.fromhex(tx_blob)).hexdigest()[:64].upper()
+    return tx_blob, tx_hash
+
+
+def _worker_keys_for(address: str, seed: str) -> dict:
+    """Returns warm key material for address, deriving it on first use in this worker."""
+    keys = _worker_keys.get(address)
+    if keys is None:
+        keys = derive_keys(seed)
+        _worker_keys[keys["address"]] = keys
+    return keys
+
+
+def _worker_derive(seed: str) -> dict:
+    keys = derive_keys(seed)
+    _worker_keys[keys["address"]] = keys
+    return keys
+
+
+def _worker_sign(address: str, seed: str, tx_json: dict) -> tuple:
+    keys = _worker_keys_for(address, seed)
+    return sign_transaction(tx_json, keys["public_key"], keys["private_key"])
+
+
+def _worker_sign_batch(requests: list) -> list:
+    return [_worker_sign(address, seed, tx_json) for address, seed, tx_json in requests]
+
+
+class SigningService:
+    """Signs transactions and derives keys in a process pool, off the event loop.
+
+    Workers keep derived key material keyed by address, so only the first
+    signature for a wallet in a given worker pays for key derivation.
+    """
+
+    def __init__(self, max_workers: int = SIGNING_WORKERS):
+        self.max_workers = max_workers
+        self._executor = None
+
+    def _pool(self) -> ProcessPoolExecutor:
+        """Creates the process pool on first use."""
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            logger.info(f"Signing pool started with {self.max_workers} worker(s)")
+        return self._executor
+
+    async def derive_wallet(self, seed: str) -> dict:
+        """Derives the address and keypair for seed in the pool."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._pool(), _worker_derive, seed)
+
+    async def sign(self, address: str, seed: str, tx_json: dict) -> tuple:
+        """Signs tx_json for the wallet at address, returning (tx_blob, tx_hash)."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._pool(), _worker_sign, address, seed, tx_json)
+
+    async def sign_batch(self, requests: list) -> list:
+        """Signs a batch of (address, seed, tx_json) requests, preserving order.
+
+        The batch is split into one chunk per worker to amortize IPC overhead.
+        """
+        if not requests:
+            return []
+        loop = asyncio.get_running_loop()
+        chunk_size = -(-len(requests) // self.max_workers)
+        chunks = [requests[i:i + chunk_size] for i in range(0, len(requests), chunk_size)]
+        results = await asyncio.gather(*[
+            loop.run_in_executor(self._pool(), _worker_sign_batch, chunk) for chunk in chunks
+        ])
+        return [signed for chunk_result in results for signed in chunk_result]
+
+    def shutdown(self):
+        """Shuts down the process pool."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
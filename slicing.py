@@ -0,0 +1,152 @@
+import asyncio
+import logging
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+# Slicing configuration
+MAX_IDLE_SLICES = 5  # Consecutive child orders that fill nothing before an order is stalled
+MAX_DURATION = 3600  # Seconds a sliced order may run before it expires
+FILL_TOLERANCE = 1e-6  # Fraction of the total treated as rounding dust
+MAX_FINISHED_ORDERS = 20  # Finished orders kept per user for the bot
+
+# Order statuses
+RUNNING = "running"
+FILLED = "filled"
+CANCELLED = "cancelled"
+STALLED = "stalled"
+EXPIRED = "expired"
+FAILED = "failed"
+
+
+class SliceScheduler:
+    """Runs large orders as a series of ImmediateOrCancel child orders.
+
+    Each order is a dict holding its parameters and in-memory progress.
+    ``total``, ``slice_size`` and ``filled`` are in XRP for buys and in
+    tokens for sells; ``received`` is the other side of the fills. A
+    ``slice_size`` of None sizes each child to the best level of the book.
+
+    The caller supplies ``execute_slice(order, remaining)``, which places
+    one child and returns ``(filled, received)``, or None when it did not
+    trade (no book, or the price is past the order's limit). Cancellation
+    is cooperative: an in-flight child is allowed to finish so its
+    sequence and fill are accounted for, then the order stops.
+    """
+
+    def __init__(self, ledger_scheduler):
+        self.ledger_scheduler = ledger_scheduler
+        self._orders = {}  # Structure: {order_id: order}
+        self._cancel_events = {}
+
+    def start(self, order: dict, execute_slice, on_done=None) -> dict:
+        """Starts a sliced order; on_done(order) is awaited once it finishes."""
+        order = dict(order)
+        order.update({
+            "id": str(uuid.uuid4())[:8],
+            "filled": 0.0,
+            "received": 0.0,
+            "slices": 0,
+            "idle_slices": 0,
+            "status": RUNNING,
+            "created": time.time(),
+        })
+        self._orders[order["id"]] = order
+        self._cancel_events[order["id"]] = asyncio.Event()
+        asyncio.get_running_loop().create_task(self._run(order, execute_slice, on_done))
+        logger.info(
+            f"Sliced {order['side']} {order['id']} started for user {order['user_id']} on "
+            f"{order['currency']}.{order['issuer']}: {order['total']} in slices of {order['slice_size'] or 'book depth'}"
+        )
+        return order
+
+    async def _run(self, order: dict, execute_slice, on_done):
+        cancelled = self._cancel_events[order["id"]]
+        deadline = time.monotonic() + MAX_DURATION
+        try:
+            while not cancelled.is_set():
+                remaining = order["total"] - order["filled"]
+                if remaining <= order["total"] * FILL_TOLERANCE:
+                    order["status"] = FILLED
+                    break
+                if time.monotonic() > deadline:
+                    order["status"] = EXPIRED
+                    break
+
+                fill = await execute_slice(order, remaining)
+                if fill is not None:
+                    filled, received = fill
+                    order["slices"] += 1
+                    if filled > 0:
+                        order["filled"] += filled
+                        order["received"] += received
+                        order["idle_slices"] = 0
+                    else:
+                        order["idle_slices"] += 1
+                        if order["idle_slices"] >= MAX_IDLE_SLICES:
+                            order["status"] = STALLED
+                            break
+                    if order["total"] - order["filled"] <= order["total"] * FILL_TOLERANCE:
+                        continue
+
+                # Default pacing is one child per ledger
+                interval = order.get("interval") or self.ledger_scheduler.close_interval
+                try:
+                    await asyncio.wait_for(cancelled.wait(), timeout=interval)
+                except asyncio.TimeoutError:
+                    pass
+            else:
+                order["status"] = CANCELLED
+        except Exception as e:
+            logger.error(f"Sliced order {order['id']} failed: {e}")
+            order["status"] = FAILED
+            order["error"] = str(e)
+        finally:
+            self._cancel_events.pop(order["id"], None)
+            self._prune(order["user_id"])
+
+        logger.info(
+            f"Sliced {order['side']} {order['id']} {order['status']}: filled {order['filled']:.8g} of "
+            f"{order['total']:.8g} in {order['slices']} slice(s)"
+        )
+        if on_done is not None:
+            try:
+                await on_done(order)
+            except Exception as e:
+                logger.error(f"Error reporting sliced order {order['id']}: {e}")
+
+    def cancel(self, order_id: str) -> bool:
+        """Requests cancellation of a running order; returns False if it is not running."""
+        event = self._cancel_events.get(order_id)
+        if event is None:
+            return False
+        event.set()
+        return True
+
+    def cancel_all(self) -> int:
+        """Requests cancellation of every running order; returns how many were running."""
+        for event in self._cancel_events.values():
+            event.set()
+        return len(self._cancel_events)
+
+    def running_count(self) -> int:
+        """Returns the number of orders still running (including ones finishing a cancelled child)."""
+        return len(self._cancel_events)
+
+    def get_order(self, order_id: str):
+        """Returns an order by id, or None."""
+        return self._orders.get(order_id)
+
+    def get_orders(self, user_id: int) -> list:
+        """Returns a user's running and recently finished orders, newest first."""
+        orders = [order for order in self._orders.values() if order["user_id"] == user_id]
+        return sorted(orders, key=lambda order: order["created"], reverse=True)
+
+    def _prune(self, user_id: int):
+        finished = [
+            order for order in self.get_orders(user_id)
+            if order["status"] != RUNNING and order["id"] not in self._cancel_events
+        ]
+        for order in finished[MAX_FINISHED_ORDERS:]:
+            del self._orders[order["id"]]
@@ -0,0 +1,115 @@
+import asyncio
+import logging
+import random
+import time
+
+logger = logging.getLogger(__name__)
+
+# Restart policy
+RESTART_BASE_DELAY = 1.0  # Seconds before the first restart of a crashed service
+RESTART_MAX_DELAY = 60.0  # Upper bound of the exponential backoff
+RESTART_JITTER = 0.5  # Each delay is scaled by a random factor in [1 - jitter, 1 + jitter]
+STABLE_AFTER = 300  # Seconds a service must run before its backoff resets
+
+# Service states
+RUNNING = "running"
+BACKOFF = "backoff"
+STOPPED = "stopped"
+
+
+class Supervisor:
+    """Runs long-lived background coroutines and restarts the ones that crash.
+
+    A service is a name and a factory returning a fresh coroutine. If the
+    coroutine raises, it is started again after an exponential backoff with
+    jitter, so services that fail together do not retry in lockstep; the
+    backoff resets once a run lasts STABLE_AFTER seconds. A coroutine that
+    returns normally has finished its job and is not restarted. Health
+    (state, restarts, last error) is kept per service for reporting.
+    """
+
+    def __init__(self):
+        self._services = {}  # Structure: {name: {"factory", "task", "state", "restarts", "last_error", ...}}
+
+    def add(self, name: str, factory, start: bool = True):
+        """Registers a service; starts it right away unless start is False."""
+        self._services[name] = {
+            "factory": factory, "task": None, "state": STOPPED, "restarts": 0,
+            "last_error": None, "last_error_time": None, "started": None,
+        }
+        if start:
+            self.start(name)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._services
+
+    def is_running(self, name: str) -> bool:
+        service = self._services.get(name)
+        return service is not None and service["task"] is not None and not service["task"].done()
+
+    def start(self, name: str):
+        """Starts a registered service if it is not already running."""
+        service = self._services[name]
+        if self.is_running(name):
+            return
+        service["task"] = asyncio.get_running_loop().create_task(self._run(name), name=f"service:{name}")
+
+    async def stop(self, name: str):
+        """Cancels a service and waits for it to finish."""
+        service = self._services.get(name)
+        if service is None or service["task"] is None:
+            return
+        task = service["task"]
+        if not task.done() and task is not asyncio.current_task():
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        service["state"] = STOPPED
+
+    async def _run(self, name: str):
+        service = self._services[name]
+        failures = 0
+        while True:
+            service["state"] = RUNNING
+            service["started"] = time.monotonic()
+            try:
+                await service["factory"]()
+                service["state"] = STOPPED
+                return
+            except asyncio.CancelledError:
+                service["state"] = STOPPED
+                raise
+            except Exception as e:
+                if time.monotonic() - service["started"] >= STABLE_AFTER:
+                    failures = 0
+                failures += 1
+                service["restarts"] += 1
+                service["last_error"] = f"{type(e).__name__}: {e}"
+                service["last_error_time"] = time.time()
+                delay = min(RESTART_MAX_DELAY, RESTART_BASE_DELAY * 2 ** (failures - 1))
+                delay *= random.uniform(1 - RESTART_JITTER, 1 + RESTART_JITTER)
+                logger.error(f"Service {name} crashed ({service['last_error']}), restarting in {delay:.1f}s")
+                service["state"] = BACKOFF
+                await asyncio.sleep(delay)
+
+    def health(self) -> list:
+        """Returns one status dict per service: name, state, uptime, restarts and last error."""
+        now = time.monotonic()
+        return [
+            {
+                "name": name,
+                "state": service["state"],
+                "uptime": now - service["started"] if service["state"] == RUNNING else 0.0,
+                "restarts": service["restarts"],
+                "last_error": service["last_error"],
+                "last_error_time": service["last_error_time"],
+            }
+            for name, service in self._services.items()
+        ]
+
+    async def shutdown(self):
+        """Stops every service, most recently added first."""
+        for name in reversed(list(self._services)):
+            await self.stop(name)
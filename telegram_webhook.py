@@ -0,0 +1,62 @@
+import hmac
+import json
+import logging
+import os
+import secrets
+
+from telegram import Update
+from telegram.error import TelegramError
+
+logger = logging.getLogger(__name__)
+
+# Webhook configuration; without WEBHOOK_URL the bot long-polls
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "").rstrip("/")  # Public base URL, e.g. https://bot.up.railway.app
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/telegram/webhook")
+# Telegram echoes the secret in every delivery; a random one is used when none is configured
+WEBHOOK_SECRET = os.getenv("TELEGRAM_WEBHOOK_SECRET") or secrets.token_urlsafe(32)
+SECRET_HEADER = "x-telegram-bot-api-secret-token"
+
+
+def make_webhook_endpoint(application, secret: str = WEBHOOK_SECRET):
+    """Returns an HttpServer handler that feeds Telegram's update deliveries to the application.
+
+    Deliveries without the secret token are rejected with 403. Updates go
+    straight onto application.update_queue, the queue the long-polling
+    updater fills, so handlers run exactly as in polling mode.
+    """
+    expected = secret.encode()
+
+    async def endpoint(request: dict) -> tuple:
+        # Compare bytes: compare_digest rejects non-ASCII str, and headers are attacker-controlled
+        received = request["headers"].get(SECRET_HEADER, "").encode("utf-8", "surrogateescape")
+        if not hmac.compare_digest(received, expected):
+            return 403, "text/plain", b"forbidden\n"
+        try:
+            update = Update.de_json(json.loads(request["body"]), application.bot)
+        except (ValueError, TypeError, KeyError) as e:
+            logger.error(f"Invalid webhook update: {e}")
+            return 400, "text/plain", b"bad update\n"
+        await application.update_queue.put(update)
+        return 200, "text/plain", b"ok\n"
+
+    return endpoint
+
+
+async def start_webhook(application, http, url: str = WEBHOOK_URL, secret: str = WEBHOOK_SECRET,
+                        path: str = WEBHOOK_PATH) -> bool:
+    """Routes path on the embedded HTTP server to the application and registers the webhook with Telegram.
+
+    Returns False if Telegram refuses the webhook; the caller then polls
+    instead. The application must be initialized.
+    """
+    http.route("POST", path, make_webhook_endpoint(application, secret))
+    if http.host in ("127.0.0.1", "localhost", "::1"):
+        logger.warning(f"HTTP server listens on {http.host} only; "
+                       f"set HTTP_HOST=0.0.0.0 unless a local proxy forwards webhooks")
+    try:
+        await application.bot.set_webhook(url=url + path, secret_token=secret, allowed_updates=Update.ALL_TYPES)
+    except TelegramError as e:
+        logger.error(f"Error setting webhook {url + path}: {e}")
+        return False
+    logger.info(f"Receiving updates by webhook at {url + path}")
+    return True
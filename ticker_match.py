@@ -0,0 +1,163 @@
+import fnmatch
+import functools
+import logging
+import re
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+_GLOB_CLASS = re.compile(r"\[[^\]]*\]")
+_GLOB_SPLIT = re.compile(r"[*?\x00]")
+
+
+@functools.lru_cache(maxsize=65536)
+def decode_currency(code: str) -> str:
+    """Returns the human-readable, upper-cased ticker for an XRPL currency code.
+
+    Standard 3-character codes are returned as is. 40-hex non-standard
+    codes are decoded as ASCII with trailing NULs removed. Codes that do
+    not decode to printable text (e.g. AMM LP tokens) are returned as hex.
+    """
+    if len(code) != 40:
+        return code.upper()
+    try:
+        text = bytes.fromhex(code).rstrip(b"\x00").decode("ascii")
+    except (ValueError, UnicodeDecodeError):
+        return code.upper()
+    if not text or not text.isprintable():
+        return code.upper()
+    return text.strip().upper()
+
+
+def split_patterns(text: str) -> list:
+    """Splits a config's ticker field ("PEPE*, *DOGE*") into normalized patterns."""
+    return [pattern.strip().upper() for pattern in (text or "").split(",") if pattern.strip()]
+
+
+class TickerMatcher:
+    """Matches a ticker against every configured pattern in one pass.
+
+    Patterns are exact tickers ("PEPE") or globs: prefix ("PEPE*"),
+    suffix ("*INU"), substring ("*DOGE*") or any fnmatch pattern ("P?PE*").
+    The longest literal fragment of each pattern goes into one Aho-Corasick
+    automaton. A ticker is scanned once, and only patterns whose fragment
+    occurs in it are verified, so matching cost does not grow with the
+    number of patterns. Patterns without a literal fragment ("*") are
+    always verified.
+
+    The trie grows incrementally as patterns are added. Failure and output
+    links are recomputed lazily, on the first match after a change, so a
+    burst of config edits costs one rebuild.
+    """
+
+    def __init__(self):
+        self._goto = [{}]  # Trie edges per node
+        self._fail = [0]
+        self._out = [[]]  # Pattern ids whose fragment ends at the node
+        self._dict_link = [0]  # Nearest proper suffix node with outputs, 0 if none
+        self._patterns = {}  # Structure: {pattern_id: (owner, node, length, exact, regex)}
+        self._owners = {}  # Structure: {owner: [pattern_id, ...]}
+        self._wildcards = set()  # Pattern ids without a literal fragment
+        self._next_id = 0
+        self._dirty = False
+
+    def __len__(self):
+        return len(self._patterns)
+
+    def set_patterns(self, owner, patterns: list):
+        """Replaces all patterns registered for owner (e.g. a (user_id, config_id) pair)."""
+        self.remove(owner)
+        for pattern in patterns:
+            self._add(owner, pattern.upper())
+
+    def _add(self, owner, pattern: str):
+        pattern_id = self._next_id
+        self._next_id += 1
+        is_glob = any(char in pattern for char in "*?[")
+        if is_glob:
+            fragments = _GLOB_SPLIT.split(_GLOB_CLASS.sub("\x00", pattern))
+            literal = max(fragments, key=len)
+            regex = re.compile(fnmatch.translate(pattern))
+        else:
+            literal, regex = pattern, None
+
+        node = 0
+        if literal:
+            for char in literal:
+                child = self._goto[node].get(char)
+                if child is None:
+                    child = len(self._goto)
+                    self._goto[node][char] = child
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append([])
+                    self._dict_link.append(0)
+                node = child
+            self._out[node].append(pattern_id)
+        else:
+            self._wildcards.add(pattern_id)
+
+        self._patterns[pattern_id] = (owner, node, len(literal), not is_glob, regex)
+        self._owners.setdefault(owner, []).append(pattern_id)
+        self._dirty = True
+
+    def remove(self, owner):
+        """Removes every pattern registered for owner."""
+        for pattern_id in self._owners.pop(owner, ()):
+            _, node, _, _, _ = self._patterns.pop(pattern_id)
+            if node:
+                self._out[node].remove(pattern_id)
+            self._wildcards.discard(pattern_id)
+            self._dirty = True
+
+    def _build(self):
+        """Recomputes failure and output links breadth-first."""
+        queue = deque()
+        for child in self._goto[0].values():
+            self._fail[child] = 0
+            self._dict_link[child] = 0
+            queue.append(child)
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                fail = self._fail[node]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                fail = self._goto[fail].get(char, 0)
+                self._fail[child] = fail
+                self._dict_link[child] = fail if self._out[fail] else self._dict_link[fail]
+                queue.append(child)
+        self._dirty = False
+
+    def match(self, ticker: str) -> set:
+        """Returns the owners with at least one pattern matching the (decoded) ticker."""
+        if not self._patterns:
+            return set()
+        if self._dirty:
+            self._build()
+        text = ticker.upper()
+
+        candidates = set(self._wildcards)
+        node = 0
+        for char in text:
+            while node and char not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(char, 0)
+            output = node if self._out[node] else self._dict_link[node]
+            while output:
+                candidates.update(self._out[output])
+                output = self._dict_link[output]
+
+        owners = set()
+        for pattern_id in candidates:
+            owner, node, length, exact, regex = self._patterns[pattern_id]
+            if owner in owners:
+                continue
+            if exact:
+                # The fragment is the whole pattern, so it must span the whole ticker
+                if len(text) == length:
+                    owners.add(owner)
+            elif regex.match(text):
+                owners.add(owner)
+        return owners
+
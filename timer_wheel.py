@@ -0,0 +1,77 @@
+import itertools
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# Timer wheel configuration
+TICK_SECONDS = 1.0  # Resolution of scheduled timers
+NUM_SLOTS = 512  # Slots in the wheel; timers further out than one turn wait in their slot
+
+
+class TimerWheel:
+    """Hashed timer wheel: O(1) schedule and cancel, amortized O(1) expiry per tick.
+
+    A timer due at tick T lives in slot T % NUM_SLOTS together with its
+    absolute tick. Advancing the wheel visits only the slots of the ticks
+    that elapsed, and fires the timers in them whose tick has come; timers
+    a full turn or more away stay put until their turn. After a pause
+    longer than a turn (e.g. a suspended process), every slot is visited
+    once and all overdue timers fire.
+    """
+
+    def __init__(self, tick: float = TICK_SECONDS, num_slots: int = NUM_SLOTS, now: float = None):
+        self.tick = tick
+        self.num_slots = num_slots
+        self._slots = [{} for _ in range(num_slots)]  # Structure: [{handle: (due_tick, callback)}]
+        self._handles = {}  # Structure: {handle: slot index}
+        self._ids = itertools.count(1)
+        self._current = int((time.time() if now is None else now) // tick)  # Last tick processed
+
+    def __len__(self):
+        return len(self._handles)
+
+    def schedule(self, when: float, callback) -> int:
+        """Schedules callback() at posix time `when` (past times fire on the next tick); returns a handle."""
+        due = max(int(when // self.tick), self._current + 1)
+        handle = next(self._ids)
+        slot = due % self.num_slots
+        self._slots[slot][handle] = (due, callback)
+        self._handles[handle] = slot
+        return handle
+
+    def cancel(self, handle: int) -> bool:
+        """Cancels a pending timer; returns False if it already fired or was cancelled."""
+        slot = self._handles.pop(handle, None)
+        if slot is None:
+            return False
+        del self._slots[slot][handle]
+        return True
+
+    def advance(self, now: float = None) -> list:
+        """Moves the wheel to `now` and returns the callbacks that came due, in due order."""
+        target = int((time.time() if now is None else now) // self.tick)
+        if target <= self._current:
+            return []
+        due = []
+        last = min(target, self._current + self.num_slots)
+        for tick in range(self._current + 1, last + 1):
+            slot = self._slots[tick % self.num_slots]
+            for handle, (due_tick, callback) in list(slot.items()):
+                if due_tick <= target:
+                    del slot[handle]
+                    del self._handles[handle]
+                    due.append((due_tick, handle, callback))
+        self._current = target
+        due.sort(key=lambda item: item[:2])
+        return [callback for _, _, callback in due]
+
+    def run_due(self, now: float = None) -> int:
+        """Advances the wheel and calls every due callback; returns how many ran."""
+        callbacks = self.advance(now)
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                logger.error(f"Error in timer callback {callback}: {e}")
+        return len(callbacks)
@@ -0,0 +1,242 @@
+import asyncio
+import hashlib
+import json
+import logging
+import math
+import sqlite3
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# Registry configuration
+REGISTRY_FILE = "token_registry.db"
+DEFAULT_CAPACITY = 1_000_000  # Pairs the first Bloom filter layer is sized for
+ERROR_RATE = 1e-4  # Target false-positive rate of the first layer: a new pair misreported as seen
+FLUSH_INTERVAL = 1.0  # Seconds between batched writes of newly seen pairs
+CONFIRMED_CACHE_SIZE = 65536  # Recently confirmed pairs answered without touching SQLite
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS pairs (
+    currency TEXT NOT NULL,
+    issuer TEXT NOT NULL,
+    first_seen_ledger INTEGER,
+    first_seen_ts REAL NOT NULL,
+    PRIMARY KEY (currency, issuer)
+) WITHOUT ROWID;
+"""
+
+
+def _pair_digest(currency: str, issuer: str) -> tuple:
+    """Hashes a pair once into the two 64-bit values every Bloom probe is derived from."""
+    digest = hashlib.blake2b(f"{currency}:{issuer}".encode(), digest_size=16).digest()
+    return int.from_bytes(digest[:8], "little"), int.from_bytes(digest[8:], "little") | 1
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over precomputed pair digests (double hashing)."""
+
+    def __init__(self, capacity: int, error_rate: float = ERROR_RATE):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.num_bits = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+
+    def _positions(self, digest: tuple):
+        h1, h2 = digest
+        return ((h1 + i * h2) % self.num_bits for i in range(self.num_hashes))
+
+    def add(self, digest: tuple):
+        for position in self._positions(digest):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, digest: tuple) -> bool:
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(digest))
+
+
+def pairs_from_snapshot(path: str):
+    """Yields every (currency, issuer) traded against XRP in a ledger-data snapshot.
+
+    The snapshot is JSONL of ledger objects as returned by `ledger_data`
+    (see seed_token_registry.py). Offer objects with XRP on one side and
+    XRP/token AMM objects are used.
+    """
+    with open(path) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            if entry.get("LedgerEntryType") == "Offer":
+                sides = (entry.get("TakerGets"), entry.get("TakerPays"))
+                if any(isinstance(side, str) for side in sides):
+                    for side in sides:
+                        if isinstance(side, dict) and "issuer" in side:
+                            yield side["currency"], side["issuer"]
+            elif entry.get("LedgerEntryType") == "AMM":
+                assets = (entry.get("Asset", {}), entry.get("Asset2", {}))
+                if any(asset.get("currency") == "XRP" and "issuer" not in asset for asset in assets):
+                    for asset in assets:
+                        if "issuer" in asset:
+                            yield asset["currency"], asset["issuer"]
+
+
+class TokenRegistry:
+    """Every (currency, issuer) pair ever seen trading against XRP.
+
+    The pairs persist in SQLite and are loaded into a layered Bloom filter
+    on the registry thread after startup. A Bloom miss proves a pair is new
+    with one hash and a few bit probes. A hit is confirmed with an indexed
+    SQLite lookup, because a filter answers "seen" wrongly for about
+    ERROR_RATE of new pairs, and a genuine new pair must not be reported as
+    new liquidity. Confirmed pairs go into a small LRU cache, so busy pairs
+    skip SQLite. Until the filter is loaded, every lookup goes to SQLite.
+    When a layer reaches capacity, a layer twice as large with half the
+    error rate is added on top. Newly seen pairs are written in batches on
+    the registry thread.
+    """
+
+    def __init__(self, path: str = REGISTRY_FILE, capacity: int = DEFAULT_CAPACITY):
+        self.path = path
+        self.capacity = capacity
+        self._filters = [BloomFilter(capacity)]
+        self._loaded = False
+        self._added_while_loading = []  # Digests observed before the filter was loaded
+        self._confirmed = OrderedDict()  # Structure: {(currency, issuer): None}, LRU of pairs known to be seen
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="token-registry")
+        self._conn = None  # Registry thread: loading and writes
+        self._reader = None  # Event-loop thread: confirming Bloom hits
+        self._pending = []
+        self._task = None
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(SCHEMA)
+        return self._conn
+
+    def _build_filters(self) -> list:
+        """Reads every persisted pair into a fresh layered Bloom filter (registry thread)."""
+        started = time.perf_counter()
+        filters = [BloomFilter(self.capacity)]
+        count = 0
+        for currency, issuer in self._connection().execute("SELECT currency, issuer FROM pairs"):
+            self._add(filters, _pair_digest(currency, issuer))
+            count += 1
+        logger.info(f"Token registry loaded {count} pair(s) in {time.perf_counter() - started:.2f}s")
+        return filters
+
+    async def load(self):
+        """Loads every persisted pair into the Bloom filter off the event loop; run once at startup."""
+        filters = await asyncio.get_running_loop().run_in_executor(self._executor, self._build_filters)
+        for digest in self._added_while_loading:
+            self._add(filters, digest)
+        self._added_while_loading = []
+        self._filters = filters
+        self._loaded = True
+
+    @staticmethod
+    def _add(filters: list, digest: tuple):
+        layer = filters[-1]
+        if layer.count >= layer.capacity:
+            layer = BloomFilter(layer.capacity * 2, layer.error_rate / 2)
+            filters.append(layer)
+        layer.add(digest)
+
+    def _stored(self, currency: str, issuer: str) -> bool:
+        """Primary-key lookup of a pair in SQLite, on the event-loop thread."""
+        if self._reader is None:
+            self._reader = sqlite3.connect(self.path)
+            self._reader.executescript(SCHEMA)
+        row = self._reader.execute(
+            "SELECT 1 FROM pairs WHERE currency = ? AND issuer = ?", (currency, issuer)
+        ).fetchone()
+        return row is not None
+
+    def _remember(self, key: tuple):
+        self._confirmed[key] = None
+        self._confirmed.move_to_end(key)
+        if len(self._confirmed) > CONFIRMED_CACHE_SIZE:
+            self._confirmed.popitem(last=False)
+
+    def seen(self, currency: str, issuer: str) -> bool:
+        """Returns True if the pair has been seen before."""
+        key = (currency, issuer)
+        if key in self._confirmed:
+            self._remember(key)
+            return True
+        digest = _pair_digest(currency, issuer)
+        if self._loaded and not any(digest in layer for layer in self._filters):
+            return False
+        if self._stored(currency, issuer):
+            self._remember(key)
+            return True
+        return False
+
+    def observe(self, currency: str, issuer: str, ledger_index: int = None) -> bool:
+        """Records a pair seen trading against XRP; returns True if it was never seen before."""
+        if self.seen(currency, issuer):
+            return False
+        digest = _pair_digest(currency, issuer)
+        if self._loaded:
+            self._add(self._filters, digest)
+        else:
+            self._added_while_loading.append(digest)
+        # Pending pairs are not in SQLite yet; the confirmed cache answers for them until they are written
+        self._remember((currency, issuer))
+        self._pending.append((currency, issuer, ledger_index, time.time()))
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._flush_loop())
+        return True
+
+    def pending(self) -> int:
+        """Returns the number of newly seen pairs not yet written."""
+        return len(self._pending)
+
+    def _write(self, rows: list):
+        conn = self._connection()
+        with conn:
+            conn.executemany("INSERT OR IGNORE INTO pairs VALUES (?, ?, ?, ?)", rows)
+
+    async def flush(self):
+        """Writes all newly seen pairs."""
+        if not self._pending:
+            return
+        rows, self._pending = self._pending, []
+        try:
+            await asyncio.get_running_loop().run_in_executor(self._executor, self._write, rows)
+        except Exception as e:
+            logger.error(f"Error writing {len(rows)} token registry pair(s): {e}")
+
+    async def _flush_loop(self):
+        while self._pending:
+            await asyncio.sleep(FLUSH_INTERVAL)
+            await self.flush()
+
+    def seed(self, pairs) -> int:
+        """Bulk-inserts pairs (e.g. from pairs_from_snapshot) without the event loop; returns rows added."""
+        conn = self._connection()
+        now = time.time()
+        with conn:
+            before = conn.total_changes
+            conn.executemany(
+                "INSERT OR IGNORE INTO pairs VALUES (?, ?, NULL, ?)",
+                ((currency, issuer, now) for currency, issuer in pairs)
+            )
+            added = conn.total_changes - before
+        return added
+
+    async def close(self):
+        """Flushes pending pairs and closes the database."""
+        await self.flush()
+        if self._reader is not None:
+            self._reader.close()
+            self._reader = None
+        if self._conn is not None:
+            conn, self._conn = self._conn, None
+            await asyncio.get_running_loop().run_in_executor(self._executor, conn.close)
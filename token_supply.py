@@ -0,0 +1,121 @@
+import asyncio
+import logging
+import time
+
+import xrpl
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+CACHE_REQUESTS = metrics.counter("cache_requests_total", "Cache lookups by cache and result (hit/miss)")
+
+# Supply mirror configuration
+OFFLINE_REFRESH_INTERVAL = 30  # Seconds an issuer's supply stays fresh while the stream is not running
+
+
+class TokenSupply:
+    """Outstanding supply of tokens, mirrored per issuer.
+
+    An issuer's obligations are seeded once with `gateway_balances`. After
+    that they follow validated metadata: every RippleState change between
+    the issuer and a holder moves the supply by the holder's balance delta
+    (issuing raises it, redeeming lowers it). Lookups on the listing path
+    read the mirror and never wait for RPC.
+    """
+
+    def __init__(self, client, ledger_scheduler):
+        self.client = client
+        self.ledger_scheduler = ledger_scheduler
+        self._issuers = {}  # Structure: {issuer: {"obligations": {currency: supply}, "updated"}}
+        self._seed_locks = {}
+
+    def _seed(self, issuer: str) -> dict:
+        """Fetches an issuer's obligations over JSON-RPC."""
+        response = self.client.request(xrpl.models.requests.GatewayBalances(
+            account=issuer, ledger_index="validated"
+        ))
+        if not response.is_successful():
+            raise RuntimeError(response.result.get("error_message") or response.result.get("error", "Unknown error"))
+        obligations = response.result.get("obligations", {})
+        return {
+            "obligations": {currency: float(value) for currency, value in obligations.items()},
+            "updated": time.monotonic(),
+        }
+
+    def _is_fresh(self, entry: dict) -> bool:
+        if self.ledger_scheduler.is_stream_live():
+            return True
+        return time.monotonic() - entry["updated"] < OFFLINE_REFRESH_INTERVAL
+
+    def cached(self, currency: str, issuer: str):
+        """Returns the mirrored supply without any I/O, or None if the issuer is not mirrored."""
+        entry = self._issuers.get(issuer)
+        if entry is None or not self._is_fresh(entry):
+            return None
+        return entry["obligations"].get(currency, 0.0)
+
+    async def get(self, currency: str, issuer: str):
+        """Returns the token's supply, seeding the issuer if needed; None if it cannot be fetched."""
+        supply = self.cached(currency, issuer)
+        if supply is not None:
+            CACHE_REQUESTS.inc(cache="token_supply", result="hit")
+            return supply
+        CACHE_REQUESTS.inc(cache="token_supply", result="miss")
+        entry = await self._load(issuer)
+        return None if entry is None else entry["obligations"].get(currency, 0.0)
+
+    async def _load(self, issuer: str):
+        lock = self._seed_locks.setdefault(issuer, asyncio.Lock())
+        async with lock:
+            entry = self._issuers.get(issuer)
+            if entry is not None and self._is_fresh(entry):
+                return entry
+            try:
+                entry = await asyncio.get_running_loop().run_in_executor(None, self._seed, issuer)
+            except Exception as e:
+                logger.error(f"Error seeding supply of issuer {issuer}: {e}")
+                return None
+            self._issuers[issuer] = entry
+            return entry
+
+    def prefetch(self, issuer: str):
+        """Starts seeding an issuer in the background so later lookups hit the mirror."""
+        entry = self._issuers.get(issuer)
+        lock = self._seed_locks.get(issuer)
+        if (entry is None or not self._is_fresh(entry)) and (lock is None or not lock.locked()):
+            asyncio.get_running_loop().create_task(self._load(issuer))
+
+    def on_transaction(self, message: dict):
+        """Applies a validated transaction's trustline balance changes to mirrored issuers."""
+        if not self._issuers:
+            return
+        meta = message.get("meta")
+        if not isinstance(meta, dict):
+            return
+        for affected in meta.get("AffectedNodes", ()):
+            node_type, node = next(iter(affected.items()))
+            if node.get("LedgerEntryType") != "RippleState":
+                continue
+            fields = node.get("FinalFields") or node.get("NewFields") or {}
+            low = fields.get("LowLimit", {}).get("issuer")
+            high = fields.get("HighLimit", {}).get("issuer")
+            balance = fields.get("Balance", {})
+            if node_type == "CreatedNode":
+                before, after = 0.0, float(balance.get("value", 0))
+            elif node_type == "DeletedNode":
+                previous = node.get("PreviousFields", {}).get("Balance", balance)
+                before, after = float(previous.get("value", 0)), 0.0
+            else:
+                previous = node.get("PreviousFields", {}).get("Balance")
+                if previous is None:
+                    continue
+                before, after = float(previous.get("value", 0)), float(balance.get("value", 0))
+            # Balance is stored from the low account's point of view: the holder is the other side
+            for issuer, sign in ((high, 1), (low, -1)):
+                entry = self._issuers.get(issuer)
+                if entry is not None:
+                    currency = balance.get("currency")
+                    obligations = entry["obligations"]
+                    obligations[currency] = max(0.0, obligations.get(currency, 0.0) + sign * (after - before))
+                    entry["updated"] = time.monotonic()
@@ -0,0 +1,159 @@
+import asyncio
+import logging
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# Journal configuration
+JOURNAL_FILE = "trade_journal.db"
+FLUSH_INTERVAL = 0.5  # Seconds between batched writes
+FLUSH_BATCH_SIZE = 500  # Rows that trigger an early flush
+
+COLUMNS = (
+    "ts", "user_id", "side", "currency", "issuer", "tx_hash", "engine_result",
+    "price_xrp", "size_token", "size_xrp", "fee_drops", "latency_ms", "source",
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS trades (
+    id INTEGER PRIMARY KEY,
+    ts REAL NOT NULL,
+    user_id INTEGER NOT NULL,
+    side TEXT NOT NULL,
+    currency TEXT NOT NULL,
+    issuer TEXT NOT NULL,
+    tx_hash TEXT,
+    engine_result TEXT,
+    price_xrp REAL,
+    size_token REAL,
+    size_xrp REAL,
+    fee_drops INTEGER,
+    latency_ms REAL,
+    source TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_trades_user ON trades (user_id, id);
+CREATE INDEX IF NOT EXISTS idx_trades_user_token ON trades (user_id, currency, issuer, id);
+"""
+
+
+class TradeJournal:
+    """Append-only SQLite journal of every order attempt and fill.
+
+    record() only appends to an in-memory buffer. A background task flushes
+    the buffer in batches on a dedicated thread, so writes stay off the
+    event loop. Rows are indexed by user and by (user, token), so "last 100
+    trades" and per-token PnL stay fast as the table grows.
+    """
+
+    def __init__(self, path: str = JOURNAL_FILE):
+        self.path = path
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="trade-journal")
+        self._conn = None
+        self._buffer = []
+        self._flush_requested = None
+        self._task = None
+
+    def _connection(self) -> sqlite3.Connection:
+        """Opens the database on the journal thread on first use."""
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(SCHEMA)
+        return self._conn
+
+    def record(self, **row):
+        """Buffers one order attempt; missing columns are stored as NULL."""
+        row.setdefault("ts", time.time())
+        self._buffer.append(tuple(row.get(column) for column in COLUMNS))
+        if self._task is None or self._task.done():
+            self._flush_requested = asyncio.Event()
+            self._task = asyncio.get_running_loop().create_task(self._flush_loop())
+        elif len(self._buffer) >= FLUSH_BATCH_SIZE:
+            self._flush_requested.set()
+
+    def pending(self) -> int:
+        """Returns the number of buffered rows not yet written."""
+        return len(self._buffer)
+
+    def _write(self, rows: list):
+        conn = self._connection()
+        with conn:
+            conn.executemany(
+                f"INSERT INTO trades ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})",
+                rows
+            )
+
+    async def flush(self):
+        """Writes all buffered rows."""
+        if not self._buffer:
+            return
+        rows, self._buffer = self._buffer, []
+        try:
+            await asyncio.get_running_loop().run_in_executor(self._executor, self._write, rows)
+        except Exception as e:
+            logger.error(f"Error writing {len(rows)} trade journal row(s): {e}")
+
+    async def _flush_loop(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._flush_requested.wait(), timeout=FLUSH_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_requested.clear()
+            await self.flush()
+
+    async def _query(self, sql: str, params: tuple) -> list:
+        def run():
+            conn = self._connection()
+            conn.row_factory = sqlite3.Row
+            return [dict(row) for row in conn.execute(sql, params).fetchall()]
+        return await asyncio.get_running_loop().run_in_executor(self._executor, run)
+
+    async def recent_trades(self, user_id: int, limit: int = 100) -> list:
+        """Returns the user's most recent order attempts, newest first."""
+        await self.flush()
+        return await self._query(
+            "SELECT * FROM trades WHERE user_id = ? ORDER BY id DESC LIMIT ?",
+            (user_id, limit)
+        )
+
+    async def token_summary(self, user_id: int, currency: str, issuer: str) -> dict:
+        """Returns filled volume, fees and realized PnL in XRP for one token."""
+        await self.flush()
+        rows = await self._query(
+            """
+            SELECT
+                COALESCE(SUM(CASE WHEN side = 'buy' THEN size_token END), 0) AS bought_token,
+                COALESCE(SUM(CASE WHEN side = 'buy' THEN size_xrp END), 0) AS spent_xrp,
+                COALESCE(SUM(CASE WHEN side = 'sell' THEN size_token END), 0) AS sold_token,
+                COALESCE(SUM(CASE WHEN side = 'sell' THEN size_xrp END), 0) AS received_xrp,
+                COALESCE(SUM(fee_drops), 0) AS fee_drops,
+                COUNT(*) AS attempts
+            FROM trades
+            WHERE user_id = ? AND currency = ? AND issuer = ? AND engine_result = 'tesSUCCESS'
+            """,
+            (user_id, currency, issuer)
+        )
+        summary = rows[0]
+        # Realized PnL on the sold quantity at the average buy price
+        average_cost = summary["spent_xrp"] / summary["bought_token"] if summary["bought_token"] else 0.0
+        summary["realized_pnl_xrp"] = (
+            summary["received_xrp"] - average_cost * summary["sold_token"] - summary["fee_drops"] / 1_000_000
+        )
+        return summary
+
+    async def close(self):
+        """Flushes pending rows and stops the writer."""
+        if self._task and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        await self.flush()
+        if self._conn is not None:
+            conn, self._conn = self._conn, None
+            await asyncio.get_running_loop().run_in_executor(self._executor, conn.close)
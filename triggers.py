@@ -0,0 +1,203 @@
+import heapq
+import itertools
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Trigger kinds
+TAKE_PROFIT = "tp"
+STOP_LOSS = "sl"
+TRAILING_STOP = "trail"
+
+COMPACT_MIN_ENTRIES = 16  # A pair's heaps are rebuilt once they hold this many entries and over half are removed
+
+_group_ids = itertools.count()
+
+
+class _PairTriggers:
+    """Threshold heaps for one (currency, issuer) pair.
+
+    Take-profits sit in a min-heap of prices (fire when price >= threshold)
+    and stop-losses in a max-heap (fire when price <= threshold). Trailing
+    stops with the same percentage share groups: every trigger whose peak is
+    below a new price gets that price as its peak, so those groups merge into
+    one. Each trigger is moved a bounded number of times per rise, and a
+    tick costs O(log n) amortized.
+    """
+
+    def __init__(self):
+        self.take_profits = []  # (threshold, trigger_id)
+        self.stop_losses = []  # (-threshold, trigger_id)
+        self.trailing = {}  # pct -> {"peaks": [(peak, group_id)], "stops": [(-stop, group_id)], "groups": {}}
+        self.peaks_raised = False  # Set when a tick raised a trailing peak, cleared by the engine
+
+    def add(self, trigger: dict):
+        kind = trigger["kind"]
+        if kind == TAKE_PROFIT:
+            heapq.heappush(self.take_profits, (trigger["threshold"], trigger["id"]))
+        elif kind == STOP_LOSS:
+            heapq.heappush(self.stop_losses, (-trigger["threshold"], trigger["id"]))
+        elif kind == TRAILING_STOP:
+            bucket = self.trailing.setdefault(trigger["pct"], {"peaks": [], "stops": [], "groups": {}})
+            self._push_group(bucket, trigger["peak"], trigger["pct"], {trigger["id"]})
+
+    @staticmethod
+    def _push_group(bucket: dict, peak: float, pct: float, trigger_ids: set):
+        group_id = next(_group_ids)
+        bucket["groups"][group_id] = {"peak": peak, "ids": trigger_ids}
+        heapq.heappush(bucket["peaks"], (peak, group_id))
+        heapq.heappush(bucket["stops"], (-peak * (1 - pct / 100), group_id))
+
+    def on_price(self, price: float) -> list:
+        """Returns the ids of every trigger crossed by price."""
+        crossed = []
+        while self.take_profits and self.take_profits[0][0] <= price:
+            crossed.append(heapq.heappop(self.take_profits)[1])
+        while self.stop_losses and -self.stop_losses[0][0] >= price:
+            crossed.append(heapq.heappop(self.stop_losses)[1])
+
+        for pct, bucket in self.trailing.items():
+            # Raise the peak of every group below the new price by merging them
+            merged = set()
+            while bucket["peaks"] and bucket["peaks"][0][0] < price:
+                _, group_id = heapq.heappop(bucket["peaks"])
+                group = bucket["groups"].pop(group_id, None)
+                if group is not None:
+                    merged |= group["ids"]
+            if merged:
+                self._push_group(bucket, price, pct, merged)
+                self.peaks_raised = True
+
+            # Fire groups whose stop the price has fallen to
+            while bucket["stops"] and -bucket["stops"][0][0] >= price:
+                _, group_id = heapq.heappop(bucket["stops"])
+                group = bucket["groups"].pop(group_id, None)
+                if group is not None:
+                    crossed.extend(group["ids"])
+        return crossed
+
+    def peaks(self) -> dict:
+        """Returns {trigger_id: peak} for the trailing stops of the pair (including removed ids)."""
+        return {trigger_id: group["peak"] for bucket in self.trailing.values()
+                for group in bucket["groups"].values() for trigger_id in group["ids"]}
+
+    def __len__(self):
+        """Number of heap entries, removed triggers included until the pair is compacted."""
+        return (len(self.take_profits) + len(self.stop_losses)
+                + sum(len(group["ids"]) for bucket in self.trailing.values() for group in bucket["groups"].values()))
+
+
+class TriggerEngine:
+    """Take-profit, stop-loss and trailing-stop triggers evaluated on every price tick.
+
+    Triggers that share a ``group`` are one-cancels-other: once one fires,
+    the rest of its group is dropped. Every trigger fires at most once.
+    Removal is lazy: removed ids are skipped when they surface in a heap.
+    A pair is dropped once it has no armed trigger left, and its heaps are
+    rebuilt when removed entries outnumber armed ones. Trailing-stop peaks
+    are exposed through peaks() so they can be persisted with the rules.
+    """
+
+    def __init__(self):
+        self._pairs = {}  # Structure: {(currency, issuer): _PairTriggers}
+        self._triggers = {}  # Structure: {trigger_id: trigger}
+        self._groups = {}  # Structure: {group: {trigger_id, ...}}
+        self._armed = {}  # Structure: {(currency, issuer): {trigger_id, ...}}
+        self.peaks_raised = False  # Set when a tick raised a trailing peak; the owner clears it once persisted
+
+    def add(self, trigger: dict):
+        """Arms a trigger: {"id", "user_id", "currency", "issuer", "kind", "pct", "entry_price", "sell_percentage", "group"}."""
+        trigger = dict(trigger)
+        if trigger["kind"] == TAKE_PROFIT:
+            trigger["threshold"] = trigger["entry_price"] * (1 + trigger["pct"] / 100)
+        elif trigger["kind"] == STOP_LOSS:
+            trigger["threshold"] = trigger["entry_price"] * (1 - trigger["pct"] / 100)
+        elif trigger["kind"] == TRAILING_STOP:
+            trigger["peak"] = max(trigger.get("peak") or 0, trigger["entry_price"])
+        else:
+            raise ValueError(f"Unknown trigger kind: {trigger['kind']}")
+        self._triggers[trigger["id"]] = trigger
+        if trigger.get("group") is not None:
+            self._groups.setdefault(trigger["group"], set()).add(trigger["id"])
+        key = (trigger["currency"], trigger["issuer"])
+        self._pairs.setdefault(key, _PairTriggers()).add(trigger)
+        self._armed.setdefault(key, set()).add(trigger["id"])
+
+    def _disarm(self, trigger_id: str):
+        """Forgets a trigger; returns it, or None if it was not armed."""
+        trigger = self._triggers.pop(trigger_id, None)
+        if trigger is None:
+            return None
+        if trigger.get("group") in self._groups:
+            self._groups[trigger["group"]].discard(trigger_id)
+            if not self._groups[trigger["group"]]:
+                del self._groups[trigger["group"]]
+        key = (trigger["currency"], trigger["issuer"])
+        armed = self._armed.get(key)
+        if armed is not None:
+            armed.discard(trigger_id)
+        return trigger
+
+    def _tidy(self, key: tuple):
+        """Drops a pair without armed triggers, or rebuilds its heaps when they are mostly removed entries."""
+        armed = self._armed.get(key)
+        if not armed:
+            self._pairs.pop(key, None)
+            self._armed.pop(key, None)
+            return
+        pair = self._pairs[key]
+        if len(pair) >= COMPACT_MIN_ENTRIES and len(pair) > 2 * len(armed):
+            peaks = pair.peaks()
+            compacted = _PairTriggers()
+            for trigger_id in armed:
+                trigger = self._triggers[trigger_id]
+                if trigger_id in peaks:
+                    trigger["peak"] = peaks[trigger_id]
+                compacted.add(trigger)
+            self._pairs[key] = compacted
+
+    def remove(self, trigger_id: str):
+        """Disarms a trigger."""
+        trigger = self._disarm(trigger_id)
+        if trigger is not None:
+            self._tidy((trigger["currency"], trigger["issuer"]))
+
+    def peaks(self) -> dict:
+        """Returns {trigger_id: peak} for every armed trailing stop."""
+        return {trigger_id: peak for pair in self._pairs.values() for trigger_id, peak in pair.peaks().items()
+                if trigger_id in self._triggers}
+
+    def on_price(self, currency: str, issuer: str, price: float) -> list:
+        """Evaluates a price tick for a pair and returns the triggers that fired."""
+        pair = self._pairs.get((currency, issuer))
+        if pair is None:
+            return []
+
+        fired = []
+        fired_groups = set()
+        for trigger_id in pair.on_price(price):
+            trigger = self._disarm(trigger_id)
+            if trigger is None:
+                continue  # Removed, or already fired
+            group = trigger.get("group")
+            if group is not None:
+                if group in fired_groups:
+                    continue
+                fired_groups.add(group)
+            trigger["fired_price"] = price
+            fired.append(trigger)
+
+        # One-cancels-other within a group
+        for group in fired_groups:
+            for trigger_id in list(self._groups.get(group, ())):
+                self._disarm(trigger_id)
+
+        if pair.peaks_raised:
+            pair.peaks_raised = False
+            self.peaks_raised = True
+        self._tidy((currency, issuer))
+        return fired
+
+    def get_triggers(self, user_id: int = None) -> list:
+        """Returns the armed triggers, optionally for one user."""
+        return [t for t in self._triggers.values() if user_id is None or t["user_id"] == user_id]
@@ -2,21 +2,117 @@ import asyncio
 import json
 import websockets
 import os
+import time
+import uuid
 from xrpl.clients import JsonRpcClient
-from xrpl.models import Payment, TrustSet, IssuedCurrencyAmount, OfferCreate
-from xrpl.transaction import submit_and_wait
+from xrpl.models.requests import SubmitOnly
 from xrpl.wallet import Wallet
 import xrpl
 import logging
 
-# Configure logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+import logging_setup
+import metrics
+from fee_oracle import FeeOracle
+from http_server import HttpServer
+from issuer_risk import IssuerRiskCache, check_risk
+from listings import NEW_PAIR, ListingDetector
+from loop_watchdog import LoopWatchdog
+from ledger_scheduler import LedgerScheduler
+from result_tracker import ResultTracker
+from activity import ActivityTracker
+from amm_pools import AMMPools
+from market_data import BookCache, book_buy_output, book_depth
+from portfolio import FillHistory, fill_from_meta, valuate
+from positions_cache import PositionsCache
+from open_offers import OpenOffers
+from order_templates import (OrderTemplateCache, TF_FILL_OR_KILL, TF_IMMEDIATE_OR_CANCEL,
+                             format_token_value, xrp_to_drops_str)
+from signing_service import SigningService
+from token_registry import TokenRegistry
+from token_supply import TokenSupply
+from slicing import SliceScheduler
+from supervisor import Supervisor
+from ticker_match import TickerMatcher, decode_currency, split_patterns
+from timer_wheel import TimerWheel
+from trade_journal import TradeJournal
+from triggers import TriggerEngine
+
+# Configure logging (queued, with hot-path categories sampled)
+logging_setup.configure()
 logger = logging.getLogger(__name__)
 
 # Configuration
 JSON_RPC_URL = "https://s.altnet.rippletest.net:51234/"  # Using testnet for development
 WEBSOCKET_URL = "wss://s.altnet.rippletest.net:51233/"  # Using testnet for development
-client = JsonRpcClient(JSON_RPC_URL)
+RPC_LATENCY = metrics.histogram("xrpl_rpc_seconds", "JSON-RPC request latency by method")
+RPC_ERRORS = metrics.counter("xrpl_rpc_errors_total", "JSON-RPC requests that raised, by method")
+
+
+class InstrumentedJsonRpcClient(JsonRpcClient):
+    """JsonRpcClient that records request latency per method."""
+
+    def request(self, request):
+        method = getattr(request.method, "value", str(request.method))
+        started = time.perf_counter()
+        try:
+            return super().request(request)
+        except Exception:
+            RPC_ERRORS.inc(method=method)
+            raise
+        finally:
+            RPC_LATENCY.observe(time.perf_counter() - started, method=method)
+
+
+client = InstrumentedJsonRpcClient(JSON_RPC_URL)
+
+# Order submission configuration
+LEDGER_OFFSET = 4  # Ledgers an order may wait before its LastLedgerSequence expires
+RBF_MARGIN_LEDGERS = 1  # Replace a stuck order this many ledgers before it would expire
+MAX_FEE_BUMPS = 3  # Maximum replace-by-fee resubmissions per order
+VALUATION_INTERVAL = 60  # Seconds between background portfolio valuations
+
+# Resting offer configuration
+OFFER_MODES = ("expire", "ioc", "fok", "gtc")  # Per-user time in force of manual orders, first is the default
+DEFAULT_OFFER_TTL = 120  # Seconds an "expire" offer rests before it expires
+OFFER_SWEEP_INTERVAL = 30  # Seconds between sweeps that cancel expired and stale offers
+PEAK_SAVE_DELAY = 10  # Seconds a raised trailing-stop peak may wait before it is written to disk
+
+# Shutdown configuration
+DRAIN_TIMEOUT = 30  # Seconds shutdown waits for in-flight orders before stopping anyway
+
+# Activation window configuration
+STREAM_LEAD_SECONDS = 30  # The stream starts this long before a scheduled config's window opens
+
+# Liquidity and supply criteria configuration
+DEFAULT_DEPTH_PCT = 5  # Price band around mid, in percent, that min_depth_xrp is measured in
+
+# Health check configuration
+HEALTH_MAX_LEDGER_AGE = 30  # Seconds without a ledgerClosed after which a running stream is unhealthy
+
+MESSAGES_INGESTED = metrics.counter("xrpl_messages_total", "Stream messages ingested, by type")
+SNIPER_MATCHES = metrics.counter("sniper_matches_total", "Tokens matched by a sniper config, by trigger")
+ORDERS = metrics.counter("orders_total", "Order attempts by side and engine result")
+QUEUE_DEPTH = metrics.gauge("queue_depth", "Items waiting in internal queues and in-flight sets")
+CACHE_REQUESTS = metrics.counter("cache_requests_total", "Cache lookups by cache and result (hit/miss)")
+LEDGER_AGE = metrics.gauge("xrpl_last_ledger_age_seconds", "Seconds since the last ledgerClosed on the stream")
+LEDGER_STATS = metrics.gauge(
+    "xrpl_ledger_stats", "Ledger cadence and order inclusion over the recent ledger window, by stat"
+)
+STREAM_LAG = metrics.gauge(
+    "xrpl_stream_lag_seconds",
+    "Wall-clock seconds from a ledger's close time to processing its ledgerClosed; grows with a stream backlog"
+)
+
+MARKET_CRITERIA_SECONDS = metrics.histogram(
+    "sniper_market_criteria_seconds", "Time spent evaluating liquidity and supply criteria per matched token"
+)
+MARKET_CRITERIA_REJECTIONS = metrics.counter(
+    "sniper_market_criteria_rejections_total", "Matched tokens skipped by liquidity and supply criteria, by reason"
+)
+
+def _supply_in_range(supply: float, market: dict) -> bool:
+    return (not market.get("min_supply") or supply >= market["min_supply"]) and \
+           (not market.get("max_supply") or supply <= market["max_supply"])
 
 class XRPSniper:
     def __init__(self, data_file="sniper_data.json"):
@@ -28,8 +124,45 @@ class XRPSniper:
         self.buy_presets = {} # Buy presets for each user
         self.sell_presets = {} # Sell presets for each user
         self.running = False
-        self.sniper_task = None
+        self.supervisor = Supervisor()
+        self.loop_watchdog = LoopWatchdog()
+        self.http = HttpServer()
+        self.http.route("GET", "/metrics", self._metrics_endpoint)
+        self.http.route("GET", "/healthz", self._healthz_endpoint)
+        metrics.add_collector(self._collect_metrics)
+        self.draining = False  # Set on shutdown: no new snipes, in-flight orders finish
+        self._inflight_orders = 0
         self.ws = None
+        self.fee_oracle = FeeOracle(client)
+        self.ledger_scheduler = LedgerScheduler()
+        self.result_tracker = ResultTracker(client, self.ledger_scheduler)
+        self.signer = SigningService()
+        self.order_templates = OrderTemplateCache(client)
+        self.positions = PositionsCache(client, self.ledger_scheduler)
+        self.open_offers = OpenOffers(client, self.ledger_scheduler)
+        self.book_cache = BookCache()
+        self.amm_pools = AMMPools(client, self.ledger_scheduler)
+        self.issuer_risk = IssuerRiskCache(client)
+        self.token_supply = TokenSupply(client, self.ledger_scheduler)
+        self.fills = FillHistory()
+        self.portfolio_snapshot = {}  # Last background valuation, {user_id: summary}
+        self.journal = TradeJournal()
+        self.auto_sell_rules = {}  # Structure: {user_id: {rule_id: rule_dict}}
+        self.triggers = TriggerEngine()
+        self._peak_save_handle = None
+        self.slicer = SliceScheduler(self.ledger_scheduler)
+        self.token_registry = TokenRegistry()  # Loaded by start_services, off the event loop
+        self.listing_detector = ListingDetector(self.token_registry)
+        self.activity = ActivityTracker()
+        self.ticker_matcher = TickerMatcher()  # Ticker patterns of armed configs, keyed by (user_id, config_id)
+        self.timers = TimerWheel()
+        self._armed = set()  # (user_id, config_id) of configs that are enabled, in their window and not fired out
+        self._warming = set()  # (user_id, config_id) of configs whose window opens within STREAM_LEAD_SECONDS
+        self._config_timers = {}  # Structure: {(user_id, config_id): [timer handle, ...]}
+        self.sniped = set()  # (user_id, config_id, currency, issuer) already bought this session
+        self._snipe_tasks = set()
+        self.book_cache.add_listener(self._on_price_tick)
+        self.notifier = None  # Optional async callback(user_id, text) set by the bot
         self.load_data()
 
     def load_data(self):
@@ -41,13 +174,16 @@ class XRPSniper:
                     
                     # Reconstruct wallets from seeds
                     for user_id, wallet_data in data.get('wallets', {}).items():
-                        self.wallets[int(user_id)] = Wallet(wallet_data['seed'], 0)
+                        self.wallets[int(user_id)] = Wallet.from_seed(wallet_data['seed'])
                     
                     # Load sniper configs
                     self.sniper_configs = {
                         int(user_id): configs 
                         for user_id, configs in data.get('sniper_configs', {}).items()
                     }
+                    for user_id, configs in self.sniper_configs.items():
+                        for config_id in configs:
+                            self._schedule_config(user_id, config_id)
                     
                     # Load default trade settings
                     self.default_trade_settings = {
@@ -68,6 +204,20 @@ class XRPSniper:
                     self.sell_presets = {
                         int(k): v for k, v in data.get('sell_presets', {}).items()
                     }
+
+                    # Load cost basis built from executed fills
+                    self.fills.load(data.get('cost_basis', {}))
+
+                    # Load and re-arm auto-sell rules
+                    self.auto_sell_rules = {
+                        int(k): v for k, v in data.get('auto_sell_rules', {}).items()
+                    }
+                    for rules in self.auto_sell_rules.values():
+                        for rule in rules.values():
+                            self.triggers.add(rule)
+
+                    # Load the offers the bot placed, the only ones the sweeper may cancel
+                    self.open_offers.load_placed_offers(data.get('placed_offers', {}))
                     
                 logger.info(f"Loaded data for {len(self.wallets)} users with {sum(len(configs) for configs in self.sniper_configs.values())} sniper configs")
             except Exception as e:
@@ -76,6 +226,13 @@ class XRPSniper:
     def save_data(self):
         """Save wallets, sniper configs, and settings to file."""
         try:
+            # Trailing stops resume from their highest price after a restart
+            peaks = self.triggers.peaks()
+            for rules in self.auto_sell_rules.values():
+                for rule in rules.values():
+                    if rule["id"] in peaks:
+                        rule["peak"] = peaks[rule["id"]]
+            self.triggers.peaks_raised = False
             data = {
                 'wallets': {
                     str(user_id): {'seed': wallet.seed, 'address': wallet.classic_address}
@@ -96,7 +253,12 @@ class XRPSniper:
                 },
                 'sell_presets': {
                     str(k): v for k, v in self.sell_presets.items()
-                }
+                },
+                'cost_basis': self.fills.to_dict(),
+                'auto_sell_rules': {
+                    str(k): v for k, v in self.auto_sell_rules.items()
+                },
+                'placed_offers': self.open_offers.placed_offers()
             }
             with open(self.data_file, 'w') as f:
                 json.dump(data, f, indent=2)
@@ -104,11 +266,23 @@ class XRPSniper:
         except Exception as e:
             logger.error(f"Error saving data: {e}")
 
-    def add_wallet(self, user_id: int, wallet_data: dict):
+    async def add_wallet(self, user_id: int, wallet_data: dict):
         """Adds a wallet to the sniper bot for a specific user."""
-        # Use seed keyword argument for Wallet constructor
-        self.wallets[user_id] = Wallet(seed=wallet_data["seed"], sequence=0)
+        # Derive the keypair in the signing pool so the event loop is not blocked
+        keys = await self.signer.derive_wallet(wallet_data["seed"])
+        if user_id in self.wallets:
+            self.order_templates.invalidate(self.wallets[user_id].classic_address)
+            self.positions.untrack(self.wallets[user_id].classic_address)
+            self.open_offers.untrack(self.wallets[user_id].classic_address)
+        self.wallets[user_id] = Wallet(keys["public_key"], keys["private_key"], seed=wallet_data["seed"])
+        self.positions.track(keys["address"])
+        self.open_offers.track(keys["address"])
+        self.order_templates.prefetch(keys["address"])
         self.save_data()
+        if self.ws:
+            asyncio.get_running_loop().create_task(
+                self.result_tracker.subscribe_accounts(self.ws, [self.wallets[user_id].classic_address])
+            )
         logger.info(f"Wallet added for user {user_id}: {self.wallets[user_id].classic_address}")
 
     def get_user_sniper_configs(self, user_id: int) -> dict:
@@ -125,17 +299,84 @@ class XRPSniper:
             self.sniper_configs[user_id] = {}
         
         self.sniper_configs[user_id][config_id] = config
+        self._schedule_config(user_id, config_id)
         self.save_data()
         logger.info(f"Sniper config {config_id} saved for user {user_id}")
 
+    def _index_ticker(self, user_id: int, config_id: str):
+        """Re-registers a config's ticker patterns with the matcher (removes them unless it is armed)."""
+        config = self.get_sniper_config(user_id, config_id)
+        armed = config is not None and (user_id, config_id) in self._armed
+        self.ticker_matcher.set_patterns((user_id, config_id), split_patterns(config.get("ticker")) if armed else [])
+
+    @staticmethod
+    def _fired_out(config: dict) -> bool:
+        return bool(config.get("max_fires")) and config.get("fires", 0) >= config["max_fires"]
+
+    def _schedule_config(self, user_id: int, config_id: str):
+        """Arms or disarms a config for the current time and schedules its next window transitions.
+
+        A config is armed while it is enabled, inside its optional
+        active_from/active_until window (posix times) and below its optional
+        max_fires. Timers on the wheel re-evaluate it when the window opens
+        and closes, and start the stream STREAM_LEAD_SECONDS early.
+        """
+        key = (user_id, config_id)
+        for handle in self._config_timers.pop(key, ()):
+            self.timers.cancel(handle)
+        self._warming.discard(key)
+        config = self.get_sniper_config(user_id, config_id)
+        now = time.time()
+
+        active_from = config.get("active_from") if config else None
+        active_until = config.get("active_until") if config else None
+        live = config is not None and config.get("enabled", False) and not self._fired_out(config)
+        if live and (not active_from or active_from <= now) and (not active_until or now < active_until):
+            self._armed.add(key)
+        else:
+            self._armed.discard(key)
+        self._index_ticker(user_id, config_id)
+
+        if live:
+            handles = []
+            if active_from and active_from > now:
+                if active_from - STREAM_LEAD_SECONDS <= now:
+                    self._warming.add(key)
+                else:
+                    handles.append(self.timers.schedule(active_from - STREAM_LEAD_SECONDS, lambda: self._warm(key)))
+                handles.append(self.timers.schedule(active_from, lambda: self._schedule_config(*key)))
+            if active_until and active_until > now:
+                handles.append(self.timers.schedule(active_until, lambda: self._schedule_config(*key)))
+            if handles:
+                self._config_timers[key] = handles
+        self._update_running_status()
+
+    def is_config_armed(self, user_id: int, config_id: str) -> bool:
+        """Returns True if the config is currently live (enabled, in its window, not fired out)."""
+        return (user_id, config_id) in self._armed
+
+    def _warm(self, key: tuple):
+        """Starts the stream ahead of a config's window so it is live when the window opens."""
+        self._warming.add(key)
+        self._update_running_status()
+
+    async def _run_timers(self):
+        """Drives the timer wheel once per tick."""
+        while True:
+            await asyncio.sleep(self.timers.tick)
+            self.timers.run_due()
+
     def update_sniper_config_status(self, user_id: int, config_id: str, enabled: bool):
         """Update the enabled status of a sniper config."""
         if user_id in self.sniper_configs and config_id in self.sniper_configs[user_id]:
             self.sniper_configs[user_id][config_id]["enabled"] = enabled
+            if enabled:
+                # Re-enabling a config that fired out starts a new count
+                self.sniper_configs[user_id][config_id]["fires"] = 0
             self.save_data()
             
-            # Update running status
-            self._update_running_status()
+            # Re-arm and update running status
+            self._schedule_config(user_id, config_id)
             
             logger.info(f"Sniper config {config_id} for user {user_id} {'enabled' if enabled else 'disabled'}")
 
@@ -145,36 +386,44 @@ class XRPSniper:
             del self.sniper_configs[user_id][config_id]
             self.save_data()
             
-            # Update running status
-            self._update_running_status()
+            # Disarm and update running status
+            self._schedule_config(user_id, config_id)
             
             logger.info(f"Sniper config {config_id} deleted for user {user_id}")
 
     def _update_running_status(self):
-        """Update the running status based on enabled configs."""
-        # Check if any config is enabled
-        has_enabled_configs = any(
-            config.get("enabled", False)
-            for user_configs in self.sniper_configs.values()
-            for config in user_configs.values()
-        )
-        
-        if has_enabled_configs and not self.running:
-            self.running = True
-        elif not has_enabled_configs and self.running:
-            self.running = False
+        """Starts the stream when a config is armed or about to be, and stops it when none is."""
+        if "stream" not in self.supervisor or self.draining:
+            return  # Services are not started yet (see start_services) or are shutting down
+
+        needs_stream = bool(self._armed or self._warming)
+        if needs_stream and not self.supervisor.is_running("stream"):
+            self.supervisor.start("stream")
+        elif not needs_stream and self.running:
+            logger.info("No sniper config armed, stopping the stream until the next window")
+            asyncio.get_running_loop().create_task(self._stop_stream())
+
+    async def _stop_stream(self):
+        # Runs as a fire-and-forget task, so errors are logged here or they would go unseen
+        try:
+            await self.stop_sniper()
+        except Exception as e:
+            logger.error(f"Error stopping the stream: {e}")
+        # A config may have been armed while the stream was shutting down
+        if self._armed or self._warming:
+            self._update_running_status()
 
     def get_enabled_configs(self) -> list:
-        """Get all enabled sniper configs across all users."""
+        """Get all armed sniper configs across all users."""
         enabled_configs = []
-        for user_id, configs in self.sniper_configs.items():
-            for config_id, config in configs.items():
-                if config.get("enabled", False):
-                    enabled_configs.append({
-                        "user_id": user_id,
-                        "config_id": config_id,
-                        "config": config
-                    })
+        for user_id, config_id in self._armed:
+            config = self.get_sniper_config(user_id, config_id)
+            if config is not None:
+                enabled_configs.append({
+                    "user_id": user_id,
+                    "config_id": config_id,
+                    "config": config
+                })
         return enabled_configs
 
     async def _keep_alive(self):
@@ -182,7 +431,7 @@ class XRPSniper:
         try:
             while self.running and self.ws:
                 await asyncio.sleep(30)
-                if self.ws and not self.ws.closed:
+                if self.ws:
                     await self.ws.ping()
                     logger.debug("Sent WebSocket ping")
         except Exception as e:
@@ -213,6 +462,13 @@ class XRPSniper:
                     
                     response = await ws.recv()
                     logger.info(f"Subscription response: {response}")
+
+                    # Track our own wallets' transactions for order results
+                    await self.result_tracker.subscribe_accounts(
+                        ws, [wallet.classic_address for wallet in self.wallets.values()]
+                    )
+                    # Balances may have changed while we were disconnected; re-seed on next access
+                    self.positions.invalidate()
                     
                     reconnect_delay = 5
                     
@@ -251,22 +507,43 @@ class XRPSniper:
 
     async def _process_xrpl_message(self, message: dict):
         """Processes incoming WebSocket messages from the XRPL."""
-        if message.get("type") == "transaction" and message.get("validated"):
+        MESSAGES_INGESTED.inc(type=message.get("type", "response"))
+        if message.get("type") == "ledgerClosed":
+            self.fee_oracle.on_ledger_closed(message)
+            self.ledger_scheduler.on_ledger_closed(message)
+            if message.get("ledger_time") is not None:
+                # Close times are rounded to the ledger's close time resolution, so a few seconds is normal
+                STREAM_LAG.set(time.time() - xrpl.utils.ripple_time_to_posix(message["ledger_time"]))
+        elif message.get("type") == "transaction" and message.get("validated"):
+            self.result_tracker.on_transaction(message)
+            self.positions.on_transaction(message)
+            self.open_offers.on_transaction(message)
+            self.book_cache.on_transaction(message)
+            self.amm_pools.on_transaction(message)
+            self.issuer_risk.on_transaction(message)
+            self.token_supply.on_transaction(message)
+
             transaction = message.get("transaction")
             meta = message.get("meta")
 
             tx_type = transaction.get("TransactionType")
 
-            # Monitor for OfferCreate transactions (new listings/liquidity)
+            # Monitor for OfferCreate transactions (quotes for the book cache)
             if tx_type == "OfferCreate":
                 await self._handle_offer_create_transaction(transaction, meta)
-            # Monitor for TrustSet transactions
-            elif tx_type == "TrustSet":
-                await self._handle_trustset_transaction(transaction, meta)
+
+            # New pairs and liquidity (AMMCreate, AMMDeposit, resting offers) from metadata
+            for event in self.listing_detector.detect(message):
+                self._handle_listing(event, transaction)
+
+            # Trustline, offer and volume surges per token
+            touched = self.activity.on_transaction(message)
+            if touched:
+                self._check_activity_criteria(touched)
 
     async def _handle_offer_create_transaction(self, transaction: dict, meta: dict):
-        """Handles OfferCreate transactions to detect new token listings/liquidity."""
-        logger.info(f"Detected OfferCreate transaction: {transaction.get('hash')}")
+        """Handles OfferCreate transactions to keep the book cache's quotes current."""
+        logger.debug("Detected OfferCreate transaction: %s", transaction.get("hash"), extra={"category": "ingest"})
 
         taker_gets = transaction.get("TakerGets")
         taker_pays = transaction.get("TakerPays")
@@ -287,32 +564,159 @@ class XRPSniper:
         elif isinstance(taker_pays, str):  # XRP
             payment_currency = "XRP"
 
+        # Feed the quote into the book cache (ask: token offered for XRP, bid: XRP offered for token)
         if token_currency and token_issuer and payment_currency == "XRP":
-            logger.info(f"Potential new listing: {token_currency}.{token_issuer} against XRP")
-            
-            # Check all enabled configs
-            enabled_configs = self.get_enabled_configs()
-            for config_data in enabled_configs:
-                user_id = config_data["user_id"]
-                config = config_data["config"]
-                
-                if self._matches_snipe_criteria(config, token_currency, token_issuer, transaction):
-                    logger.info(f"Attempting to snipe token {token_currency}.{token_issuer} for user {user_id}")
-                    await self._execute_buy_order(
-                        user_id, 
-                        token_currency, 
-                        token_issuer, 
-                        config.get("buy_amount_xrp", 10),
-                        config.get("slippage", 0.01),
-                        mev_protect=self.mev_protection_settings.get(user_id, {}).get("enabled", False)
-                    )
+            token_value = float(taker_gets.get("value", 0))
+            if token_value > 0:
+                self.book_cache.observe_offer(token_currency, token_issuer, "ask",
+                                              float(taker_pays) / 1_000_000 / token_value)
+        elif isinstance(taker_gets, str) and isinstance(taker_pays, dict) and "issuer" in taker_pays:
+            token_value = float(taker_pays.get("value", 0))
+            if token_value > 0:
+                self.book_cache.observe_offer(taker_pays["currency"], taker_pays["issuer"], "bid",
+                                              float(taker_gets) / 1_000_000 / token_value)
+
+    def _handle_listing(self, event: dict, transaction: dict):
+        """Runs a listing event through every enabled sniper config and launches matching buys."""
+        token_currency, token_issuer = event["currency"], event["issuer"]
+        logger.info("Listing event %s (%s): %s (%s.%s) against XRP", event["kind"], event["source"], event["ticker"],
+                    token_currency, token_issuer, extra={"category": "listing", "currency": token_currency,
+                                                         "issuer": token_issuer})
+        # One automaton pass over the decoded ticker answers every config's patterns
+        ticker_matches = self.ticker_matcher.match(event["ticker"])
+
+        # Check all enabled configs
+        enabled_configs = self.get_enabled_configs()
+        for config_data in enabled_configs:
+            user_id = config_data["user_id"]
+            config = config_data["config"]
+            snipe_key = (user_id, config_data["config_id"], token_currency, token_issuer)
+            if snipe_key in self.sniped:
+                continue
+            if config.get("only_new_tokens") and event["kind"] != NEW_PAIR:
+                continue
+
+            ticker_matched = (user_id, config_data["config_id"]) in ticker_matches
+            if (self._matches_snipe_criteria(config, token_issuer, transaction, ticker_matched)
+                    and self._passes_market_criteria(config, token_currency, token_issuer, event)):
+                SNIPER_MATCHES.inc(trigger=event["source"])
+                self._launch_snipe(snipe_key, config)
+
+    def _check_activity_criteria(self, touched: set):
+        """Launches buys for configs whose activity thresholds a token just crossed."""
+        for config_data in self.get_enabled_configs():
+            thresholds = config_data["config"].get("activity")
+            if not thresholds:
+                continue
+            for token_currency, token_issuer in touched:
+                if not config_data["config"].get("enabled"):
+                    break  # Fired out on an earlier token of this transaction
+                snipe_key = (config_data["user_id"], config_data["config_id"], token_currency, token_issuer)
+                if snipe_key in self.sniped:
+                    continue
+                if (self.activity.meets(token_currency, token_issuer, thresholds)
+                        and self._passes_market_criteria(config_data["config"], token_currency, token_issuer)):
+                    logger.info(f"Match by activity {thresholds}: {token_currency}.{token_issuer}")
+                    SNIPER_MATCHES.inc(trigger="activity")
+                    self._launch_snipe(snipe_key, config_data["config"])
+
+    def _passes_market_criteria(self, config: dict, currency: str, issuer: str, event: dict = None) -> bool:
+        """Checks a config's liquidity and supply criteria against in-memory book, pool and supply data.
+
+        Criteria ({"min_depth_xrp", "depth_pct", "max_price", "min_supply",
+        "max_supply"}) never wait for RPC. Depth is the smaller of the XRP
+        resting on each side within depth_pct of mid, from the AMM mirror,
+        the cached book and the listing offer itself. An unmirrored issuer's
+        supply is fetched in the background and checked again before the
+        order is submitted.
+        """
+        market = config.get("market")
+        if not market:
+            return True
+        started = time.perf_counter()
+        try:
+            reason = self._market_rejection(market, currency, issuer, event)
+        finally:
+            MARKET_CRITERIA_SECONDS.observe(time.perf_counter() - started)
+        if reason is not None:
+            MARKET_CRITERIA_REJECTIONS.inc(reason=reason)
+            logger.info("Skipping %s.%s: %s criteria not met", currency, issuer, reason,
+                        extra={"category": "market", "currency": currency, "issuer": issuer, "reason": reason})
+            return False
+        return True
+
+    def _market_rejection(self, market: dict, currency: str, issuer: str, event: dict = None):
+        """Returns the name of the first failed market criterion, or None."""
+        listing_price = None
+        if event and event.get("xrp") and event.get("token"):
+            listing_price = event["xrp"] / event["token"]
+        mid = self.amm_pools.spot_price(currency, issuer) or self.book_cache.mid(currency, issuer) or listing_price
+
+        max_price = market.get("max_price")
+        price = listing_price if listing_price is not None else mid
+        if max_price and price is not None and price > max_price:
+            return "max_price"
+
+        min_depth = market.get("min_depth_xrp")
+        if min_depth:
+            if mid is None:
+                return "min_depth_xrp"
+            pct = market.get("depth_pct") or DEFAULT_DEPTH_PCT
+            depth = {"ask": 0.0, "bid": 0.0}
+            amm_depth = self.amm_pools.depth(currency, issuer, pct)
+            if amm_depth is not None:
+                depth["ask"], depth["bid"] = amm_depth
+            depth["ask"] += book_depth(self.book_cache.get_offers(currency, issuer, "ask"), "ask", mid * (1 + pct / 100))
+            depth["bid"] += book_depth(self.book_cache.get_offers(currency, issuer, "bid"), "bid", mid * (1 - pct / 100))
+            # The listing offer itself rests on the book and is not in any snapshot yet
+            if event and event.get("side") and listing_price is not None and abs(listing_price / mid - 1) * 100 <= pct:
+                depth[event["side"]] += event["xrp"]
+            if min(depth.values()) < min_depth:
+                return "min_depth_xrp"
 
-    async def _handle_trustset_transaction(self, transaction: dict, meta: dict):
-        """Handles TrustSet transactions."""
-        logger.info(f"Detected TrustSet transaction: {transaction.get('hash')}")
+        if market.get("min_supply") or market.get("max_supply"):
+            supply = self.token_supply.cached(currency, issuer)
+            if supply is None:
+                self.token_supply.prefetch(issuer)
+            elif not _supply_in_range(supply, market):
+                return "supply"
+        return None
 
-    def _matches_snipe_criteria(self, config: dict, currency: str, issuer: str, transaction: dict) -> bool:
-        """Checks if the token matches the sniper config criteria."""
+    def _launch_snipe(self, snipe_key: tuple, config: dict):
+        """Starts a config's buy of a token, at most once per session."""
+        user_id, _, token_currency, token_issuer = snipe_key
+        if self.draining:
+            return
+        logger.info(f"Attempting to snipe token {token_currency}.{token_issuer} for user {user_id}")
+        self.sniped.add(snipe_key)
+        if config.get("max_fires"):
+            config["fires"] = config.get("fires", 0) + 1
+            if self._fired_out(config):
+                logger.info(f"Sniper config {snipe_key[1]} for user {user_id} reached {config['max_fires']} fire(s)")
+                config["enabled"] = False
+                self._schedule_config(user_id, snipe_key[1])
+            self.save_data()
+        # Buy off the ingest path so the stream keeps flowing while the order settles
+        task = asyncio.get_running_loop().create_task(self._execute_buy_order(
+            user_id, 
+            token_currency, 
+            token_issuer, 
+            config.get("buy_amount_xrp", 10),
+            config.get("slippage", 0.01),
+            mev_protect=self.mev_protection_settings.get(user_id, {}).get("enabled", False),
+            max_fee_xrp=config.get("max_gas_fee"),
+            risk=config.get("risk"),
+            market=config.get("market")
+        ))
+        self._snipe_tasks.add(task)
+        task.add_done_callback(self._snipe_tasks.discard)
+
+    def _matches_snipe_criteria(self, config: dict, issuer: str, transaction: dict, ticker_matched: bool) -> bool:
+        """Checks if the token matches the sniper config criteria.
+
+        Ticker patterns are evaluated for all configs at once by the ticker
+        matcher; ticker_matched carries this config's result.
+        """
         
         # Criteria 1: Developer wallet
         dev_wallet_address = config.get("dev_wallet_address")
@@ -320,10 +724,9 @@ class XRPSniper:
             logger.info(f"Match by developer wallet: {dev_wallet_address}")
             return True
 
-        # Criteria 2: Token name/ticker (currency code)
-        ticker = config.get("ticker")
-        if ticker and ticker.upper() == currency.upper():
-            logger.info(f"Match by ticker: {ticker}")
+        # Criteria 2: Token name/ticker (decoded currency code, exact or glob pattern)
+        if ticker_matched:
+            logger.info(f"Match by ticker: {config.get('ticker')}")
             return True
 
         # Criteria 3: Issuer address
@@ -334,91 +737,270 @@ class XRPSniper:
 
         return False
 
-    def get_order_book(self, taker_pays_currency, taker_pays_issuer, 
-                       taker_gets_currency, taker_gets_issuer):
-        """Query the order book for current prices."""
+    def get_ledger_stats(self) -> dict:
+        """Returns ledger cadence and order inclusion statistics for tuning."""
+        return self.ledger_scheduler.get_stats()
+
+    def _fetch_order_book(self, taker_pays_currency, taker_pays_issuer,
+                          taker_gets_currency, taker_gets_issuer) -> list:
+        """Fetches one side of an order book over JSON-RPC, without touching any cache."""
+        taker_pays_obj = {
+            "currency": taker_pays_currency,
+            "issuer": taker_pays_issuer
+        } if taker_pays_currency != "XRP" else "XRP"
+        
+        taker_gets_obj = {
+            "currency": taker_gets_currency,
+            "issuer": taker_gets_issuer
+        } if taker_gets_currency != "XRP" else "XRP"
+        
+        request = xrpl.models.requests.BookOffers(
+            taker_pays=taker_pays_obj,
+            taker_gets=taker_gets_obj,
+            limit=10
+        )
+        response = client.request(request)
+        return response.result.get('offers', [])
+
+    def _cache_order_book(self, taker_pays_currency, taker_pays_issuer,
+                          taker_gets_currency, taker_gets_issuer, offers: list):
+        """Feeds a book snapshot into the book cache (must run on the event loop thread)."""
+        if taker_pays_currency == "XRP" and taker_gets_currency != "XRP":
+            self.book_cache.update_from_offers(taker_gets_currency, taker_gets_issuer, "ask", offers)
+        elif taker_gets_currency == "XRP" and taker_pays_currency != "XRP":
+            self.book_cache.update_from_offers(taker_pays_currency, taker_pays_issuer, "bid", offers)
+
+    async def get_order_book(self, taker_pays_currency, taker_pays_issuer,
+                             taker_gets_currency, taker_gets_issuer):
+        """Query the order book for current prices, off the event loop."""
         try:
-            taker_pays_obj = {
-                "currency": taker_pays_currency,
-                "issuer": taker_pays_issuer
-            } if taker_pays_currency != "XRP" else "XRP"
-            
-            taker_gets_obj = {
-                "currency": taker_gets_currency,
-                "issuer": taker_gets_issuer
-            } if taker_gets_currency != "XRP" else "XRP"
-            
-            request = xrpl.models.requests.BookOffers(
-                taker_pays=taker_pays_obj,
-                taker_gets=taker_gets_obj,
-                limit=10
+            offers = await asyncio.get_running_loop().run_in_executor(
+                None, self._fetch_order_book, taker_pays_currency, taker_pays_issuer,
+                taker_gets_currency, taker_gets_issuer
             )
-            response = client.request(request)
-            return response.result.get('offers', [])
+            # Back on the loop: keep the book cache's marks current for valuation and price triggers
+            self._cache_order_book(taker_pays_currency, taker_pays_issuer,
+                                   taker_gets_currency, taker_gets_issuer, offers)
+            return offers
         except Exception as e:
             logger.error(f"Error fetching order book: {e}")
             return []
 
-    async def _execute_buy_order(self, user_id: int, currency: str, issuer: str, buy_amount_xrp: float, slippage: float, mev_protect: bool = False):
-        """Executes a buy order for a token on the XRPL DEX."""
-        if user_id not in self.wallets:
-            logger.error(f"No wallet configured for user {user_id}. Cannot execute buy order.")
-            return False
+    async def _current_validated_ledger(self) -> int:
+        """Returns the latest validated ledger index, from the stream when available."""
+        if self.ledger_scheduler.is_stream_live():
+            return self.ledger_scheduler.validated_ledger_index
+        return await asyncio.get_running_loop().run_in_executor(
+            None, xrpl.ledger.get_latest_validated_ledger_sequence, client
+        )
 
-        wallet = self.wallets[user_id]
-        
-        # First, ensure a trustline exists for the token
+    async def _wait_for_validation(self, tx_hashes: list, last_ledger_sequence: int):
+        """Waits for any of tx_hashes to validate via the result tracker.
+
+        Returns the validated result, or None once the order is within
+        RBF_MARGIN_LEDGERS of its LastLedgerSequence without validating.
+        """
+        return await self.result_tracker.wait_any(tx_hashes, last_ledger_sequence, RBF_MARGIN_LEDGERS)
+
+    async def _submit_order(self, tx_json: dict, wallet: Wallet, max_fee_xrp: float = None) -> dict:
+        """Submits an order, counting it as in flight until it settles (see _submit)."""
+        self._inflight_orders += 1
         try:
-            trust_set_tx = TrustSet(
-                account=wallet.classic_address,
-                limit_amount=IssuedCurrencyAmount(
-                    currency=currency,
-                    issuer=issuer,
-                    value="10000000000000000"  # Large limit
-                ),
+            return await self._submit(tx_json, wallet, max_fee_xrp)
+        finally:
+            self._inflight_orders -= 1
+
+    async def _submit(self, tx_json: dict, wallet: Wallet, max_fee_xrp: float = None) -> dict:
+        """Submits an XRPL-JSON transaction at the fee oracle's bid and waits for validation.
+
+        Sequence, Fee and LastLedgerSequence are filled locally. If the order
+        is still pending when its LastLedgerSequence is about to expire, it is
+        replaced by fee (same Sequence, higher Fee) up to max_fee_xrp. Returns
+        the validated result with ``engine_result`` taken from the metadata,
+        or the last submission result if it never validated.
+        """
+        address = wallet.classic_address
+        tx_json = dict(tx_json)
+        tx_json["Sequence"] = await self.order_templates.next_sequence(address)
+        tx_json["Fee"] = str(self.fee_oracle.bid_drops(max_fee_xrp))
+        tx_json["LastLedgerSequence"] = await self._current_validated_ledger() + LEDGER_OFFSET
+
+        tx_hashes = []
+        result = {}
+        for attempt in range(MAX_FEE_BUMPS + 1):
+            # Release at the start of an open-ledger window so the order makes the next ledger
+            target_ledger = await self.ledger_scheduler.wait_for_release()
+            if not self.ledger_scheduler.can_make(tx_json["LastLedgerSequence"]):
+                logger.warning(f"Order can no longer make LastLedgerSequence {tx_json['LastLedgerSequence']}, not sending")
+                break
+
+            tx_blob, tx_hash = await self.signer.sign(address, wallet.seed, tx_json)
+            # Register before submitting so a fast validation on the stream is not missed
+            self.result_tracker.register(tx_hash)
+            # The JSON-RPC client is synchronous; submit off the loop so ingest and releases keep running
+            response = await asyncio.get_running_loop().run_in_executor(
+                None, client.request, SubmitOnly(tx_blob=tx_blob)
             )
-            response = submit_and_wait(trust_set_tx, client, wallet)
+            result = response.result
+            tx_hashes.append(tx_hash)
+            self.ledger_scheduler.record_submission(target_ledger)
 
-            if response.result['engine_result'] not in ['tesSUCCESS', 'tecNO_LINE', 'tecNO_LINE_INSUF_RESERVE']:
-                logger.warning(f"TrustSet failed for {currency}.{issuer}: {response.result}")
+            engine_result = result.get("engine_result", "")
+            if engine_result in ("tefPAST_SEQ", "terPRE_SEQ"):
+                # Our local sequence drifted (e.g. a transaction sent from elsewhere)
+                self.order_templates.resync(address)
+            if not (engine_result == "tesSUCCESS" or engine_result.startswith("ter")) and attempt == 0:
+                # Rejected outright (tef/tem/tel) or claimed a fee only (tec), nothing to wait for
+                if not engine_result.startswith("tec"):
+                    self.order_templates.resync(address)
+                self.result_tracker.forget(tx_hash)
+                return result
+
+            validated = await self._wait_for_validation(tx_hashes, tx_json["LastLedgerSequence"])
+            if validated is not None:
+                self.ledger_scheduler.record_inclusion(target_ledger, validated.get("ledger_index"))
+                # Keep positions current even when the result came from a poll
+                self.positions.on_transaction(validated)
+                self.open_offers.on_transaction(validated)
+                self._record_placed_offer(address, tx_json, validated)
+                return validated
+
+            new_fee = self.fee_oracle.replacement_fee(int(tx_json["Fee"]), max_fee_xrp)
+            if new_fee is None:
+                logger.warning(f"Order {tx_hashes[-1]} is stuck and the fee cap is reached, not replacing")
+                break
+
+            logger.info(f"Replacing stuck order {tx_hashes[-1]} with fee {new_fee} drops")
+            tx_json["Fee"] = str(new_fee)
+            tx_json["LastLedgerSequence"] = await self._current_validated_ledger() + LEDGER_OFFSET
+
+        # Give the last submission a final chance to validate before reporting it as expired
+        if tx_hashes:
+            validated = await self._wait_for_validation(tx_hashes, tx_json["LastLedgerSequence"] + RBF_MARGIN_LEDGERS + 1)
+            if validated is not None:
+                self.positions.on_transaction(validated)
+                self.open_offers.on_transaction(validated)
+                self._record_placed_offer(address, tx_json, validated)
+                return validated
+        # The sequence was never consumed, later orders must not leave a gap
+        self.order_templates.resync(address)
+        result["engine_result"] = result.get("engine_result") or "tefMAX_LEDGER"
+        return result
+
+    def _record_placed_offer(self, address: str, tx_json: dict, validated: dict):
+        """Remembers an offer the bot left resting on the book, so only the bot's own offers are swept."""
+        if tx_json.get("TransactionType") == "OfferCreate" and self.open_offers.mark_placed(address, validated):
+            self.save_data()
+
+    def _time_in_force(self, user_id: int) -> dict:
+        """Returns the Flags/Expiration arguments for a manual offer from the user's offer mode."""
+        settings = self.default_trade_settings.get(user_id, {})
+        mode = settings.get("offer_mode", OFFER_MODES[0])
+        if mode == "ioc":
+            return {"flags": TF_IMMEDIATE_OR_CANCEL}
+        if mode == "fok":
+            return {"flags": TF_FILL_OR_KILL}
+        if mode == "expire":
+            ttl = settings.get("offer_ttl", DEFAULT_OFFER_TTL)
+            return {"expiration": xrpl.utils.posix_to_ripple_time(time.time()) + int(ttl)}
+        return {}
+
+    async def quote_buy(self, currency: str, issuer: str, xrp_in: float, offers: list = None):
+        """Quotes a buy of xrp_in XRP on the AMM pool and the order book and picks the better fill.
+
+        offers is an ask-side `book_offers` snapshot; the last cached one is
+        used when omitted. The pool comes from the local mirror, seeded once
+        per pair. Returns {"route", "tokens_out", "price", "amm", "book"}
+        (price in XRP per token), or None when neither venue can quote.
+        """
+        if offers is None:
+            offers = self.book_cache.get_offers(currency, issuer, "ask")
+        await self.amm_pools.get(currency, issuer)
+        amm_out = self.amm_pools.quote_buy(currency, issuer, xrp_in)
+        book_out = book_buy_output(offers, xrp_in)
+        if amm_out is None and book_out is None:
+            return None
+        route, tokens_out = max((("amm", amm_out or 0.0), ("book", book_out or 0.0)), key=lambda item: item[1])
+        return {
+            "route": route,
+            "tokens_out": tokens_out,
+            "price": xrp_in / tokens_out,
+            "amm": amm_out,
+            "book": book_out,
+        }
+
+    async def _ensure_trustline(self, user_id: int, wallet: Wallet, currency: str, issuer: str, max_fee_xrp: float = None):
+        """Sets a trustline for the token so the wallet can receive it."""
+        try:
+            trust_set_tx = self.order_templates.trust_set(wallet.classic_address, currency, issuer)
+            result = await self._submit_order(trust_set_tx, wallet, max_fee_xrp)
+
+            if result.get('engine_result') not in ['tesSUCCESS', 'tecNO_LINE', 'tecNO_LINE_INSUF_RESERVE']:
+                logger.warning(f"TrustSet failed for {currency}.{issuer}: {result}")
             else:
                 logger.info(f"Trustline set for {currency}.{issuer} for user {user_id}")
         except Exception as e:
             logger.error(f"Error setting trustline for {currency}.{issuer}: {e}")
 
-        # Query order book to get realistic price
-        offers = self.get_order_book("XRP", None, currency, issuer)
-        
-        if not offers:
-            logger.warning(f"No offers found in order book for {currency}.{issuer}")
+    async def _execute_buy_order(self, user_id: int, currency: str, issuer: str, buy_amount_xrp: float, slippage: float, mev_protect: bool = False, max_fee_xrp: float = None, risk: dict = None, market: dict = None):
+        """Executes a buy order for a token on the XRPL DEX.
+
+        With risk requirements or supply limits, the issuer's profile and the
+        token's supply are looked up concurrently (usually cache hits) and
+        checked before the TrustSet, so a rejected issuer costs no reserve
+        or fee.
+        """
+        started = time.perf_counter()
+        if user_id not in self.wallets:
+            logger.error(f"No wallet configured for user {user_id}. Cannot execute buy order.")
+            return False
+
+        wallet = self.wallets[user_id]
+        loop = asyncio.get_running_loop()
+        risk_task = loop.create_task(self.issuer_risk.get(issuer)) if risk else None
+        supply_limited = market and (market.get("min_supply") or market.get("max_supply"))
+        supply_task = loop.create_task(self.token_supply.get(currency, issuer)) if supply_limited else None
+        try:
+            if risk_task is not None:
+                failures = check_risk(await risk_task, risk)
+                if failures:
+                    logger.warning(f"Skipping buy of {currency}.{issuer} for user {user_id}: {', '.join(failures)}")
+                    return False
+            if supply_task is not None:
+                supply = await supply_task
+                if supply is None or not _supply_in_range(supply, market):
+                    MARKET_CRITERIA_REJECTIONS.inc(reason="supply")
+                    logger.warning(f"Skipping buy of {currency}.{issuer} for user {user_id}: supply {supply} out of range")
+                    return False
+        finally:
+            # A failed check abandons the other lookup
+            for task in (risk_task, supply_task):
+                if task is not None and not task.done():
+                    task.cancel()
+
+        # Ensure a trustline exists for the token
+        await self._ensure_trustline(user_id, wallet, currency, issuer, max_fee_xrp)
+
+        # Price off whichever of the AMM pool and the order book fills the size better
+        offers = await self.get_order_book("XRP", None, currency, issuer)
+        quote = await self.quote_buy(currency, issuer, buy_amount_xrp, offers)
+
+        if quote is None:
+            logger.warning(f"No AMM pool or offers found for {currency}.{issuer}")
             estimated_token_amount = buy_amount_xrp * 1000 # Fallback estimation
         else:
-            first_offer = offers[0]
-            taker_gets = first_offer.get("TakerGets")
-            taker_pays = first_offer.get("TakerPays")
-            
-            if isinstance(taker_gets, dict) and isinstance(taker_pays, str):
-                token_amount = float(taker_gets.get("value", 0))
-                xrp_amount = float(taker_pays) / 1_000_000
-                
-                if xrp_amount > 0:
-                    rate = token_amount / xrp_amount
-                    estimated_token_amount = buy_amount_xrp * rate * (1 - slippage)
-                    logger.info(f"Calculated rate: {rate} {currency} per XRP, buying {estimated_token_amount} {currency}")
-                else:
-                    estimated_token_amount = buy_amount_xrp * 1000 # Fallback
-            else:
-                estimated_token_amount = buy_amount_xrp * 1000 # Fallback
-
-        # Create OfferCreate transaction
-        offer = OfferCreate(
-            account=wallet.classic_address,
-            taker_gets=IssuedCurrencyAmount(
-                currency=currency,
-                issuer=issuer,
-                value=str(estimated_token_amount)
-            ),
-            taker_pays=str(xrpl.utils.xrp_to_drops(buy_amount_xrp)),
+            estimated_token_amount = quote["tokens_out"] * (1 - slippage)
+            logger.info(
+                f"Best route {quote['route']}: {quote['tokens_out']} {currency} for {buy_amount_xrp} XRP, "
+                f"buying {estimated_token_amount} {currency}"
+            )
+
+        # Create OfferCreate transaction from the cached template: we give XRP and receive the token
+        offer = self.order_templates.offer(
+            wallet.classic_address, currency, issuer, "buy",
+            token_value=format_token_value(estimated_token_amount),
+            xrp_drops=xrp_to_drops_str(buy_amount_xrp),
+            **self._time_in_force(user_id),
         )
 
         # MEV Protection (simplified: add a small delay or higher fee if enabled)
@@ -429,39 +1011,38 @@ class XRPSniper:
             # or use specific transaction flags/hooks if XRPL supports them.
 
         try:
-            response = submit_and_wait(offer, client, wallet)
+            result = await self._submit_order(offer, wallet, max_fee_xrp)
+
+            self._journal_order(user_id, wallet, "buy", currency, issuer, result, started)
 
-            if response.result['engine_result'] == 'tesSUCCESS':
+            if result.get('engine_result') == 'tesSUCCESS':
                 logger.info(f"Successfully executed buy order for {buy_amount_xrp} XRP worth of {currency}.{issuer} for user {user_id}")
                 return True
             else:
-                logger.warning(f"Buy order failed for {currency}.{issuer}: {response.result}")
+                logger.warning(f"Buy order failed for {currency}.{issuer}: {result}")
                 return False
         except Exception as e:
             logger.error(f"Error executing buy order for {currency}.{issuer}: {e}")
+            self._journal_order(user_id, wallet, "buy", currency, issuer, {"engine_result": f"error: {e}"}, started)
             return False
 
-    async def _execute_sell_order(self, user_id: int, currency: str, issuer: str, sell_percentage: float):
+    async def _execute_sell_order(self, user_id: int, currency: str, issuer: str, sell_percentage: float, max_fee_xrp: float = None):
         """Executes a sell order for a token on the XRPL DEX based on a percentage of holdings."""
+        started = time.perf_counter()
         if user_id not in self.wallets:
             logger.error(f"No wallet configured for user {user_id}. Cannot execute sell order.")
             return False
 
         wallet = self.wallets[user_id]
-        account_info = self.get_account_info(wallet.classic_address)
+        position = await self.positions.get(wallet.classic_address)
         
-        if "error" in account_info:
-            logger.error(f"Could not retrieve account info for sell order: {account_info['error']}")
+        if "error" in position:
+            logger.error(f"Could not retrieve positions for sell order: {position['error']}")
             return False
 
-        balances = account_info.get("account_data", {}).get("balances", [])
-        token_balance = 0.0
-        for balance in balances:
-            if isinstance(balance, dict) and balance.get("currency") == currency and balance.get("issuer") == issuer:
-                token_balance = float(balance.get("value", 0))
-                break
+        token_balance = position["lines"].get((currency, issuer), 0.0)
         
-        if token_balance == 0:
+        if token_balance <= 0:
             logger.warning(f"User {user_id} has no {currency}.{issuer} to sell.")
             return False
 
@@ -471,7 +1052,7 @@ class XRPSniper:
             return False
 
         # Query order book to get realistic price for selling (token for XRP)
-        offers = self.get_order_book(currency, issuer, "XRP", None)
+        offers = await self.get_order_book(currency, issuer, "XRP", None)
 
         if not offers:
             logger.warning(f"No offers found in order book for selling {currency}.{issuer}")
@@ -497,30 +1078,222 @@ class XRPSniper:
             logger.warning("Unexpected offer format for sell order.")
             return False
 
-        # Create OfferCreate transaction to sell tokens for XRP
-        offer = OfferCreate(
-            account=wallet.classic_address,
-            taker_gets=str(xrpl.utils.xrp_to_drops(estimated_xrp_gain)), # Amount of XRP to get
-            taker_pays=IssuedCurrencyAmount(
-                currency=currency,
-                issuer=issuer,
-                value=str(amount_to_sell)
-            ),
+        # Create OfferCreate transaction to sell tokens for XRP: we give the token and receive XRP
+        offer = self.order_templates.offer(
+            wallet.classic_address, currency, issuer, "sell",
+            token_value=format_token_value(amount_to_sell),
+            xrp_drops=xrp_to_drops_str(estimated_xrp_gain),
+            **self._time_in_force(user_id),
         )
 
         try:
-            response = submit_and_wait(offer, client, wallet)
+            result = await self._submit_order(offer, wallet, max_fee_xrp)
+
+            self._journal_order(user_id, wallet, "sell", currency, issuer, result, started)
 
-            if response.result['engine_result'] == 'tesSUCCESS':
+            if result.get('engine_result') == 'tesSUCCESS':
                 logger.info(f"Successfully executed sell order for {sell_percentage}% of {currency}.{issuer} for user {user_id}")
                 return True
             else:
-                logger.warning(f"Sell order failed for {currency}.{issuer}: {response.result}")
+                logger.warning(f"Sell order failed for {currency}.{issuer}: {result}")
                 return False
         except Exception as e:
             logger.error(f"Error executing sell order for {currency}.{issuer}: {e}")
+            self._journal_order(user_id, wallet, "sell", currency, issuer, {"engine_result": f"error: {e}"}, started)
             return False
 
+    async def start_sliced_order(self, user_id: int, side: str, currency: str, issuer: str, amount: float,
+                                 slices: int = None, interval: float = None, limit_price: float = None,
+                                 slippage: float = 0.01, max_fee_xrp: float = None):
+        """Starts a TWAP/iceberg order executed as ImmediateOrCancel child offers.
+
+        amount is XRP for buys and a percentage of holdings for sells. It is
+        split into `slices` equal children, or sized to the best book level
+        when slices is None. Children go out every `interval` seconds (one
+        ledger by default) and never trade past limit_price (XRP per token)
+        or past `slippage` (a fraction: 0.01 is 1%) from the top of book.
+        Returns the order, or None if it could not be started.
+        """
+        wallet = self.wallets.get(user_id)
+        if not wallet:
+            logger.error(f"No wallet configured for user {user_id}. Cannot start sliced order.")
+            return None
+
+        if side == "buy":
+            total = amount
+            await self._ensure_trustline(user_id, wallet, currency, issuer, max_fee_xrp)
+        else:
+            balance = await self.positions.get_token_balance(wallet.classic_address, currency, issuer)
+            total = balance * (amount / 100.0)
+        if total <= 0:
+            logger.warning(f"Sliced {side} for user {user_id} on {currency}.{issuer} has nothing to trade.")
+            return None
+
+        return self.slicer.start({
+            "user_id": user_id,
+            "side": side,
+            "currency": currency,
+            "issuer": issuer,
+            "total": total,
+            "slice_size": total / slices if slices else None,
+            "interval": interval,
+            "limit_price": limit_price,
+            "slippage": slippage,
+            "max_fee_xrp": max_fee_xrp,
+        }, self._execute_slice, self._on_sliced_order_done)
+
+    async def _execute_slice(self, order: dict, remaining: float):
+        """Places one ImmediateOrCancel child of a sliced order and returns (filled, received)."""
+        started = time.perf_counter()
+        user_id, currency, issuer = order["user_id"], order["currency"], order["issuer"]
+        wallet = self.wallets.get(user_id)
+        if wallet is None:
+            raise RuntimeError(f"No wallet configured for user {user_id}")
+
+        # Fresh top of book for every child; cached on the loop for marks and triggers
+        book_side = ("XRP", None, currency, issuer) if order["side"] == "buy" else (currency, issuer, "XRP", None)
+        offers = await asyncio.get_running_loop().run_in_executor(None, self._fetch_order_book, *book_side)
+        self._cache_order_book(*book_side, offers)
+
+        best = None
+        for offer in offers:
+            taker_gets, taker_pays = offer.get("TakerGets"), offer.get("TakerPays")
+            token, xrp = (taker_gets, taker_pays) if order["side"] == "buy" else (taker_pays, taker_gets)
+            if isinstance(token, dict) and isinstance(xrp, str) and float(token.get("value", 0)) > 0:
+                best = {"token": float(token["value"]), "xrp": float(xrp) / 1_000_000}
+                best["price"] = best["xrp"] / best["token"]
+                break
+        if best is None:
+            logger.info(f"Sliced order {order['id']}: no book for {currency}.{issuer}, waiting")
+            return None
+
+        limit_price = order.get("limit_price")
+        if order["side"] == "buy":
+            if limit_price and best["price"] > limit_price:
+                return None
+            price = best["price"] * (1 + order["slippage"])
+            if limit_price:
+                price = min(price, limit_price)
+            size_xrp = min(order["slice_size"] or best["xrp"], remaining)
+            offer = self.order_templates.offer(
+                wallet.classic_address, currency, issuer, "buy",
+                token_value=format_token_value(size_xrp / price),
+                xrp_drops=xrp_to_drops_str(size_xrp),
+                flags=TF_IMMEDIATE_OR_CANCEL,
+            )
+        else:
+            if limit_price and best["price"] < limit_price:
+                return None
+            price = best["price"] * (1 - order["slippage"])
+            if limit_price:
+                price = max(price, limit_price)
+            if price <= 0:
+                raise ValueError(f"Slippage {order['slippage']:.2%} leaves no positive sell price")
+            size_token = min(order["slice_size"] or best["token"], remaining)
+            offer = self.order_templates.offer(
+                wallet.classic_address, currency, issuer, "sell",
+                token_value=format_token_value(size_token),
+                xrp_drops=xrp_to_drops_str(size_token * price),
+                flags=TF_IMMEDIATE_OR_CANCEL,
+            )
+
+        result = await self._submit_order(offer, wallet, order["max_fee_xrp"])
+        self._journal_order(user_id, wallet, order["side"], currency, issuer, result, started, source="slice")
+        token_delta, xrp_delta = fill_from_meta(result, wallet.classic_address, currency, issuer)
+        if order["side"] == "buy":
+            return max(-xrp_delta, 0.0), max(token_delta, 0.0)
+        return max(-token_delta, 0.0), max(xrp_delta, 0.0)
+
+    async def _on_sliced_order_done(self, order: dict):
+        """Reports a finished sliced order to the user."""
+        if self.notifier:
+            unit = "XRP" if order["side"] == "buy" else order["currency"]
+            await self.notifier(
+                order["user_id"],
+                f"🧩 Sliced {order['side']} of {order['currency']} {order['status']}: "
+                f"{order['filled']:.6g}/{order['total']:.6g} {unit} in {order['slices']} slice(s)"
+            )
+
+    def cancel_sliced_order(self, user_id: int, order_id: str) -> bool:
+        """Cancels one of the user's running sliced orders."""
+        order = self.slicer.get_order(order_id)
+        if order is None or order["user_id"] != user_id:
+            return False
+        return self.slicer.cancel(order_id)
+
+    def get_sliced_orders(self, user_id: int) -> list:
+        """Returns the user's running and recently finished sliced orders."""
+        return self.slicer.get_orders(user_id)
+
+    async def get_open_offers(self, user_id: int) -> list:
+        """Returns the user's open DEX offers, oldest sequence first."""
+        wallet = self.wallets.get(user_id)
+        if not wallet:
+            return []
+        offers = await self.open_offers.get(wallet.classic_address)
+        if "error" in offers:
+            return []
+        return [offers[sequence] for sequence in sorted(offers)]
+
+    def get_open_offer_count(self, user_id: int):
+        """Returns the user's cached open offer count, or None if not known yet."""
+        wallet = self.wallets.get(user_id)
+        return self.open_offers.count(wallet.classic_address) if wallet else None
+
+    async def cancel_offers(self, user_id: int, sequences: list) -> int:
+        """Cancels offers in one batch of consecutive-sequence OfferCancels; returns how many succeeded."""
+        wallet = self.wallets.get(user_id)
+        if not wallet or not sequences:
+            return 0
+        address = wallet.classic_address
+        max_fee_xrp = self.default_trade_settings.get(user_id, {}).get("max_gas_fee")
+        self.open_offers.mark_cancelling(address, sequences)
+        try:
+            results = await asyncio.gather(*(
+                self._submit_order(self.order_templates.offer_cancel(address, sequence), wallet, max_fee_xrp)
+                for sequence in sequences
+            ), return_exceptions=True)
+        finally:
+            self.open_offers.clear_cancelling(address, sequences)
+
+        cancelled = 0
+        for sequence, result in zip(sequences, results):
+            if isinstance(result, Exception):
+                logger.error(f"Error cancelling offer {sequence} for user {user_id}: {result}")
+            elif result.get("engine_result") == "tesSUCCESS":
+                cancelled += 1
+            else:
+                logger.warning(f"OfferCancel {sequence} failed for user {user_id}: {result.get('engine_result')}")
+        logger.info(f"Cancelled {cancelled}/{len(sequences)} offer(s) for user {user_id}")
+        return cancelled
+
+    async def cancel_all_offers(self, user_id: int) -> int:
+        """Cancels every open offer of the user."""
+        return await self.cancel_offers(user_id, [offer["sequence"] for offer in await self.get_open_offers(user_id)])
+
+    async def cancel_stale_offers(self) -> int:
+        """Cancels the bot's own offers whose Expiration has passed, releasing their reserve.
+
+        Only offers the bot placed are swept; their TTL is the on-ledger
+        Expiration _time_in_force stamps on "expire" orders, so "gtc"
+        offers and offers placed outside the bot are never touched.
+        """
+        cancelled = 0
+        for user_id, wallet in list(self.wallets.items()):
+            stale = await self.open_offers.stale(wallet.classic_address)
+            if stale:
+                cancelled += await self.cancel_offers(user_id, stale)
+        return cancelled
+
+    async def run_offer_sweeper(self, interval: float = OFFER_SWEEP_INTERVAL):
+        """Periodically cancels expired and stale resting offers in the background."""
+        while True:
+            try:
+                await self.cancel_stale_offers()
+            except Exception as e:
+                logger.error(f"Error in offer sweep: {e}")
+            await asyncio.sleep(interval)
+
     def get_account_info(self, address: str) -> dict:
         """Fetches account information from the XRPL."""
         try:
@@ -531,6 +1304,187 @@ class XRPSniper:
             logger.error(f"Error getting account info for {address}: {e}")
             return {"error": str(e)}
 
+    async def get_positions(self, user_id: int) -> dict:
+        """Returns the user's XRP and token balances from the positions cache."""
+        wallet = self.wallets.get(user_id)
+        if not wallet:
+            return {"error": "No wallet configured"}
+        position = await self.positions.get(wallet.classic_address)
+        if "error" in position:
+            return position
+        return {
+            "address": wallet.classic_address,
+            "xrp": position["xrp_drops"] / 1_000_000,
+            "tokens": [
+                {"currency": currency, "issuer": issuer, "balance": balance}
+                for (currency, issuer), balance in position["lines"].items()
+            ],
+        }
+
+    def _journal_order(self, user_id: int, wallet: Wallet, side: str, currency: str, issuer: str,
+                       result: dict, started: float, source: str = None):
+        """Journals an order attempt and, if it filled, updates the user's cost basis."""
+        engine_result = result.get("engine_result") or "none"
+        ORDERS.inc(side=side, result="error" if engine_result.startswith("error") else engine_result)
+        token_delta, xrp_delta = fill_from_meta(result, wallet.classic_address, currency, issuer)
+        if token_delta:
+            self.fills.record_fill(user_id, currency, issuer, token_delta, xrp_delta)
+            self.save_data()
+
+        size_token = abs(token_delta) if token_delta else None
+        size_xrp = abs(xrp_delta) if token_delta else None
+        self.journal.record(
+            user_id=user_id,
+            side=side,
+            currency=currency,
+            issuer=issuer,
+            tx_hash=result.get("hash") or result.get("tx_json", {}).get("hash"),
+            engine_result=result.get("engine_result"),
+            price_xrp=size_xrp / size_token if size_token else None,
+            size_token=size_token,
+            size_xrp=size_xrp,
+            fee_drops=int(fee) if (fee := result.get("Fee") or result.get("tx_json", {}).get("Fee")) else None,
+            latency_ms=(time.perf_counter() - started) * 1000,
+            source=source,
+        )
+
+    async def get_trade_history(self, user_id: int, limit: int = 100) -> list:
+        """Returns the user's most recent order attempts from the journal."""
+        return await self.journal.recent_trades(user_id, limit)
+
+    async def get_portfolio(self, user_id: int) -> dict:
+        """Returns the user's holdings marked to market with cost basis and unrealized PnL."""
+        positions = await self.get_positions(user_id)
+        if "error" in positions:
+            return positions
+        return valuate({user_id: positions}, self.fills, self.book_cache)[user_id]
+
+    async def valuate_all(self) -> dict:
+        """Values every holding of every user in one batched pass, refreshing stale marks first."""
+        positions_by_user = {}
+        for user_id in list(self.wallets):
+            positions = await self.get_positions(user_id)
+            if "error" not in positions:
+                positions_by_user[user_id] = positions
+
+        loop = asyncio.get_running_loop()
+        stale_pairs = {
+            (token["currency"], token["issuer"])
+            for positions in positions_by_user.values()
+            for token in positions["tokens"]
+            if self.book_cache.is_stale(token["currency"], token["issuer"])
+        }
+        for currency, issuer in stale_pairs:
+            for side in (("XRP", None, currency, issuer), (currency, issuer, "XRP", None)):
+                try:
+                    offers = await loop.run_in_executor(None, self._fetch_order_book, *side)
+                except Exception as e:
+                    logger.error(f"Error refreshing order book for {currency}.{issuer}: {e}")
+                    continue
+                # Cache on the loop thread, price listeners may fire auto-sell triggers
+                self._cache_order_book(*side, offers)
+
+        self.portfolio_snapshot = valuate(positions_by_user, self.fills, self.book_cache)
+        return self.portfolio_snapshot
+
+    async def run_valuation_job(self, interval: float = VALUATION_INTERVAL):
+        """Periodically values all portfolios in the background."""
+        while True:
+            try:
+                await self.valuate_all()
+            except Exception as e:
+                logger.error(f"Error in portfolio valuation job: {e}")
+            await asyncio.sleep(interval)
+
+    def add_auto_sell_rule(self, user_id: int, currency: str, issuer: str, kind: str, pct: float,
+                           sell_percentage: float = 100):
+        """Arms a take-profit, stop-loss or trailing-stop rule for a position.
+
+        The entry price is the position's average cost, or the current mark if
+        it has no fill history. Returns the rule, or None if no price is known.
+        """
+        holding = self.fills.get(user_id, currency, issuer)
+        if holding and holding["qty"] > 0:
+            entry_price = holding["cost_xrp"] / holding["qty"]
+        else:
+            entry_price = self.book_cache.mid(currency, issuer)
+        if not entry_price:
+            return None
+
+        rule = {
+            "id": str(uuid.uuid4())[:8],
+            "user_id": user_id,
+            "currency": currency,
+            "issuer": issuer,
+            "kind": kind,
+            "pct": pct,
+            "entry_price": entry_price,
+            "sell_percentage": sell_percentage,
+            # Rules on the same position are one-cancels-other
+            "group": f"{user_id}:{currency}:{issuer}",
+        }
+        self.auto_sell_rules.setdefault(user_id, {})[rule["id"]] = rule
+        self.triggers.add(rule)
+        self.save_data()
+        logger.info(f"Auto-sell rule {kind} {pct}% armed for user {user_id} on {currency}.{issuer} at entry {entry_price}")
+        return rule
+
+    def remove_auto_sell_rule(self, user_id: int, rule_id: str):
+        """Disarms an auto-sell rule."""
+        if rule_id in self.auto_sell_rules.get(user_id, {}):
+            del self.auto_sell_rules[user_id][rule_id]
+            self.triggers.remove(rule_id)
+            self.save_data()
+            logger.info(f"Auto-sell rule {rule_id} removed for user {user_id}")
+
+    def get_auto_sell_rules(self, user_id: int, currency: str = None, issuer: str = None) -> list:
+        """Gets a user's auto-sell rules, optionally for one token."""
+        return [
+            rule for rule in self.auto_sell_rules.get(user_id, {}).values()
+            if currency is None or (rule["currency"], rule["issuer"]) == (currency, issuer)
+        ]
+
+    def _on_price_tick(self, currency: str, issuer: str, price: float):
+        """Evaluates auto-sell triggers for a pair on every book cache price update."""
+        fired = self.triggers.on_price(currency, issuer, price)
+        if not fired:
+            if self.triggers.peaks_raised and self._peak_save_handle is None:
+                self._peak_save_handle = asyncio.get_running_loop().call_later(PEAK_SAVE_DELAY, self._save_peaks)
+            return
+        for trigger in fired:
+            # The engine already disarmed the trigger and its one-cancels-other siblings
+            rules = self.auto_sell_rules.get(trigger["user_id"], {})
+            rules.pop(trigger["id"], None)
+            for rule_id in [r["id"] for r in rules.values() if r.get("group") == trigger.get("group")]:
+                del rules[rule_id]
+            asyncio.get_running_loop().create_task(self._fire_auto_sell(trigger))
+        self.save_data()
+
+    def _save_peaks(self):
+        """Persists trailing-stop peaks raised since the last save."""
+        self._peak_save_handle = None
+        if self.triggers.peaks_raised:
+            self.save_data()
+
+    async def _fire_auto_sell(self, trigger: dict):
+        """Sells a position through the normal sell path when its trigger fires."""
+        user_id = trigger["user_id"]
+        logger.info(
+            f"Auto-sell {trigger['kind']} fired for user {user_id} on {trigger['currency']}.{trigger['issuer']} "
+            f"at {trigger['fired_price']}"
+        )
+        max_fee_xrp = self.default_trade_settings.get(user_id, {}).get("max_gas_fee")
+        success = await self._execute_sell_order(
+            user_id, trigger["currency"], trigger["issuer"], trigger["sell_percentage"], max_fee_xrp
+        )
+        if self.notifier:
+            status = "✅ executed" if success else "❌ failed"
+            await self.notifier(
+                user_id,
+                f"🤖 Auto-sell {trigger['kind'].upper()} {trigger['pct']}% on {trigger['currency']} {status} "
+                f"(trigger price {trigger['fired_price']:.8g} XRP)"
+            )
+
     def get_issued_currencies(self, issuer_address: str) -> list:
         """Gets all currencies issued by a specific address using gateway_balances."""
         try:
@@ -623,6 +1577,100 @@ class XRPSniper:
         """Gets all sell presets for a user."""
         return self.sell_presets.get(user_id, [])
 
+    def start_services(self):
+        """Starts the supervised background services; call once the event loop runs.
+
+        The stream is registered but only started while a config is armed.
+        """
+        self.supervisor.add("loop_watchdog", self.loop_watchdog.run)
+        self.supervisor.add("http", self.http.serve)
+        self.supervisor.add("fees", self.fee_oracle.run)
+        self.supervisor.add("token_registry", self.token_registry.load)
+        self.supervisor.add("timers", self._run_timers)
+        self.supervisor.add("valuation", self.run_valuation_job)
+        self.supervisor.add("offer_sweeper", self.run_offer_sweeper)
+        self.supervisor.add("stream", self.start_sniper, start=False)
+        self._update_running_status()
+        # Have every wallet's account sequence ready before its first order
+        for wallet in self.wallets.values():
+            self.order_templates.prefetch(wallet.classic_address)
+
+    def get_health(self) -> dict:
+        """Returns service health plus stream and order state for the admin health command."""
+        return {
+            "services": self.supervisor.health(),
+            "stream_running": self.running,
+            "armed_configs": len(self._armed),
+            "warming_configs": len(self._warming),
+            "inflight_orders": self._inflight_orders,
+            "snipes_in_flight": len(self._snipe_tasks),
+            "sliced_orders_running": self.slicer.running_count(),
+            "draining": self.draining,
+            "loop_lag": self.loop_watchdog.stats(),
+            "ledger": {key: value for key, value in self.get_ledger_stats().items() if key != "ledgers"},
+            "last_stall": self.loop_watchdog.stalls[-1] if self.loop_watchdog.stalls else None,
+        }
+
+    def _collect_metrics(self):
+        QUEUE_DEPTH.set(self._inflight_orders, queue="orders_in_flight")
+        QUEUE_DEPTH.set(len(self._snipe_tasks), queue="snipes_in_flight")
+        QUEUE_DEPTH.set(self.slicer.running_count(), queue="sliced_orders")
+        QUEUE_DEPTH.set(self.journal.pending(), queue="journal_writes")
+        QUEUE_DEPTH.set(self.token_registry.pending(), queue="registry_writes")
+        ledger = self.get_ledger_stats()
+        for stat in ("close_interval", "avg_txn_count", "orders_submitted", "orders_included_next_ledger",
+                     "inclusion_rate"):
+            if ledger[stat] is not None:
+                LEDGER_STATS.set(ledger[stat], stat=stat)
+        if self.ledger_scheduler.last_close_time is not None:
+            LEDGER_AGE.set(time.monotonic() - self.ledger_scheduler.last_close_time)
+        decode = decode_currency.cache_info()
+        CACHE_REQUESTS.set_total(decode.hits, cache="ticker_decode", result="hit")
+        CACHE_REQUESTS.set_total(decode.misses, cache="ticker_decode", result="miss")
+
+    async def _metrics_endpoint(self, request: dict) -> tuple:
+        return 200, "text/plain; version=0.0.4", metrics.render()
+
+    def stream_health(self) -> tuple:
+        """Returns (healthy, detail): unhealthy when the stream should run but ledgers stopped arriving."""
+        last_close = self.ledger_scheduler.last_close_time
+        age = None if last_close is None else time.monotonic() - last_close
+        if not (self._armed or self._warming):
+            return True, "idle: no config armed"
+        if not self.running:
+            return False, "stream not running"
+        if age is None or age > HEALTH_MAX_LEDGER_AGE:
+            return False, f"no ledgerClosed for {'ever' if age is None else f'{age:.0f}s'}"
+        return True, f"last ledgerClosed {age:.1f}s ago"
+
+    async def _healthz_endpoint(self, request: dict) -> tuple:
+        healthy, detail = self.stream_health()
+        return (200 if healthy else 503), "text/plain", f"{'ok' if healthy else 'unhealthy'}: {detail}\n"
+
+    async def shutdown(self, timeout: float = DRAIN_TIMEOUT):
+        """Stops taking new orders, waits up to timeout for in-flight ones, then stops everything."""
+        self.draining = True
+        cancelled = self.slicer.cancel_all()
+        logger.info(f"Draining: {self._inflight_orders} order(s), {len(self._snipe_tasks)} snipe(s), "
+                    f"{cancelled} sliced order(s) in flight")
+        deadline = time.monotonic() + timeout
+        while (self._inflight_orders or self._snipe_tasks or self.slicer.running_count()) \
+                and time.monotonic() < deadline:
+            await asyncio.sleep(0.1)
+        if self._inflight_orders or self._snipe_tasks:
+            logger.warning(f"Shutdown with {self._inflight_orders} order(s) still in flight")
+
+        try:
+            # Every step runs even if an earlier one fails, so buffered journal and registry rows are written
+            for step in (self.stop_sniper, self.supervisor.shutdown, self.journal.close, self.token_registry.close):
+                try:
+                    await step()
+                except Exception as e:
+                    logger.error(f"Error during shutdown in {step.__name__}: {e}")
+        finally:
+            self.signer.shutdown()
+        logger.info("Sniper shut down")
+
     async def start_sniper(self):
         """Starts the XRP Ledger monitoring for sniping."""
         if self.running:
@@ -631,21 +1679,22 @@ class XRPSniper:
         
         self.running = True
         logger.info("Starting XRP Sniper bot...")
-        await self._subscribe_to_transactions()
+        try:
+            await self._subscribe_to_transactions()
+        finally:
+            self.running = False
 
     async def stop_sniper(self):
         """Stops the XRP Ledger monitoring."""
         logger.info("Stopping XRP Sniper bot...")
         self.running = False
         
-        if self.ws and not self.ws.closed:
-            await self.ws.close()
-        
-        if self.sniper_task and not self.sniper_task.done():
-            self.sniper_task.cancel()
-            try:
-                await self.sniper_task
-            except asyncio.CancelledError:
-                pass
-        
+        try:
+            # close() is a no-op on a connection that is already closed
+            if self.ws:
+                await self.ws.close()
+            await self.supervisor.stop("stream")
+        finally:
+            await self.journal.flush()
+            await self.token_registry.flush()
         logger.info("Sniper stopped successfully")
@@ -62,7 +62,7 @@ def generate_new_wallet_sync():
 def import_wallet(seed: str):
     """Imports an existing XRP Ledger wallet from a seed."""
     try:
-        imported_wallet = Wallet(seed=seed, sequence=0)
+        imported_wallet = Wallet.from_seed(seed)
         return {
             "address": imported_wallet.classic_address,
             "seed": imported_wallet.seed,
@@ -82,7 +82,7 @@ def get_account_info(address: str):
 
 def send_xrp(sender_seed: str, destination_address: str, amount: float):
     """Sends XRP from one address to another."""
-    sender_wallet = Wallet(sender_seed, 0)
+    sender_wallet = Wallet.from_seed(sender_seed)
     payment = Payment(
         account=sender_wallet.classic_address,
         amount=xrpl.utils.xrp_to_drops(amount),
@@ -96,7 +96,7 @@ def send_xrp(sender_seed: str, destination_address: str, amount: float):
 
 def set_trustline(sender_seed: str, currency_code: str, issuer_address: str, limit: str = "10000000000000000"):
     """Sets a trustline for an issued token."""
-    sender_wallet = Wallet(sender_seed, 0)
+    sender_wallet = Wallet.from_seed(sender_seed)
     trust_set = TrustSet(
         account=sender_wallet.classic_address,
         limit_amount=IssuedCurrencyAmount(